@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (Especialidad, Medico, Paciente, ConsultaMedica,
                      Tratamiento, Medicamento, RecetaMedica,
-                     SeguroSalud, PacienteSeguro)
+                     SeguroSalud, PacienteSeguro, HorarioAtencion)
 
 admin.site.register(Especialidad)
 admin.site.register(Medico)
@@ -11,4 +11,5 @@ admin.site.register(Tratamiento)
 admin.site.register(Medicamento)
 admin.site.register(RecetaMedica)
 admin.site.register(SeguroSalud)
-admin.site.register(PacienteSeguro)
\ No newline at end of file
+admin.site.register(PacienteSeguro)
+admin.site.register(HorarioAtencion)
\ No newline at end of file
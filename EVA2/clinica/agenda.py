@@ -0,0 +1,260 @@
+# EVA2/clinica/agenda.py
+# ---------------------------------------------------------
+# Agenda de los médicos.
+# - Cada consulta ocupa [fecha_consulta, fecha_consulta + duración), con
+#   la duración de la especialidad del médico (duracion_slot_minutos).
+#   Como todas las consultas de un médico duran lo mismo, dos chocan si
+#   empiezan a menos de una duración de distancia: es un rango sobre
+#   (medico, fecha_consulta), que resuelve consulta_medico_fecha_idx.
+# - Las consultas canceladas no ocupan agenda.
+# - Al editar sólo se valida si cambia la reserva (médico, fecha, o una
+#   cancelada que vuelve a ocupar hora): marcar atendida una consulta
+#   histórica o importada no la revalida contra el horario actual.
+# - Si el médico tiene HorarioAtencion, la consulta debe caber en uno;
+#   sin horarios cargados no se restringe la hora (datos históricos).
+# - validar_reservas(): lo mismo para un lote (endpoint bulk, trabajos),
+#   con los médicos bloqueados y una query de consultas y una de horarios
+#   para todo el lote; también detecta choques dentro del propio lote.
+# - slots_libres(): próximos N bloques libres de una especialidad, con
+#   una query de horarios y una de consultas para toda la ventana.
+# ---------------------------------------------------------
+
+import heapq
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ConsultaMedica, HorarioAtencion, Medico
+
+CANCELADA = "CANC"
+VENTANA_DIAS = 30
+MAX_SLOTS = 100
+
+
+def duracion(medico):
+    return timedelta(minutes=medico.especialidad.duracion_slot_minutos)
+
+
+def _hora_local(dt):
+    return timezone.localtime(dt)
+
+
+# ---------- Validaciones ----------
+def conflictos(medico_id, inicio, dur, excluir_pk=None):
+    """Consultas (no canceladas) del médico que se cruzan con [inicio, inicio + dur)."""
+    qs = ConsultaMedica.objects.filter(
+        medico_id=medico_id, fecha_consulta__gt=inicio - dur, fecha_consulta__lt=inicio + dur,
+    ).exclude(estado=CANCELADA)
+    if excluir_pk is not None:
+        qs = qs.exclude(pk=excluir_pk)
+    return qs
+
+
+def cambia_reserva(consulta):
+    """¿La consulta es nueva o cambia la hora que ocupa respecto de la fila guardada?"""
+    if consulta.pk is None:
+        return True
+    guardada = ConsultaMedica.objects.filter(pk=consulta.pk).values("medico_id", "fecha_consulta", "estado").first()
+    return (
+        guardada is None
+        or guardada["medico_id"] != consulta.medico_id
+        or guardada["fecha_consulta"] != consulta.fecha_consulta
+        or guardada["estado"] == CANCELADA
+    )
+
+
+def _error_choque(medico, choque, dur):
+    desde = _hora_local(choque)
+    return ValidationError({"fecha_consulta": (
+        f"{medico} ya tiene una consulta de {desde:%d/%m/%Y %H:%M} a {desde + dur:%H:%M}."
+    )})
+
+
+def _error_horario(medico, inicio, dur, horarios):
+    """ValidationError si [inicio, inicio + dur) no cabe en los horarios (sin horarios no se restringe)."""
+    local = _hora_local(inicio)
+    if horarios and not any(
+        dia == local.weekday() and h_ini <= local.time() and (local + dur).time() <= h_fin
+        for dia, h_ini, h_fin in horarios
+    ):
+        return ValidationError({"fecha_consulta": f"{local:%d/%m/%Y %H:%M} está fuera del horario de {medico}."})
+    return None
+
+
+def validar_consulta(consulta):
+    """Lanza ValidationError si la consulta choca con otra o queda fuera del horario."""
+    if consulta.medico_id is None or consulta.fecha_consulta is None or consulta.estado == CANCELADA:
+        return
+    if not cambia_reserva(consulta):
+        return
+    medico = Medico.objects.select_related("especialidad").get(pk=consulta.medico_id)
+    dur = duracion(medico)
+    inicio = consulta.fecha_consulta
+    choque = conflictos(medico.pk, inicio, dur, consulta.pk).order_by("fecha_consulta").first()
+    if choque:
+        raise _error_choque(medico, choque.fecha_consulta, dur)
+    horarios = list(HorarioAtencion.objects.filter(medico=medico).values_list("dia_semana", "hora_inicio", "hora_fin"))
+    error = _error_horario(medico, inicio, dur, horarios)
+    if error:
+        raise error
+
+
+def validar_reservas(consultas):
+    """
+    validar_consulta() para un lote de consultas que van a ocupar hora
+    (nuevas o que dejan de estar canceladas). Bloquea a sus médicos: llamar
+    dentro de la transacción que las guarda. Se validan en orden, cada una
+    contra las guardadas y las anteriores del lote que sí caben.
+    Devuelve {posición en `consultas`: ValidationError} de las rechazadas.
+    """
+    reservas = [
+        (i, c) for i, c in enumerate(consultas)
+        if c.medico_id is not None and c.fecha_consulta is not None and c.estado != CANCELADA
+    ]
+    if not reservas:
+        return {}
+    medicos = {
+        m.pk: m for m in Medico.objects.select_for_update(of=("self",)).select_related("especialidad")
+        .filter(pk__in={c.medico_id for _, c in reservas}).order_by("pk")
+    }
+    rangos = {}
+    for _, c in reservas:
+        desde, hasta = rangos.get(c.medico_id, (c.fecha_consulta, c.fecha_consulta))
+        rangos[c.medico_id] = (min(desde, c.fecha_consulta), max(hasta, c.fecha_consulta))
+    # Una query para todo el lote: las consultas de cada médico cerca de sus reservas
+    cerca = Q()
+    for pk, (desde, hasta) in rangos.items():
+        dur = duracion(medicos[pk])
+        cerca |= Q(medico_id=pk, fecha_consulta__gt=desde - dur, fecha_consulta__lt=hasta + dur)
+    ocupadas = {pk: [] for pk in rangos}
+    filas = (
+        ConsultaMedica.objects.filter(cerca).exclude(estado=CANCELADA)
+        .exclude(pk__in=[c.pk for _, c in reservas if c.pk is not None])
+        .order_by("fecha_consulta").values_list("medico_id", "fecha_consulta")
+    )
+    for pk, fecha in filas:
+        ocupadas[pk].append(fecha)
+    horarios = {}
+    for pk, *bloque in HorarioAtencion.objects.filter(medico_id__in=rangos).values_list(
+        "medico_id", "dia_semana", "hora_inicio", "hora_fin",
+    ):
+        horarios.setdefault(pk, []).append(tuple(bloque))
+
+    errores = {}
+    for i, consulta in reservas:
+        medico, inicio = medicos[consulta.medico_id], consulta.fecha_consulta
+        dur, lista = duracion(medico), ocupadas[medico.pk]
+        j = bisect_right(lista, inicio - dur)
+        if j < len(lista) and lista[j] < inicio + dur:
+            errores[i] = _error_choque(medico, lista[j], dur)
+        elif error := _error_horario(medico, inicio, dur, horarios.get(medico.pk)):
+            errores[i] = error
+        else:
+            insort(lista, inicio)
+    return errores
+
+
+def validar_horario(horario):
+    """Un médico no puede tener dos bloques que se traslapen el mismo día."""
+    if horario.medico_id is None or horario.hora_inicio is None or horario.hora_fin is None:
+        return
+    if horario.hora_fin <= horario.hora_inicio:
+        raise ValidationError({"hora_fin": "Debe ser posterior a la hora de inicio."})
+    traslape = HorarioAtencion.objects.filter(
+        medico_id=horario.medico_id, dia_semana=horario.dia_semana,
+        hora_inicio__lt=horario.hora_fin, hora_fin__gt=horario.hora_inicio,
+    ).exclude(pk=horario.pk)
+    if traslape.exists():
+        raise ValidationError("El bloque se traslapa con otro horario del médico ese día.")
+
+
+def bloquear_medicos(medico_ids):
+    """SELECT ... FOR UPDATE de los médicos (en orden de pk); llamar dentro de una transacción."""
+    list(Medico.objects.select_for_update().filter(pk__in=set(medico_ids)).order_by("pk").values_list("pk"))
+
+
+@contextmanager
+def agenda_bloqueada(medico_id):
+    """
+    Transacción con el médico bloqueado (SELECT ... FOR UPDATE): dos
+    reservas simultáneas del mismo médico se validan y guardan en serie.
+    """
+    with transaction.atomic():
+        if medico_id is not None:
+            bloquear_medicos([medico_id])
+        yield
+
+
+def reservar(consulta):
+    """Valida y guarda la consulta con la agenda del médico bloqueada."""
+    with agenda_bloqueada(consulta.medico_id):
+        validar_consulta(consulta)
+        consulta.save()
+    return consulta
+
+
+# ---------- Slots libres ----------
+def _slots_medico(medico, horarios, ocupadas, desde, hasta):
+    """Genera (inicio, medico_id) libres, en orden, para un médico."""
+    dur = duracion(medico)
+    zona = timezone.get_current_timezone()
+    dia = _hora_local(desde).date()
+    ultimo = _hora_local(hasta).date()
+    por_dia = {}
+    for h in horarios:
+        por_dia.setdefault(h.dia_semana, []).append(h)
+    while dia <= ultimo:
+        for h in por_dia.get(dia.weekday(), ()):
+            inicio = datetime.combine(dia, h.hora_inicio, tzinfo=zona)
+            fin = datetime.combine(dia, h.hora_fin, tzinfo=zona)
+            while inicio + dur <= fin and inicio < hasta:
+                if inicio >= desde:
+                    # ¿Alguna consulta ocupada en (inicio - dur, inicio + dur)?
+                    i = bisect_right(ocupadas, inicio - dur)
+                    if i == len(ocupadas) or ocupadas[i] >= inicio + dur:
+                        yield inicio, medico.pk
+                inicio += dur
+        dia += timedelta(days=1)
+
+
+def slots_libres(especialidad_id, desde=None, hasta=None, n=10, medico_id=None):
+    """
+    Próximos `n` bloques libres entre todos los médicos activos de la
+    especialidad, ordenados por hora. Devuelve [(inicio, fin, medico)].
+    """
+    desde = desde or timezone.now()
+    hasta = hasta or desde + timedelta(days=VENTANA_DIAS)
+    medicos = Medico.objects.filter(especialidad_id=especialidad_id, activo=True).select_related("especialidad")
+    if medico_id is not None:
+        medicos = medicos.filter(pk=medico_id)
+    medicos = {m.pk: m for m in medicos}
+    if not medicos:
+        return []
+    horarios = {}
+    for h in HorarioAtencion.objects.filter(medico_id__in=medicos):
+        horarios.setdefault(h.medico_id, []).append(h)
+    dur_max = max(duracion(m) for m in medicos.values())
+    ocupadas = {pk: [] for pk in medicos}
+    filas = (
+        ConsultaMedica.objects
+        .filter(medico_id__in=list(horarios), fecha_consulta__gt=desde - dur_max, fecha_consulta__lt=hasta)
+        .exclude(estado=CANCELADA)
+        .order_by("medico_id", "fecha_consulta")
+        .values_list("medico_id", "fecha_consulta")
+    )
+    for pk, fecha in filas:
+        ocupadas[pk].append(fecha)
+    generadores = [
+        _slots_medico(medicos[pk], lista, ocupadas[pk], desde, hasta)
+        for pk, lista in horarios.items()
+    ]
+    return [
+        (inicio, inicio + duracion(medicos[pk]), medicos[pk])
+        for inicio, pk in islice(heapq.merge(*generadores), min(n, MAX_SLOTS))
+    ]
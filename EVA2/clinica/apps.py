@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ClinicaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clinica'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import metricas, signals  # noqa: F401  (conecta las signals)
+
+        # Cuenta y mide las queries de cada conexión (MetricasMiddleware)
+        connection_created.connect(metricas.instalar_en_conexion, dispatch_uid="clinica_metricas_sql")
@@ -0,0 +1,76 @@
+# EVA2/clinica/benchmark.py
+# ---------------------------------------------------------
+# Requests en proceso contra la aplicación ASGI (clinica_carga, clinica_bench).
+# - pedir(): un GET como lo haría uvicorn, pero sin red: mide el costo del
+#   stack Django/DRF + ORM, no del servidor.
+# - medir(): N requests con C concurrentes; req/s y percentiles de latencia.
+# - Mientras mide, el log por request de clinica.metricas (INFO) se apaga:
+#   una línea por request distorsiona la medición.
+# ---------------------------------------------------------
+
+import asyncio
+import logging
+import time
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+async def pedir(app, ruta, query=""):
+    """Un GET contra la app ASGI. Devuelve el status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+        "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    enviado = False
+    estado = None
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # el cliente nunca se desconecta
+
+    async def send(mensaje):
+        nonlocal estado
+        if mensaje["type"] == "http.response.start":
+            estado = mensaje["status"]
+
+    await app(scope, receive, send)
+    return estado
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+async def medir(app, ruta, query, total, concurrencia):
+    """{requests, concurrencia, rps, p50..p99 y max en ms, errores} (errores: status != 200)."""
+    semaforo = asyncio.Semaphore(concurrencia)
+    tiempos, errores = [], 0
+
+    async def uno():
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            estado = await pedir(app, ruta, query)
+            tiempos.append(time.perf_counter() - inicio)
+            errores += estado != 200
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uno() for _ in range(total)))
+    duracion = time.perf_counter() - inicio
+    tiempos.sort()
+    return {
+        "requests": total, "concurrencia": concurrencia, "rps": round(total / duracion, 1),
+        **{f"p{p}": round(percentil(tiempos, p) * 1000, 2) for p in PERCENTILES},
+        "max": round(tiempos[-1] * 1000, 2), "errores": errores,
+    }
+
+
+def silenciar_log_por_request():
+    logger = logging.getLogger("clinica.metricas")
+    logger.setLevel(max(logger.getEffectiveLevel(), logging.WARNING))
@@ -0,0 +1,269 @@
+# EVA2/clinica/bulk.py
+# ---------------------------------------------------------
+# Ingesta masiva para la API: POST /api/<recurso>/bulk/ con un arreglo.
+# - Valida todo el lote con el serializer del ViewSet, pero resolviendo
+#   los FKs, la clave de upsert y cada clave única (unique=True y
+#   unique_together) con UNA query por campo/clave (no por ítem).
+# - Escribe con bulk_create / bulk_update en una sola transacción, junto
+#   con el hook despues_de_bulk (resúmenes del dashboard).
+# - Los ítems inválidos se informan por índice y no abortan el lote.
+# ---------------------------------------------------------
+
+import logging
+
+from django.db import IntegrityError, models, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+
+from .models import campos_calculados
+
+logger = logging.getLogger("clinica.bulk")
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que resuelve ids desde un dict precargado."""
+
+    def __init__(self, instancias, **kwargs):
+        self.instancias = instancias
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in self.instancias:
+            self.fail("does_not_exist", pk_value=data)
+        return self.instancias[pk]
+
+
+def _precargar_relaciones(serializer_class, items):
+    """
+    Devuelve {campo: {pk: instancia}} para cada PrimaryKeyRelatedField del
+    serializer, con una query `in_bulk` por campo para todo el lote.
+    """
+    campos = serializer_class().fields
+    cache = {}
+    for nombre, campo in campos.items():
+        if not isinstance(campo, serializers.PrimaryKeyRelatedField) or campo.read_only:
+            continue
+        ids = set()
+        for item in items:
+            valor = item.get(nombre) if isinstance(item, dict) else None
+            try:
+                ids.add(int(valor))
+            except (TypeError, ValueError):
+                pass
+        cache[nombre] = (campo, campo.get_queryset().in_bulk(ids) if ids else {})
+    return cache
+
+
+def _claves_unicas(model):
+    """Tuplas de campos únicos del modelo (unique=True y unique_together)."""
+    claves = [(f.name,) for f in model._meta.concrete_fields if f.unique and not f.primary_key]
+    claves += [tuple(grupo) for grupo in model._meta.unique_together]
+    return claves
+
+
+def _escalar(valor):
+    """Valores que sirven de clave de upsert; un `["x"]` no se busca y lo rechaza el serializer del ítem."""
+    return isinstance(valor, (str, int)) and not isinstance(valor, bool) and valor != ""
+
+
+def _valor_clave(datos, instance, campos):
+    """Tupla de la clave única para el ítem validado (FKs como pk); None si tiene NULLs."""
+    valores = []
+    for campo in campos:
+        valor = datos[campo] if campo in datos else getattr(instance, campo, None)
+        if isinstance(valor, models.Model):
+            valor = valor.pk
+        if valor is None:
+            return None
+        valores.append(valor)
+    return tuple(valores)
+
+
+def _precargar_unicas(model, claves_unicas, candidatos):
+    """
+    {campos: {tupla: pk}} de las claves únicas que el lote trae y ya están
+    en la BD: una query por clave (filtro __in por columna y cruce exacto
+    en Python), en vez de un UniqueValidator por ítem.
+    """
+    ocupadas = {}
+    for campos in claves_unicas:
+        tuplas = {t for _, instance, datos in candidatos if (t := _valor_clave(datos, instance, campos))}
+        ocupadas[campos] = {}
+        if not tuplas:
+            continue
+        columnas = [model._meta.get_field(c).attname for c in campos]
+        filtro = {f"{col}__in": {t[i] for t in tuplas} for i, col in enumerate(columnas)}
+        for pk, *valores in model.objects.filter(**filtro).values_list("pk", *columnas):
+            if tuple(valores) in tuplas:
+                ocupadas[campos][tuple(valores)] = pk
+    return ocupadas
+
+
+def _error_unico(model, campos):
+    """El mismo mensaje de Django ("Ya existe ... con este ...") con la clave del serializer."""
+    mensajes = model().unique_error_message(model, campos).messages
+    return {campos[0] if len(campos) == 1 else api_settings.NON_FIELD_ERRORS_KEY: mensajes}
+
+
+class BulkMixin:
+    """
+    Agrega la acción `bulk` a un ModelViewSet.
+    - bulk_upsert_field: campo único para hacer upsert (p.ej. "rut").
+      Si el valor ya existe se actualiza esa fila; si no, se crea.
+    - bulk_max_items: tamaño máximo del lote por request.
+    - bulk_batch_size: filas por INSERT/UPDATE.
+    """
+    bulk_upsert_field = None
+    bulk_max_items = 5000
+    bulk_batch_size = 500
+
+    def despues_de_bulk(self, creados, actualizados):
+        """
+        Hook para los ViewSets: se llama dentro de la transacción del lote,
+        después de escribirlo (si falla, no se guarda nada). Lo que no sea
+        de la BD (p.ej. la caché) va en transaction.on_commit.
+        """
+
+    def validar_bulk(self, objetos):
+        """
+        Hook para los ViewSets: validaciones que dependen de otras filas
+        (p.ej. la agenda) sobre los objetos ya validados por el serializer.
+        Se llama dentro de la transacción, antes de escribir. Devuelve
+        {posición en `objetos`: errores} de los que se descartan.
+        """
+        return {}
+
+    def get_bulk_serializer(self, item, instance, relaciones):
+        serializer = self.get_serializer(instance=instance, data=item)
+        for nombre, (campo, instancias) in relaciones.items():
+            serializer.fields[nombre] = CachedPrimaryKeyRelatedField(
+                instancias,
+                queryset=campo.get_queryset(),
+                allow_null=campo.allow_null,
+                required=campo.required,
+            )
+        # La unicidad contra la BD se resuelve para todo el lote (_precargar_unicas)
+        for campo in serializer.fields.values():
+            campo.validators = [v for v in campo.validators if not isinstance(v, UniqueValidator)]
+        serializer.validators = [v for v in serializer.validators if not isinstance(v, UniqueTogetherValidator)]
+        return serializer
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"detail": "Se esperaba un arreglo de objetos."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {"detail": f"Máximo {self.bulk_max_items} objetos por request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        model = self.get_queryset().model
+        serializer_class = self.get_serializer_class()
+        relaciones = _precargar_relaciones(serializer_class, items)
+        clave = self.bulk_upsert_field
+        existentes = {}
+        if clave:
+            valores = {
+                item.get(clave) for item in items if isinstance(item, dict) and _escalar(item.get(clave))
+            }
+            existentes = {getattr(obj, clave): obj for obj in model.objects.filter(**{f"{clave}__in": valores})}
+
+        errores, candidatos = [], []
+        for indice, item in enumerate(items):
+            if not isinstance(item, dict):
+                errores.append({"indice": indice, "errores": {"detail": ["Se esperaba un objeto."]}})
+                continue
+            valor = item.get(clave) if clave else None
+            instance = existentes.get(valor) if _escalar(valor) else None
+            serializer = self.get_bulk_serializer(item, instance, relaciones)
+            if not serializer.is_valid():
+                errores.append({"indice": indice, "errores": serializer.errors})
+                continue
+            candidatos.append((indice, instance, serializer.validated_data))
+
+        # Unicidad contra la BD (una query por clave) y dentro del propio lote
+        claves_unicas = _claves_unicas(model)
+        ocupadas = _precargar_unicas(model, claves_unicas, candidatos)
+        vistos = {campos: set() for campos in claves_unicas}
+        nuevos, actualizados = [], []  # (indice, objeto)
+        for indice, instance, datos in candidatos:
+            tuplas = {campos: _valor_clave(datos, instance, campos) for campos in claves_unicas}
+            en_bd = next((
+                campos for campos, t in tuplas.items()
+                if t in ocupadas[campos] and ocupadas[campos][t] != getattr(instance, "pk", None)
+            ), None)
+            if en_bd:
+                errores.append({"indice": indice, "errores": _error_unico(model, en_bd)})
+                continue
+            repetida = next((campos for campos, t in tuplas.items() if t is not None and t in vistos[campos]), None)
+            if repetida:
+                errores.append({
+                    "indice": indice,
+                    "errores": {c: ["Valor repetido dentro del lote."] for c in repetida},
+                })
+                continue
+            for campos, t in tuplas.items():
+                if t is not None:
+                    vistos[campos].add(t)
+            if instance is None:
+                nuevos.append((indice, model(**datos)))
+            else:
+                for campo, valor in datos.items():
+                    setattr(instance, campo, valor)
+                actualizados.append((indice, instance))
+
+        campos_update = [
+            f.name for f in model._meta.concrete_fields
+            if not f.primary_key and f.name != clave and f.editable
+        ]
+        # bulk_update no ejecuta pre_save: updated_at y las columnas
+        # derivadas (p.ej. Paciente.rut_normalizado) se recalculan a mano
+        for f in campos_calculados(model):
+            if not getattr(f, "auto_now_add", False):
+                campos_update.append(f.name)
+                for _, obj in actualizados:
+                    f.pre_save(obj, add=False)
+        try:
+            with transaction.atomic():
+                escribir = nuevos + actualizados
+                rechazos = self.validar_bulk([obj for _, obj in escribir])
+                errores += [{"indice": escribir[pos][0], "errores": e} for pos, e in rechazos.items()]
+                quedan = [(pos < len(nuevos), obj) for pos, (_, obj) in enumerate(escribir) if pos not in rechazos]
+                nuevos = [obj for es_nuevo, obj in quedan if es_nuevo]
+                actualizados = [obj for es_nuevo, obj in quedan if not es_nuevo]
+                creados = model.objects.bulk_create(nuevos, batch_size=self.bulk_batch_size)
+                if actualizados:
+                    model.objects.bulk_update(actualizados, campos_update, batch_size=self.bulk_batch_size)
+                self.despues_de_bulk(creados, actualizados)
+        except IntegrityError:
+            # Otra escritura concurrente ganó la carrera sobre una clave única. El
+            # detalle (constraint, SQL) queda en el log, no en la respuesta.
+            logger.warning("Conflicto al guardar el lote de %s", model.__name__, exc_info=True)
+            return Response(
+                {"detail": "Conflicto al guardar el lote: otra operación modificó los mismos datos. Reintenta."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        errores.sort(key=lambda e: e["indice"])
+
+        if not creados and not actualizados:
+            codigo = status.HTTP_400_BAD_REQUEST
+        elif errores:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_201_CREATED
+        return Response({
+            "creados": [obj.pk for obj in creados],
+            "actualizados": [obj.pk for obj in actualizados],
+            "errores": errores,
+        }, status=codigo)
@@ -0,0 +1,113 @@
+# EVA2/clinica/busqueda.py
+# ---------------------------------------------------------
+# Búsqueda de pacientes por RUT parcial o por nombre/apellido.
+# - Columnas normalizadas (CampoNormalizado) que el modelo recalcula en
+#   cada guardado: RUT sin puntos ni guion con K mayúscula, y nombre en
+#   minúsculas y sin tildes. Así la búsqueda es insensible a formato,
+#   mayúsculas y acentos sin funciones en el WHERE.
+# - RUT: prefijo (LIKE 'x%') sobre un índice B-tree.
+# - Nombre: cada palabra debe aparecer (LIKE '%x%'). En PostgreSQL lo
+#   resuelve un índice GIN con gin_trgm_ops (migración 0004); en SQLite
+#   u otros motores es la misma query sin índice (fallback portable).
+# ---------------------------------------------------------
+
+import re
+import unicodedata
+
+from django.db import models
+from django.db.models import Case, IntegerField, Value, When
+
+LIMITE = 20
+
+_SOLO_RUT = re.compile(r"^[0-9.\-kK]+$")
+
+# Equivalente SQL de normalizar_texto() (no depende de la extensión unaccent)
+_CON_TILDE = "ÁÀÄÂÃÉÈËÊÍÌÏÎÓÒÖÔÕÚÙÜÛÑÇáàäâãéèëêíìïîóòöôõúùüûñç"
+_SIN_TILDE = "AAAAAEEEEIIIIOOOOOUUUUNCaaaaaeeeeiiiiooooouuuunc"
+
+
+def normalizar_rut(rut):
+    """'12.345.678-k' -> '12345678K'"""
+    return re.sub(r"[^0-9K]", "", (rut or "").upper())
+
+
+def normalizar_texto(*partes):
+    """('Pérez', 'José  Luis') -> 'perez jose luis'"""
+    texto = " ".join(p for p in partes if p)
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+SQL_NORMALIZADORES = {
+    normalizar_rut: lambda rut: f"regexp_replace(upper({rut}), '[^0-9K]', '', 'g')",
+    normalizar_texto: lambda *partes: (
+        f"trim(regexp_replace(lower(translate(concat_ws(' ', {', '.join(partes)}), "
+        f"'{_CON_TILDE}', '{_SIN_TILDE}')), '[[:space:]]+', ' ', 'g'))"
+    ),
+}
+
+
+class CampoNormalizado(models.CharField):
+    """
+    CharField derivado de otros campos del modelo (`fuentes`) con la
+    función `normalizar`. No se edita en formularios ni en la API; se
+    recalcula en pre_save, así que también lo cubre bulk_create.
+    """
+
+    def __init__(self, *args, fuentes=(), normalizar=None, **kwargs):
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("default", "")
+        self.fuentes = tuple(fuentes)
+        self.normalizar = normalizar
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["fuentes"] = self.fuentes
+        kwargs["normalizar"] = self.normalizar
+        kwargs.pop("editable", None)
+        if kwargs.get("default") == "":
+            kwargs.pop("default")
+        return name, path, args, kwargs
+
+    def calcular(self, instance):
+        return self.normalizar(*(getattr(instance, f) for f in self.fuentes))
+
+    def pre_save(self, instance, add):
+        valor = self.calcular(instance)
+        setattr(instance, self.attname, valor)
+        return valor
+
+    def expresion_sql(self, *fuentes):
+        """La misma normalización en SQL (importación con COPY en PostgreSQL)."""
+        return SQL_NORMALIZADORES[self.normalizar](*fuentes)
+
+
+def filtrar_pacientes(queryset, q):
+    """
+    Filtra por RUT parcial ("12.345", "12345678-k") o por palabras del
+    nombre/apellido ("perez jo"). Los que empiezan con el texto van primero.
+    """
+    q = (q or "").strip()
+    if not q:
+        return queryset
+    rut = normalizar_rut(q)
+    if _SOLO_RUT.match(q) and rut:
+        return queryset.filter(rut_normalizado__startswith=rut).annotate(
+            relevancia=Value(0, output_field=IntegerField())
+        )
+    texto = normalizar_texto(q)
+    for palabra in texto.split():
+        queryset = queryset.filter(nombre_busqueda__contains=palabra)
+    return queryset.annotate(relevancia=Case(
+        When(nombre_busqueda__startswith=texto, then=Value(0)),
+        default=Value(1), output_field=IntegerField(),
+    ))
+
+
+def buscar_pacientes(queryset, q, limite=LIMITE):
+    """Typeahead: los primeros `limite` resultados por relevancia y apellido."""
+    if not (q or "").strip():
+        return queryset.none()
+    return filtrar_pacientes(queryset, q).order_by("relevancia", "nombre_busqueda", "id")[:limite]
@@ -0,0 +1,107 @@
+# EVA2/clinica/cache.py
+# ---------------------------------------------------------
+# Caché read-through para las tablas de catálogo (chicas y casi fijas):
+# Especialidad, SeguroSalud y Medicamento.
+# - Usa el framework de caché de Django (alias CLINICA_CATALOG_CACHE,
+#   por defecto "default" = locmem; configurable en settings.CACHES).
+# - Cada modelo tiene un número de versión en la caché; todas las
+#   claves lo incluyen. post_save/post_delete (signals.py) incrementan la
+#   versión, con lo que las entradas anteriores quedan inalcanzables.
+# ---------------------------------------------------------
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import Especialidad, SeguroSalud, Medicamento
+
+CATALOGOS = (Especialidad, SeguroSalud, Medicamento)
+TIMEOUT = 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, "CLINICA_CATALOG_CACHE", "default")]
+
+
+def _clave_version(model):
+    return f"clinica:catalogo:{model._meta.label_lower}:version"
+
+
+def version(model):
+    """Versión actual del catálogo (se crea en 1 si no existe)."""
+    cache = _cache()
+    clave = _clave_version(model)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, 1, timeout=None)
+        valor = cache.get(clave, 1)
+    return valor
+
+
+def invalidar(model):
+    """Incrementa la versión del catálogo: las entradas anteriores dejan de usarse."""
+    cache = _cache()
+    clave = _clave_version(model)
+    try:
+        cache.incr(clave)
+    except ValueError:  # la clave no existía (o expiró)
+        cache.set(clave, 2, timeout=None)
+
+
+def obtener(model, sufijo, calcular):
+    """
+    Read-through: devuelve el valor cacheado para (model, sufijo) en la
+    versión actual, o lo calcula con `calcular()` y lo guarda.
+    """
+    cache = _cache()
+    clave = f"clinica:catalogo:{model._meta.label_lower}:v{version(model)}:{sufijo}"
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, TIMEOUT)
+    return valor
+
+
+def opciones(model):
+    """Choices (pk, str(obj)) para los <select> de los formularios, ordenadas por texto."""
+    return obtener(model, "choices", lambda: sorted(
+        ((obj.pk, str(obj)) for obj in model.objects.all()), key=lambda opcion: opcion[1]
+    ))
+
+
+class CachedCatalogMixin:
+    """
+    Para ViewSets de catálogos: list y retrieve se sirven desde la caché.
+    La clave incluye la URL completa (filtros, cursor, page_size, ...).
+    Las escrituras pasan directo a la BD y la signal invalida la versión.
+    El estado para ETag/Last-Modified se cachea igual, con la misma versión.
+    """
+
+    def _desde_cache(self, request, accion, *args, **kwargs):
+        model = self.get_queryset().model
+        data = obtener(
+            model, f"api:{request.build_absolute_uri()}",
+            lambda: accion(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self._desde_cache(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._desde_cache(request, super().retrieve, *args, **kwargs)
+
+    def estado_coleccion(self, queryset):
+        # El COUNT/MAX(updated_at) del GET condicional también sale de la caché
+        return obtener(
+            queryset.model, f"estado:{self.request.build_absolute_uri()}",
+            lambda: super(CachedCatalogMixin, self).estado_coleccion(queryset),
+        )
+
+    def despues_de_bulk(self, creados, actualizados):
+        super().despues_de_bulk(creados, actualizados)
+        # bulk_create / bulk_update no emiten post_save; se invalida al confirmar
+        # el lote (antes, otro request podría volver a cachear los datos viejos)
+        model = self.get_queryset().model
+        transaction.on_commit(lambda: invalidar(model))
@@ -0,0 +1,99 @@
+# EVA2/clinica/campos.py
+# ---------------------------------------------------------
+# Sparse fieldsets y expansión de relaciones en list/retrieve de la API.
+#   ?fields=id,fecha_consulta,medico   -> sólo esas columnas (only())
+#   ?expand=paciente,medico            -> FKs como objetos anidados
+# - Cada serializer declara qué FKs se pueden expandir (`expandibles`).
+# - El ViewSet valida los nombres (400 si no existen) y ajusta el queryset:
+#   select_related para FK/OneToOne y prefetch_related para el resto, así
+#   expandir nunca produce N+1. Con ?fields= se leen sólo esas columnas
+#   más la PK y las del orden (las usa el cursor de la paginación).
+# ---------------------------------------------------------
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+from .pagination import orden_estable
+
+ACCIONES = ("list", "retrieve")
+
+
+def _lista(valor):
+    return [nombre.strip() for nombre in (valor or "").split(",") if nombre.strip()]
+
+
+class CamposDinamicosSerializerMixin:
+    """
+    Lee del contexto "fields" (None = todos) y "expand" (ya validados por
+    CamposDinamicosMixin) y ajusta self.fields.
+    expandibles: {campo FK: clase del serializer anidado}.
+    """
+    expandibles: dict = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for nombre in self.context.get("expand", ()):
+            self.fields[nombre] = self.expandibles[nombre](read_only=True)
+        campos = self.context.get("fields")
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+class CamposDinamicosMixin:
+    """ViewSet: interpreta ?fields= / ?expand= y adapta serializer y queryset."""
+
+    def campos_solicitados(self):
+        """(fields o None, expand) validados contra el serializer del ViewSet."""
+        if hasattr(self, "_campos_solicitados"):
+            return self._campos_solicitados
+        campos, expandir = None, []
+        if self.action in ACCIONES:
+            serializer_class = self.get_serializer_class()
+            expandibles = getattr(serializer_class, "expandibles", {})
+            expandir = _lista(self.request.query_params.get("expand"))
+            desconocidos = [n for n in expandir if n not in expandibles]
+            if desconocidos:
+                raise ValidationError({"expand": f"No se puede expandir: {', '.join(desconocidos)}. "
+                                                 f"Opciones: {', '.join(expandibles) or 'ninguna'}."})
+            if "fields" in self.request.query_params:
+                campos = _lista(self.request.query_params["fields"])
+                validos = set(serializer_class().fields)
+                desconocidos = [n for n in campos if n not in validos]
+                if desconocidos:
+                    raise ValidationError({"fields": f"Campos desconocidos: {', '.join(desconocidos)}."})
+                # Sólo se expande lo que además se pidió
+                expandir = [n for n in expandir if n in campos]
+        self._campos_solicitados = (campos, expandir)
+        return self._campos_solicitados
+
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        campos, expandir = self.campos_solicitados()
+        contexto.update(fields=campos, expand=expandir)
+        return contexto
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        campos, expandir = self.campos_solicitados()
+        if campos is not None:
+            # El select_related base no se necesita para devolver ids y
+            # chocaría con only() si el FK no está entre los campos pedidos.
+            queryset = queryset.select_related(None)
+            meta = queryset.model._meta
+            columnas = {meta.pk.name, *(c.lstrip("-") for c in orden_estable(queryset) if "__" not in c)}
+            for nombre in campos:
+                try:
+                    campo = meta.get_field(nombre)
+                except FieldDoesNotExist:
+                    continue  # campo calculado del serializer
+                if campo.concrete:
+                    columnas.add(nombre)
+            queryset = queryset.only(*columnas)
+        for nombre in expandir:
+            campo = queryset.model._meta.get_field(nombre)
+            if campo.many_to_one or campo.one_to_one:
+                queryset = queryset.select_related(nombre)
+            else:
+                queryset = queryset.prefetch_related(nombre)
+        return queryset
@@ -0,0 +1,98 @@
+# EVA2/clinica/conditional.py
+# ---------------------------------------------------------
+# GET condicional (ETag / Last-Modified) para la API y las listas web.
+# - El "estado" de una colección es (cantidad de filas, MAX(updated_at)),
+#   calculado con UNA query de agregación sobre el queryset ya filtrado.
+#   Un alta o edición mueve el máximo; una baja cambia la cantidad.
+# - El ETag combina ese estado con la URL completa (filtros, orden, página)
+#   y el Accept, así que cada representación tiene su propio validador.
+# - Si el cliente manda If-None-Match / If-Modified-Since y coinciden,
+#   se responde 304 sin serializar ni renderizar nada.
+# ---------------------------------------------------------
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Count, Max, Subquery, Value
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+@dataclass(frozen=True)
+class Estado:
+    total: int
+    ultimo: datetime | None
+
+
+def estado(queryset, relacionados=()):
+    """
+    Cantidad de filas y última modificación del queryset.
+    `relacionados`: FKs cuyo updated_at también cuenta (p.ej. las columnas
+    paciente__nombre de una tabla dependen de Paciente.updated_at).
+    """
+    queryset = queryset.order_by()
+    return _estado_desde(queryset.aggregate(**_agregados(queryset, relacionados)), relacionados)
+
+
+async def aestado(queryset, relacionados=()):
+    """estado() para las vistas async (views_async.py)."""
+    queryset = queryset.order_by()
+    return _estado_desde(await queryset.aaggregate(**_agregados(queryset, relacionados)), relacionados)
+
+
+def _agregados(queryset, relacionados):
+    agregados = {"total": Count("pk"), "ultimo": Max("updated_at")}
+    for i, campo in enumerate(relacionados):
+        agregados[f"ultimo_{i}"] = Max(_ultimo_relacionado(queryset, campo))
+    return agregados
+
+
+def _ultimo_relacionado(queryset, campo):
+    """
+    MAX(updated_at) de las filas relacionadas, como subquery (una sola vez,
+    no por fila). No es un JOIN: el de un FK no nulo es INNER y las filas
+    sin su relación (p.ej. tratamientos de consultas archivadas,
+    particiones.py) dejarían de contar en el total y en el MAX(updated_at).
+    """
+    for nombre in campo.split("__"):
+        fk = queryset.model._meta.get_field(nombre)
+        queryset = fk.related_model.objects.filter(pk__in=queryset.values(fk.attname))
+    return Subquery(queryset.order_by().values(grupo=Value(1)).annotate(ultimo=Max("updated_at")).values("ultimo"))
+
+
+def _estado_desde(fila, relacionados):
+    fechas = [fila.pop("ultimo")] + [fila[f"ultimo_{i}"] for i in range(len(relacionados))]
+    fechas = [f for f in fechas if f is not None]
+    return Estado(total=fila["total"], ultimo=max(fechas) if fechas else None)
+
+
+def validadores(request, est):
+    """Devuelve (etag, last_modified) para la URL pedida y el estado dado."""
+    ultimo = est.ultimo.isoformat() if est.ultimo else ""
+    base = "|".join((request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), str(est.total), ultimo))
+    etag = quote_etag(hashlib.md5(base.encode()).hexdigest())
+    last_modified = int(est.ultimo.timestamp()) if est.ultimo else None
+    return etag, last_modified
+
+
+def no_modificado(request, etag, last_modified):
+    """Respuesta 304 si los validadores del cliente coinciden; si no, None."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        return response
+    return None
+
+
+def agregar_validadores(response, etag, last_modified):
+    """ETag + Last-Modified en respuestas 200/304; el cliente revalida siempre."""
+    if response.status_code not in (200, 304):
+        return response
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ("Accept",))
+    return response
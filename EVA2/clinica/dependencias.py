@@ -0,0 +1,116 @@
+# EVA2/clinica/dependencias.py
+# ---------------------------------------------------------
+# Inspector de dependencias para saber si un objeto se puede eliminar.
+# - El grafo sale de Model._meta.related_objects (una vez por modelo):
+#   PROTECT/RESTRICT bloquean el borrado; CASCADE arrastra las filas
+#   relacionadas, y se sigue recursivamente porque lo que se borra en
+#   cascada también puede estar protegido.
+# - Todas las relaciones se revisan en UNA query: el objeto con una
+#   anotación EXISTS(...) por arista.
+# Lo usan SafeDeleteMixin (web) y la acción /api/<recurso>/{id}/dependencies/.
+# ---------------------------------------------------------
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.db import models
+from django.db.models import Exists, OuterRef
+
+BLOQUEANTES = (models.PROTECT, models.RESTRICT)
+
+# Textos de la interfaz por (modelo relacionado, campo FK); el resto usa
+# un texto genérico con el verbose_name del modelo.
+MENSAJES = {
+    ("clinica.consultamedica", "paciente"): "Tiene consultas médicas registradas.",
+    ("clinica.pacienteseguro", "paciente"): "Tiene afiliaciones de seguro de salud.",
+    ("clinica.consultamedica", "medico"): "Tiene consultas médicas asignadas.",
+    ("clinica.medico", "especialidad"): "Existen médicos con esta especialidad.",
+    ("clinica.tratamiento", "consulta"): "Tiene tratamientos asociados.",
+    ("clinica.recetamedica", "tratamiento"): "Tiene recetas asociadas.",
+    ("clinica.recetamedica", "medicamento"): "Está referenciado por recetas médicas.",
+    ("clinica.pacienteseguro", "seguro"): "Tiene afiliaciones de pacientes.",
+    ("clinica.horarioatencion", "medico"): "Tiene horarios de atención.",
+}
+
+
+@dataclass(frozen=True)
+class Arista:
+    """Relación entrante: filas de `model` cuyo FK `campo` apunta al objeto."""
+    model: type
+    campo: str
+    bloquea: bool
+    lookup: str     # desde `model` hasta el objeto raíz (p.ej. "tratamiento__consulta")
+    profundidad: int
+
+    @property
+    def motivo(self):
+        clave = (self.model._meta.label_lower, self.campo)
+        return MENSAJES.get(clave, f"Tiene {self.model._meta.verbose_name_plural} relacionados.")
+
+    def as_dict(self):
+        return {
+            "modelo": self.model._meta.label_lower,
+            "campo": self.campo,
+            "motivo": self.motivo,
+            "profundidad": self.profundidad,
+        }
+
+
+@lru_cache(maxsize=None)
+def aristas(model):
+    """PROTECT/RESTRICT y CASCADE que llegan a `model`, siguiendo las cascadas."""
+    resultado = []
+
+    def recorrer(destino, sufijo, profundidad, visitados):
+        for rel in destino._meta.related_objects:
+            if rel.many_to_many or rel.related_model in visitados:
+                continue
+            lookup = f"{rel.field.name}__{sufijo}" if sufijo else rel.field.name
+            if rel.on_delete in BLOQUEANTES:
+                resultado.append(Arista(rel.related_model, rel.field.name, True, lookup, profundidad))
+            elif rel.on_delete is models.CASCADE:
+                resultado.append(Arista(rel.related_model, rel.field.name, False, lookup, profundidad))
+                recorrer(rel.related_model, lookup, profundidad + 1, visitados | {rel.related_model})
+
+    recorrer(model, "", 0, frozenset({model}))
+    return tuple(resultado)
+
+
+@dataclass
+class Dependencias:
+    bloqueos: list
+    cascada: list
+
+    @property
+    def puede_eliminar(self):
+        return not self.bloqueos
+
+    def motivos(self):
+        return [a.motivo for a in self.bloqueos]
+
+    def as_dict(self):
+        return {
+            "puede_eliminar": self.puede_eliminar,
+            "bloqueos": [a.as_dict() for a in self.bloqueos],
+            "cascada": [a.as_dict() for a in self.cascada],
+        }
+
+
+def inspeccionar(model, pk):
+    """
+    Dependencias del objeto `pk` con una sola query.
+    Devuelve None si el objeto no existe.
+    """
+    lista = aristas(model)
+    anotaciones = {
+        f"dep_{i}": Exists(a.model._base_manager.filter(**{a.lookup: OuterRef("pk")}))
+        for i, a in enumerate(lista)
+    }
+    fila = model._base_manager.filter(pk=pk).annotate(**anotaciones).values("pk", *anotaciones).first()
+    if fila is None:
+        return None
+    presentes = [a for i, a in enumerate(lista) if fila[f"dep_{i}"]]
+    return Dependencias(
+        bloqueos=[a for a in presentes if a.bloquea],
+        cascada=[a for a in presentes if not a.bloquea],
+    )
@@ -0,0 +1,104 @@
+# EVA2/clinica/dispensacion.py
+# ---------------------------------------------------------
+# Dispensación de recetas: descuenta Medicamento.stock sin carreras.
+# - El descuento es un UPDATE condicional con F():
+#     UPDATE medicamento SET stock = stock - n WHERE id = ? AND stock >= n
+#   La BD lo aplica de forma atómica; si afectó 0 filas no había stock.
+#   Nunca se lee el stock para escribirlo después (read-modify-write).
+# - Las recetas se bloquean con select_for_update (PostgreSQL) para que
+#   dos requests no dispensen la misma receta dos veces.
+# - Un lote (todas las recetas de un Tratamiento) va en una transacción:
+#   falla al primer medicamento sin stock y no descuenta nada.
+# - Los medicamentos se actualizan en orden de id: dos lotes concurrentes
+#   toman los locks en el mismo orden y no se bloquean mutuamente.
+# ---------------------------------------------------------
+
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache
+from .models import Medicamento, RecetaMedica
+
+
+class DispensacionError(Exception):
+    """Error de negocio al dispensar (la API lo responde con 409)."""
+
+
+class StockInsuficiente(DispensacionError):
+    def __init__(self, medicamento, solicitado, disponible):
+        self.medicamento, self.solicitado, self.disponible = medicamento, solicitado, disponible
+        super().__init__(
+            f"Stock insuficiente de «{medicamento}»: se piden {solicitado}, hay {disponible}."
+        )
+
+
+class RecetaYaDispensada(DispensacionError):
+    def __init__(self, recetas):
+        self.recetas = recetas
+        super().__init__(f"Recetas ya dispensadas: {', '.join(str(pk) for pk in recetas)}.")
+
+
+class SinRecetasPendientes(DispensacionError):
+    pass
+
+
+@dataclass
+class Dispensacion:
+    recetas: list          # ids dispensados
+    descontado: dict       # medicamento_id -> unidades
+    dispensada_en: object
+
+    def as_dict(self):
+        return {
+            "recetas": self.recetas,
+            "descontado": {str(k): v for k, v in self.descontado.items()},
+            "dispensada_en": self.dispensada_en,
+        }
+
+
+def _dispensar(recetas_qs, exigir_todas):
+    ahora = timezone.now()
+    with transaction.atomic():
+        recetas = list(
+            recetas_qs.select_for_update().order_by("pk").only("pk", "medicamento_id", "cantidad", "dispensada_en")
+        )
+        ya = [r.pk for r in recetas if r.dispensada_en is not None]
+        if ya and exigir_todas:
+            raise RecetaYaDispensada(ya)
+        pendientes = [r for r in recetas if r.dispensada_en is None]
+        if not pendientes:
+            raise SinRecetasPendientes("No hay recetas pendientes de dispensar.")
+
+        demanda = Counter()
+        for receta in pendientes:
+            demanda[receta.medicamento_id] += receta.cantidad
+        for medicamento_id in sorted(demanda):
+            cantidad = demanda[medicamento_id]
+            if not cantidad:
+                continue
+            filas = Medicamento.objects.filter(pk=medicamento_id, stock__gte=cantidad).update(
+                stock=F("stock") - cantidad, updated_at=ahora,
+            )
+            if not filas:
+                medicamento = Medicamento.objects.only("nombre", "stock").get(pk=medicamento_id)
+                raise StockInsuficiente(medicamento, cantidad, medicamento.stock)
+
+        ids = [r.pk for r in pendientes]
+        RecetaMedica.objects.filter(pk__in=ids).update(dispensada_en=ahora, updated_at=ahora)
+        # update() no emite post_save: la caché del catálogo se invalida a mano
+        transaction.on_commit(lambda: cache.invalidar(Medicamento))
+    return Dispensacion(recetas=ids, descontado=dict(demanda), dispensada_en=ahora)
+
+
+def dispensar_receta(receta_id):
+    """Dispensa una receta. Error si ya estaba dispensada o falta stock."""
+    return _dispensar(RecetaMedica.objects.filter(pk=receta_id), exigir_todas=True)
+
+
+def dispensar_tratamiento(tratamiento_id):
+    """Dispensa, en una sola transacción, las recetas pendientes del tratamiento."""
+    return _dispensar(RecetaMedica.objects.filter(tratamiento_id=tratamiento_id), exigir_todas=False)
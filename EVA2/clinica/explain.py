@@ -0,0 +1,105 @@
+# EVA2/clinica/explain.py
+# ---------------------------------------------------------
+# Verificación con EXPLAIN de que las rutas "calientes" pueden usar los
+# índices declarados en models.py (Meta.indexes).
+# - Con el seq scan desactivado sólo se prueba que el índice es aplicable
+#   (columnas, orden y condición). No prueba que el planner lo elija con
+#   la configuración por defecto y los datos de producción.
+# - Los querysets se arman igual que en los ViewSets (views.py) y en
+#   las listas HTML (views_web.py): mismo queryset base, mismos
+#   filtros (filters.py) y mismo orden/paginación.
+# - Se usa desde tests.py y desde `manage.py clinica_explain`.
+# ---------------------------------------------------------
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from .filters import ConsultaMedicaFilter, PacienteSeguroFilter
+from .pagination import orden_estable
+
+
+@dataclass
+class CasoIndice:
+    nombre: str
+    indice: str
+    queryset: Callable  # () -> QuerySet
+
+
+def _pagina_api(viewset, filterset, params, page_size=50):
+    """Queryset de una página de la API: filtros + orden del cursor + LIMIT."""
+    qs = filterset(params, queryset=viewset.queryset.all()).qs
+    return qs.order_by(*orden_estable(qs))[:page_size]
+
+
+def _pagina_web(vista, params):
+    """Queryset de la primera página de una lista HTML (BaseListView)."""
+    view = vista()
+    view.setup(RequestFactory().get("/", params))
+    qs = view.get_queryset()
+    return qs[:view.paginate_by]
+
+
+def casos():
+    # Import diferido: views importa modelos/serializers y no hace falta al cargar la app
+    from .views import ConsultaMedicaViewSet, PacienteSeguroViewSet
+    from .views_web import ConsultaList, PacienteList, MedicoList
+
+    inicio = timezone.make_aware(datetime(2025, 1, 1))
+    rango = {"desde": inicio.isoformat(), "hasta": (inicio + timedelta(days=31)).isoformat()}
+    return [
+        CasoIndice(
+            "API: consultas de un médico en un rango de fechas", "consulta_medico_fecha_idx",
+            lambda: _pagina_api(ConsultaMedicaViewSet, ConsultaMedicaFilter, {"medico": 1, **rango}),
+        ),
+        CasoIndice(
+            "API: historial de un paciente", "consulta_paciente_fecha_idx",
+            lambda: _pagina_api(ConsultaMedicaViewSet, ConsultaMedicaFilter, {"paciente": 1}),
+        ),
+        CasoIndice(
+            "API: consultas pendientes", "consulta_estado_fecha_idx",
+            lambda: _pagina_api(ConsultaMedicaViewSet, ConsultaMedicaFilter, {"estado": "PEND"}),
+        ),
+        CasoIndice(
+            "API: afiliaciones vigentes de un paciente", "afiliacion_vigente_idx",
+            lambda: _pagina_api(PacienteSeguroViewSet, PacienteSeguroFilter, {"paciente": 1, "vigente": "true"}),
+        ),
+        CasoIndice(
+            "Web: lista de consultas", "consulta_fecha_idx",
+            lambda: _pagina_web(ConsultaList, {}),
+        ),
+        CasoIndice(
+            "Web: consultas de un médico en un rango de fechas", "consulta_medico_fecha_idx",
+            lambda: _pagina_web(ConsultaList, {"medico": 1, **rango}),
+        ),
+        CasoIndice(
+            "Web: pacientes activos", "paciente_activo_idx",
+            lambda: _pagina_web(PacienteList, {"activo": "true"}),
+        ),
+        CasoIndice(
+            "Web: médicos activos de una especialidad", "medico_activo_idx",
+            lambda: _pagina_web(MedicoList, {"especialidad": 1, "activo": "true"}),
+        ),
+    ]
+
+
+def verificar_indices_aplicables(lista=None):
+    """
+    Ejecuta EXPLAIN para cada caso y devuelve [(caso, plan, aplicable)].
+    En PostgreSQL se desactiva el seq scan dentro de la transacción, así que
+    `aplicable` dice que el índice sirve para la consulta (columnas, orden y
+    condición), no que el planner lo elija con la configuración por defecto.
+    """
+    resultados = []
+    for caso in lista if lista is not None else casos():
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = caso.queryset().explain()
+        resultados.append((caso, plan, caso.indice in plan))
+    return resultados
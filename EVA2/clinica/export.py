@@ -0,0 +1,88 @@
+# EVA2/clinica/export.py
+# ---------------------------------------------------------
+# Exportación por streaming para la API:
+#   GET /api/<recurso>/export.csv/     -> CSV
+#   GET /api/<recurso>/export.ndjson/  -> un objeto JSON por línea
+# - Recorre el queryset con QuerySet.iterator(chunk_size=...): en
+#   PostgreSQL usa un cursor del lado del servidor, así que la memoria
+#   no crece con el tamaño de la tabla.
+# - Aplica los mismos filtros que el listado (filter_queryset) y el
+#   mismo serializer, así que cada fila es igual a la del JSON de la API.
+# ---------------------------------------------------------
+
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class _PassthroughRenderer(BaseRenderer):
+    """Sólo sirve para la negociación de contenido (Accept: text/csv, ...)."""
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVRenderer(_PassthroughRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(_PassthroughRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def filas_csv(columnas, filas):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columnas)
+    for fila in filas:
+        yield writer.writerow([fila.get(c) for c in columnas])
+
+
+def filas_ndjson(filas):
+    for fila in filas:
+        yield json.dumps(fila, cls=JSONEncoder, ensure_ascii=False) + "\n"
+
+
+class ExportMixin:
+    """
+    Agrega la acción `export` a un ModelViewSet.
+    - export_chunk_size: filas por lote leídas desde el cursor.
+    """
+    export_chunk_size = 2000
+
+    CONTENT_TYPES = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson; charset=utf-8",
+    }
+
+    def export_rows(self, queryset):
+        """Itera el queryset fila a fila y devuelve dicts ya serializados."""
+        serializer = self.get_serializer()
+        for obj in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield serializer.to_representation(obj)
+
+    @action(
+        detail=False, methods=["get"], url_path=r"export\.(?P<formato>csv|ndjson)",
+        renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer],
+    )
+    def export(self, request, formato=None, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        filas = self.export_rows(queryset)
+        if formato == "csv":
+            columnas = [nombre for nombre, campo in self.get_serializer().fields.items() if not campo.write_only]
+            contenido = filas_csv(columnas, filas)
+        else:
+            contenido = filas_ndjson(filas)
+        response = StreamingHttpResponse(contenido, content_type=self.CONTENT_TYPES[formato])
+        response["Content-Disposition"] = f'attachment; filename="{self.basename}.{formato}"'
+        return response
@@ -0,0 +1,229 @@
+# EVA2/clinica/facturacion.py
+# ---------------------------------------------------------
+# Reporte de facturación por seguro, mes y médico.
+# Costo de una receta = precio_unitario del medicamento x unidades, con
+#   unidades = tomas por día (frecuencia) x días (duracion), p.ej.
+#   "cada 8 horas" + "7 días" = 21. Si el texto no se puede interpretar
+#   ("según dolor") se usa `cantidad` (sin_posologia cuenta esos casos).
+# Cobertura: la afiliación vigente del paciente con mayor porcentaje;
+#   sin afiliación vigente la receta es "Particular" (seguro None, 0 %).
+# Mes: el de la consulta, en hora local (TIME_ZONE).
+# Dos etapas:
+# 1) Una sola query SQL hace los joins y el GROUP BY por
+#    (seguro, mes, médico, cobertura, frecuencia, duracion), con SUM del
+#    precio: el costo de un grupo es SUM(precio) x unidades, porque todas
+#    sus recetas tienen la misma posología. Se lee con un cursor por lotes
+#    (del lado del servidor en PostgreSQL).
+# 2) NumPy, por lotes: interpreta cada texto distinto una sola vez
+#    (np.unique), calcula costo/cubierto/copago vectorizado y suma los
+#    grupos contiguos (np.add.reduceat). La query viene ordenada por
+#    (seguro, mes, médico), así que cada fila del reporte sale apenas se
+#    completa: reporte() es un generador y la memoria no depende del período.
+# ---------------------------------------------------------
+
+import re
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+
+from . import particiones
+from .busqueda import normalizar_texto
+from .models import (
+    ConsultaMedica, Medicamento, Medico, PacienteSeguro, RecetaMedica, SeguroSalud, Tratamiento,
+)
+
+COLUMNAS = [
+    "seguro", "seguro_nombre", "mes", "medico", "medico_nombre",
+    "recetas", "sin_posologia", "costo", "cubierto", "copago",
+]
+PARTICULAR = "Particular"
+
+# ---------- Posología ----------
+_NUMEROS = {"un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6}
+_NUMERO = r"(\d+(?:[.,]\d+)?|" + "|".join(_NUMEROS) + r")"
+_CADA = re.compile(r"cada\s+" + _NUMERO + r"?\s*(horas?|hrs?|h|dias?|semanas?)\b")
+_VECES = re.compile(_NUMERO + r"\s+ve(?:z|ces)\s+(?:al|por|a la)\s+(dia|semana)\b")
+_DURACION = re.compile(_NUMERO + r"\s*(dias?|semanas?|mes(?:es)?)\b")
+_DIAS_POR = {"h": 1 / 24, "d": 1, "s": 7, "m": 30}
+
+
+def _numero(texto):
+    if texto is None:
+        return 1.0  # "cada hora", "cada día"
+    return float(_NUMEROS.get(texto, texto.replace(",", ".")))
+
+
+def tomas_por_dia(frecuencia):
+    """'cada 8 horas' -> 3.0, '2 veces al día' -> 2.0; nan si no se entiende."""
+    texto = normalizar_texto(frecuencia)
+    if coincide := _CADA.search(texto):
+        intervalo = _numero(coincide[1]) * _DIAS_POR[coincide[2][0]]
+        return 1 / intervalo if intervalo else np.nan
+    if coincide := _VECES.search(texto):
+        return _numero(coincide[1]) / _DIAS_POR[coincide[2][0]]
+    return np.nan
+
+
+def dias(duracion):
+    """'7 días' -> 7.0, '2 semanas' -> 14.0, '1 mes' -> 30.0; nan si no se entiende."""
+    coincide = _DURACION.search(normalizar_texto(duracion))
+    return _numero(coincide[1]) * _DIAS_POR[coincide[2][0]] if coincide else np.nan
+
+
+def _vectorizar(funcion, textos):
+    """funcion() aplicada una vez por texto distinto (son pocos: "cada 8 horas", ...)."""
+    unicos, inversa = np.unique(np.asarray(textos, dtype=str), return_inverse=True)
+    return np.array([funcion(t) for t in unicos], dtype=float)[inversa]
+
+
+# ---------- Etapa 1: SQL ----------
+_SQL = """
+WITH vigente AS (
+    SELECT paciente_id, seguro_id, cobertura_porcentaje,
+           ROW_NUMBER() OVER (PARTITION BY paciente_id ORDER BY cobertura_porcentaje DESC, seguro_id) AS orden
+    FROM {afiliaciones} WHERE vigente
+)
+SELECT v.seguro_id, {mes} AS mes, c.medico_id, v.cobertura_porcentaje, r.frecuencia, r.duracion,
+       COUNT(*), SUM(m.precio_unitario), SUM(m.precio_unitario * r.cantidad)
+FROM {recetas} r
+JOIN {tratamientos} t ON t.id = r.tratamiento_id
+JOIN {consultas} c ON c.id = t.consulta_id
+JOIN {medicamentos} m ON m.id = r.medicamento_id
+LEFT JOIN vigente v ON v.paciente_id = c.paciente_id AND v.orden = 1
+WHERE {condiciones}
+GROUP BY v.seguro_id, mes, c.medico_id, v.cobertura_porcentaje, r.frecuencia, r.duracion
+ORDER BY v.seguro_id, mes, c.medico_id
+"""
+
+
+def consulta_sql(conexion, desde=None, hasta=None, seguro=None, medico=None):
+    """
+    (sql, params) de la query agrupada: una fila por (seguro, mes, médico,
+    cobertura, frecuencia, duracion) con recetas, SUM(precio) y
+    SUM(precio x cantidad), ordenada por (seguro, mes, médico).
+    Si el período toca meses archivados lee la vista con el histórico.
+    La afiliación vigente sale de un CTE con ROW_NUMBER() (un hash join, no
+    una subquery por receta). desde/hasta: datetimes, `hasta` exclusivo.
+    `seguro` = 0 filtra las recetas particulares.
+    """
+    ops = conexion.ops
+    tz = timezone.get_current_timezone_name() if settings.USE_TZ else None
+    mes, params_mes = ops.datetime_trunc_sql("month", "c.fecha_consulta", (), tz)
+    condiciones, params = ["1 = 1"], []
+    if desde is not None:
+        condiciones.append("c.fecha_consulta >= %s")
+        params.append(ops.adapt_datetimefield_value(desde))
+    if hasta is not None:
+        condiciones.append("c.fecha_consulta < %s")
+        params.append(ops.adapt_datetimefield_value(hasta))
+    if medico is not None:
+        condiciones.append("c.medico_id = %s")
+        params.append(medico)
+    if seguro == 0:
+        condiciones.append("v.seguro_id IS NULL")
+    elif seguro is not None:
+        condiciones.append("v.seguro_id = %s")
+        params.append(seguro)
+    consultas = ConsultaMedica._meta.db_table
+    limite = particiones.corte()
+    if limite is not None and (desde is None or desde < limite):
+        consultas = particiones.VISTA  # el período toca meses archivados: sus recetas también cuentan
+    sql = _SQL.format(
+        afiliaciones=PacienteSeguro._meta.db_table, recetas=RecetaMedica._meta.db_table,
+        tratamientos=Tratamiento._meta.db_table, consultas=consultas,
+        medicamentos=Medicamento._meta.db_table, mes=mes, condiciones=" AND ".join(condiciones),
+    )
+    # GROUP BY/ORDER BY usan el alias `mes`: los params del mes van una sola vez
+    return sql, [*params_mes, *params]
+
+
+def _mes(valor):
+    """date_trunc('month') llega como datetime (PG) o texto (SQLite) -> ordinal del día 1."""
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor[:10])
+    return date(valor.year, valor.month, 1).toordinal()
+
+
+# ---------- Etapa 2: NumPy ----------
+def calcular(filas):
+    """
+    Filas de consulta_sql() (un lote, en orden) -> [(clave, sumas)] con
+    clave = (seguro, mes, medico) y sumas = [recetas, sin_posologia, costo, cubierto].
+    """
+    seguros, meses, medicos, coberturas, frecuencias, duraciones, recetas, precios, precios_cantidad = zip(*filas)
+    seguro = np.array([s or 0 for s in seguros], dtype=np.int64)
+    mes = np.array([_mes(m) for m in meses], dtype=np.int64)
+    medico = np.array(medicos, dtype=np.int64)
+    cobertura = np.array([c or 0 for c in coberturas], dtype=float)
+    recetas = np.array(recetas, dtype=float)
+    precio = np.array([p or 0 for p in precios], dtype=float)
+    precio_cantidad = np.array([p or 0 for p in precios_cantidad], dtype=float)
+
+    unidades = _vectorizar(tomas_por_dia, frecuencias) * _vectorizar(dias, duraciones)
+    sin_posologia = np.isnan(unidades)
+    costo = np.where(sin_posologia, precio_cantidad, precio * np.nan_to_num(unidades))
+    cubierto = costo * np.clip(cobertura, 0, 100) / 100
+
+    # Grupos contiguos: la query viene ordenada por (seguro, mes, médico)
+    cambios = np.flatnonzero((np.diff(seguro) != 0) | (np.diff(mes) != 0) | (np.diff(medico) != 0)) + 1
+    inicios = np.concatenate(([0], cambios))
+    sumas = np.add.reduceat(
+        np.column_stack([recetas, np.where(sin_posologia, recetas, 0), costo, cubierto]), inicios, axis=0,
+    )
+    return [
+        ((int(seguro[i]), int(mes[i]), int(medico[i])), fila)
+        for i, fila in zip(inicios.tolist(), sumas.tolist())
+    ]
+
+
+def _lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def reporte(desde=None, hasta=None, seguro=None, medico=None, lote=5000):
+    """Genera las filas del reporte (dicts con COLUMNAS) en orden (seguro, mes, médico)."""
+    seguros = {s.pk: str(s) for s in SeguroSalud.objects.all()}
+    medicos = {}
+    pendiente = None  # último grupo del lote anterior: puede seguir en el siguiente
+
+    def salida(grupos):
+        faltan = {clave[2] for clave, _ in grupos} - medicos.keys()
+        if faltan:
+            medicos.update(
+                (pk, f"{nombre} {apellido}")
+                for pk, nombre, apellido in Medico.objects.filter(pk__in=faltan).values_list("pk", "nombre", "apellido")
+            )
+        for (seguro_pk, mes, medico_pk), (recetas, sin_posologia, costo, cubierto) in grupos:
+            costo, cubierto = round(costo, 2), round(cubierto, 2)
+            yield {
+                "seguro": seguro_pk or None, "seguro_nombre": seguros.get(seguro_pk, PARTICULAR),
+                "mes": f"{date.fromordinal(mes):%Y-%m}", "medico": medico_pk, "medico_nombre": medicos.get(medico_pk, ""),
+                "recetas": int(recetas), "sin_posologia": int(sin_posologia),
+                "costo": costo, "cubierto": cubierto, "copago": round(costo - cubierto, 2),
+            }
+
+    conexion = connections[router.db_for_read(RecetaMedica)]  # réplica si hay (routers.py)
+    sql, params = consulta_sql(conexion, desde, hasta, seguro, medico)
+    with conexion.chunked_cursor() as cursor:  # PG: cursor del lado del servidor
+        cursor.execute(sql, params)
+        for filas_lote in iter(lambda: cursor.fetchmany(lote), []):
+            grupos = calcular(filas_lote)
+            if pendiente is not None:
+                if grupos[0][0] == pendiente[0]:
+                    grupos[0] = (pendiente[0], [a + b for a, b in zip(pendiente[1], grupos[0][1])])
+                else:
+                    grupos.insert(0, pendiente)
+            pendiente = grupos.pop()
+            yield from salida(grupos)
+    if pendiente is not None:
+        yield from salida([pendiente])
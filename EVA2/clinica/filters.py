@@ -0,0 +1,92 @@
+# EVA2/clinica/filters.py
+# ---------------------------------------------------------
+# Filtros (django-filter) compartidos por la API y las listas HTML.
+# Cada filtro está pensado para calzar con un índice de models.py:
+#   - consultas de un médico en un rango de fechas
+#   - historial de un paciente
+#   - consultas por estado
+#   - afiliaciones vigentes de un paciente
+#   - búsqueda de pacientes por RUT/nombre (columnas normalizadas)
+# Los FKs se filtran por id (NumberFilter sobre "<fk>_id"): así no se
+# valida el id con una query extra ni se arma un <select> con toda la tabla.
+# ---------------------------------------------------------
+
+import django_filters
+
+from .busqueda import filtrar_pacientes
+from .models import (
+    Paciente, Medico, ConsultaMedica, ConsultaMedicaCompleta, Tratamiento,
+    RecetaMedica, PacienteSeguro, HorarioAtencion,
+)
+
+
+class PacienteFilter(django_filters.FilterSet):
+    # ?q=12.345 (RUT parcial) o ?q=perez (nombre/apellido, sin tildes)
+    q = django_filters.CharFilter(method="buscar")
+
+    class Meta:
+        model = Paciente
+        fields = ["activo", "sexo"]
+
+    def buscar(self, queryset, name, value):
+        return filtrar_pacientes(queryset, value)
+
+
+class MedicoFilter(django_filters.FilterSet):
+    especialidad = django_filters.NumberFilter(field_name="especialidad_id")
+
+    class Meta:
+        model = Medico
+        fields = ["especialidad", "activo"]
+
+
+class ConsultaMedicaFilter(django_filters.FilterSet):
+    medico = django_filters.NumberFilter(field_name="medico_id")
+    paciente = django_filters.NumberFilter(field_name="paciente_id")
+    # Rango semiabierto: ?desde=2025-01-01&hasta=2025-02-01 (hasta es exclusivo)
+    desde = django_filters.IsoDateTimeFilter(field_name="fecha_consulta", lookup_expr="gte")
+    hasta = django_filters.IsoDateTimeFilter(field_name="fecha_consulta", lookup_expr="lt")
+
+    class Meta:
+        model = ConsultaMedica
+        fields = ["medico", "paciente", "estado", "desde", "hasta"]
+
+
+class ConsultaMedicaCompletaFilter(ConsultaMedicaFilter):
+    """Los mismos filtros sobre consultas activas + histórico (particiones.py)."""
+    class Meta(ConsultaMedicaFilter.Meta):
+        model = ConsultaMedicaCompleta
+
+
+class TratamientoFilter(django_filters.FilterSet):
+    consulta = django_filters.NumberFilter(field_name="consulta_id")
+
+    class Meta:
+        model = Tratamiento
+        fields = ["consulta"]
+
+
+class RecetaMedicaFilter(django_filters.FilterSet):
+    tratamiento = django_filters.NumberFilter(field_name="tratamiento_id")
+    medicamento = django_filters.NumberFilter(field_name="medicamento_id")
+
+    class Meta:
+        model = RecetaMedica
+        fields = ["tratamiento", "medicamento"]
+
+
+class PacienteSeguroFilter(django_filters.FilterSet):
+    paciente = django_filters.NumberFilter(field_name="paciente_id")
+    seguro = django_filters.NumberFilter(field_name="seguro_id")
+
+    class Meta:
+        model = PacienteSeguro
+        fields = ["paciente", "seguro", "vigente"]
+
+
+class HorarioAtencionFilter(django_filters.FilterSet):
+    medico = django_filters.NumberFilter(field_name="medico_id")
+
+    class Meta:
+        model = HorarioAtencion
+        fields = ["medico", "dia_semana"]
@@ -0,0 +1,44 @@
+# EVA2/clinica/historial.py
+# ---------------------------------------------------------
+# Historial clínico de un paciente en un solo documento:
+#   paciente + seguros vigentes + consultas -> tratamientos -> recetas
+#   (con su medicamento).
+# - Las consultas se paginan por cursor en el orden del índice
+#   consulta_paciente_fecha_idx (más reciente primero).
+# - Tratamientos y recetas se cargan con Prefetch para la página completa:
+#   una query por nivel, sin importar cuántas consultas traiga.
+#   Total: paciente, seguros, consultas, tratamientos, recetas = 5 queries.
+# ---------------------------------------------------------
+
+from django.db.models import Prefetch
+
+from .models import ConsultaMedica, PacienteSeguro, RecetaMedica, Tratamiento
+from .pagination import KeysetPagination
+
+
+class HistorialPagination(KeysetPagination):
+    """Cursor sobre las consultas del paciente (?cursor=, ?page_size=)."""
+    page_size = 20
+    max_page_size = 100
+
+
+def consultas(paciente_id):
+    """Consultas del paciente con médico, tratamientos y recetas precargados."""
+    recetas = RecetaMedica.objects.select_related("medicamento").order_by("id")
+    tratamientos = Tratamiento.objects.order_by("id").prefetch_related(Prefetch("recetas", queryset=recetas))
+    return (
+        ConsultaMedica.objects
+        .filter(paciente_id=paciente_id)
+        .select_related("medico__especialidad")
+        .prefetch_related(Prefetch("tratamientos", queryset=tratamientos))
+        .order_by("-fecha_consulta", "-id")
+    )
+
+
+def seguros_vigentes(paciente_id):
+    return (
+        PacienteSeguro.objects
+        .filter(paciente_id=paciente_id, vigente=True)
+        .select_related("seguro")
+        .order_by("id")
+    )
@@ -0,0 +1,457 @@
+# EVA2/clinica/importacion.py
+# ---------------------------------------------------------
+# Importación masiva desde CSV (usada por `manage.py clinica_import`).
+# - PostgreSQL: COPY del CSV a una tabla temporal (staging) y luego un
+#   único INSERT ... SELECT que valida, deduplica y mezcla con la tabla
+#   real (ON CONFLICT sobre la clave única). Todo en una transacción.
+# - Otros motores (SQLite en los tests): lectura por lotes con
+#   csv.DictReader y bulk_create / bulk_update.
+# En ambos caminos:
+#   - se rechazan filas con FKs inexistentes, campos obligatorios vacíos o
+#     valores que no se pueden convertir al tipo de la columna,
+#   - si una clave se repite en el archivo gana la última aparición,
+#   - sin --actualizar las claves que ya existían en la BD se omiten.
+# ---------------------------------------------------------
+
+import csv
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from . import cache, resumenes
+from .models import (
+    Paciente, Medico, Especialidad, ConsultaMedica,
+    Tratamiento, Medicamento, RecetaMedica, campos_calculados,
+)
+
+
+class ImportacionError(Exception):
+    """Error que aborta la importación completa (encabezado inválido, etc.)."""
+
+
+@dataclass
+class Recurso:
+    model: type
+    clave: tuple                              # columnas únicas para deduplicar / upsert
+    fks: dict = field(default_factory=dict)   # columna -> modelo referenciado
+
+
+RECURSOS = {
+    "pacientes": Recurso(Paciente, clave=("rut",)),
+    "medicos": Recurso(Medico, clave=("rut",), fks={"especialidad_id": Especialidad}),
+    "medicamentos": Recurso(Medicamento, clave=("id",)),
+    "consultas": Recurso(ConsultaMedica, clave=("id",), fks={"paciente_id": Paciente, "medico_id": Medico}),
+    "tratamientos": Recurso(Tratamiento, clave=("id",), fks={"consulta_id": ConsultaMedica}),
+    "recetas": Recurso(RecetaMedica, clave=("id",), fks={"tratamiento_id": Tratamiento, "medicamento_id": Medicamento}),
+}
+
+
+@dataclass
+class Resultado:
+    leidas: int = 0
+    insertadas: int = 0
+    actualizadas: int = 0
+    omitidas: int = 0          # clave ya existente (sin --actualizar)
+    duplicadas: int = 0        # clave repetida dentro del archivo
+    rechazadas: dict = field(default_factory=dict)  # motivo -> cantidad
+    segundos: float = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return self.leidas / self.segundos if self.segundos else 0.0
+
+
+def _campos(recurso, columnas):
+    """
+    Valida el encabezado del CSV contra el modelo.
+    Devuelve (campos_csv, campos_por_defecto): los primeros vienen del
+    archivo, los segundos se completan con el default del modelo.
+    """
+    model = recurso.model
+    por_attname = {f.attname: f for f in model._meta.concrete_fields}
+    desconocidas = [c for c in columnas if c not in por_attname or _es_derivado(por_attname[c])]
+    if desconocidas:
+        raise ImportacionError(f"Columnas desconocidas para {model.__name__}: {', '.join(desconocidas)}")
+    faltan = [c for c in recurso.clave if c not in columnas]
+    if faltan:
+        raise ImportacionError(f"Falta la columna clave: {', '.join(faltan)}")
+    campos_csv = [por_attname[c] for c in columnas]
+    por_defecto = []
+    for f in model._meta.concrete_fields:
+        if f.attname in columnas or f.primary_key or _es_derivado(f):
+            continue
+        if not f.has_default() and not f.null and not (f.blank and f.empty_strings_allowed):
+            raise ImportacionError(f"Falta la columna obligatoria: {f.attname}")
+        por_defecto.append(f)
+    return campos_csv, por_defecto
+
+
+def _es_derivado(f):
+    """Campos que calcula el modelo al guardar (marcas de tiempo, columnas normalizadas)."""
+    return f in campos_calculados(f.model)
+
+
+def _actualizar_derivados(model, objs):
+    """bulk_update no ejecuta pre_save: recalcula los derivados y devuelve sus nombres."""
+    campos = [f for f in campos_calculados(model) if not getattr(f, "auto_now_add", False)]
+    for obj in objs:
+        for f in campos:
+            f.pre_save(obj, add=False)
+    return [f.name for f in campos]
+
+
+def _obligatorio(f):
+    return not f.primary_key and not f.null and not f.has_default() and not f.blank
+
+
+# =========================================================
+# PostgreSQL: COPY + INSERT ... SELECT
+# =========================================================
+class _LectorConProgreso:
+    """Envuelve el archivo para informar bytes leídos durante el COPY."""
+
+    def __init__(self, archivo, progreso, cada=8 * 1024 * 1024):
+        self.archivo, self.progreso, self.cada = archivo, progreso, cada
+        self.leidos, self._proximo = 0, cada
+
+    def read(self, size=-1):
+        datos = self.archivo.read(size)
+        self.leidos += len(datos)
+        if self.progreso and self.leidos >= self._proximo:
+            self.progreso(f"COPY: {self.leidos / 1024 / 1024:.0f} MB leídos")
+            self._proximo += self.cada
+        return datos
+
+    def readline(self, size=-1):
+        return self.archivo.readline(size)
+
+
+def _copy(cursor, sql, archivo):
+    raw = cursor.cursor
+    if hasattr(raw, "copy_expert"):  # psycopg2
+        raw.copy_expert(sql, archivo)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            while datos := archivo.read(1024 * 1024):
+                copy.write(datos)
+
+
+def _clave_unica(cursor, model, clave):
+    """¿Hay una PK/UNIQUE exactamente sobre las columnas de la clave? (lo exige ON CONFLICT)"""
+    restricciones = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return any(r["unique"] and set(r["columns"]) == set(clave) for r in restricciones.values())
+
+
+# Formatos aceptados por tipo cuando el servidor no tiene pg_input_is_valid
+# (PostgreSQL < 16). Son aproximados: p.ej. no descartan un 2025-02-30.
+_FORMATOS = {
+    "smallint": r"^\s*[+-]?\d+\s*$",
+    "integer": r"^\s*[+-]?\d+\s*$",
+    "bigint": r"^\s*[+-]?\d+\s*$",
+    "numeric": r"^\s*[+-]?(\d+\.?\d*|\.\d+)(e[+-]?\d+)?\s*$",
+    "double precision": r"^\s*[+-]?(\d+\.?\d*|\.\d+)(e[+-]?\d+)?\s*$",
+    "date": r"^\s*\d{4}-(0?[1-9]|1[0-2])-(0?[1-9]|[12]\d|3[01])\s*$",
+    "timestamp with time zone": (
+        r"^\s*\d{4}-(0?[1-9]|1[0-2])-(0?[1-9]|[12]\d|3[01])"
+        r"([ t]([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?)?\s*(z|[+-]\d{2}(:?\d{2})?)?\s*$"
+    ),
+    "boolean": r"^\s*(t|true|f|false|y|yes|n|no|on|off|1|0)\s*$",
+}
+
+
+def _valido(f, col):
+    """
+    Condición SQL "el texto de `col` se puede convertir al tipo de `f`"
+    (vacío cuenta como válido: eso lo controla la condición de obligatorio).
+    None si el campo es texto o no hay cómo comprobarlo.
+    """
+    if f.empty_strings_allowed:
+        return None
+    tipo = f.cast_db_type(connection)
+    if connection.pg_version >= 160000:
+        return f"(COALESCE({col}, '') = '' OR pg_input_is_valid({col}, '{tipo}'))"
+    formato = _FORMATOS.get(re.sub(r"\(.*\)", "", tipo).strip())
+    return f"(COALESCE({col}, '') = '' OR {col} ~* '{formato}')" if formato else None
+
+
+def _importar_postgres(recurso, archivo, columnas, actualizar, progreso):
+    model = recurso.model
+    tabla = connection.ops.quote_name(model._meta.db_table)
+    qn = connection.ops.quote_name
+    campos_csv, por_defecto = _campos(recurso, columnas)
+    res = Resultado()
+
+    def expr(f):
+        col = f"s.{qn(f.attname)}"
+        if f.empty_strings_allowed:
+            return f"COALESCE({col}, '')"
+        return f"CAST(NULLIF({col}, '') AS {f.cast_db_type(connection)})"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Si esto corre dentro de otra transacción, ON COMMIT DROP aún no borró la anterior
+        cursor.execute("DROP TABLE IF EXISTS clinica_import_stg")
+        cursor.execute(
+            f"CREATE TEMP TABLE clinica_import_stg ("
+            f"{', '.join(f'{qn(c)} text' for c in columnas)}, _fila bigserial) ON COMMIT DROP"
+        )
+        _copy(
+            cursor,
+            f"COPY clinica_import_stg ({', '.join(qn(c) for c in columnas)}) FROM STDIN WITH (FORMAT csv)",
+            _LectorConProgreso(archivo, progreso),
+        )
+        cursor.execute("SELECT count(*) FROM clinica_import_stg")
+        res.leidas = cursor.fetchone()[0]
+        if progreso:
+            progreso(f"COPY: {res.leidas} filas en staging")
+
+        # Validación set-based: una condición por campo obligatorio y por FK, y
+        # una para los valores que no se pueden convertir (sin ella, un solo
+        # CAST inválido abortaría toda la importación con DataError)
+        condiciones = {}
+        for f in campos_csv:
+            if _obligatorio(f) or f.attname in recurso.clave:
+                condiciones[f"{f.attname} vacío"] = f"COALESCE(s.{qn(f.attname)}, '') <> ''"
+        validos = {f.attname: v for f in campos_csv if (v := _valido(f, f"s.{qn(f.attname)}"))}
+        if validos:
+            condiciones["valor inválido"] = " AND ".join(validos.values())
+        for columna, destino in recurso.fks.items():
+            if columna in columnas:
+                existe = (
+                    f"EXISTS (SELECT 1 FROM {qn(destino._meta.db_table)} d "
+                    f"WHERE d.{qn(destino._meta.pk.column)} = CAST(NULLIF(s.{qn(columna)}, '') AS bigint))"
+                )
+                # Un id que no es número ya cuenta como "valor inválido" (y no se castea)
+                condiciones[f"{columna} inexistente"] = (
+                    f"CASE WHEN {validos[columna]} THEN {existe} ELSE TRUE END" if columna in validos else existe
+                )
+        for motivo, condicion in condiciones.items():
+            cursor.execute(f"SELECT count(*) FROM clinica_import_stg s WHERE NOT ({condicion})")
+            rechazadas = cursor.fetchone()[0]
+            if rechazadas:
+                res.rechazadas[motivo] = rechazadas
+        where = " AND ".join(condiciones.values()) or "TRUE"
+
+        clave = ", ".join(qn(c) for c in recurso.clave)
+        derivados = campos_calculados(model)
+        destino = [qn(f.column) for f in campos_csv + por_defecto + derivados]
+        origen = [expr(f) for f in campos_csv] + [f"CAST(%s AS {f.cast_db_type(connection)})" for f in por_defecto]
+        params = [f.get_db_prep_save(f.get_default(), connection) for f in por_defecto]
+        for f in derivados:
+            if isinstance(f, DateTimeField):
+                origen.append("NOW()")
+                continue
+            fuentes = []
+            for nombre in f.fuentes:
+                fuente = model._meta.get_field(nombre)
+                if fuente in campos_csv:
+                    fuentes.append(expr(fuente))
+                else:
+                    fuentes.append("%s")
+                    params.append(fuente.get_db_prep_save(fuente.get_default(), connection))
+            origen.append(f.expresion_sql(*fuentes))
+        clave_stg = ", ".join(f"s.{qn(c)}" for c in recurso.clave)
+        validas = f"""
+            SELECT DISTINCT ON ({clave_stg}) {', '.join(f'{o} AS {d}' for o, d in zip(origen, destino))}
+            FROM clinica_import_stg s
+            WHERE {where}
+            ORDER BY {clave_stg}, s._fila DESC
+        """
+        actualizables = [f for f in campos_csv if f.attname not in recurso.clave]
+        actualizables += [f for f in derivados if not getattr(f, "auto_now_add", False)]
+        if _clave_unica(cursor, model, recurso.clave):
+            if actualizar:
+                asignaciones = ", ".join(f"{qn(f.column)} = EXCLUDED.{qn(f.column)}" for f in actualizables)
+                conflicto = f"ON CONFLICT ({clave}) DO UPDATE SET {asignaciones}"
+            else:
+                conflicto = f"ON CONFLICT ({clave}) DO NOTHING"
+            escrituras = f"""
+                escritas AS (
+                    INSERT INTO {tabla} ({', '.join(destino)})
+                    SELECT * FROM validas
+                    {conflicto}
+                    RETURNING (xmax = 0) AS nueva
+                )
+            """
+            conteos = "count(*) FILTER (WHERE nueva), count(*) FILTER (WHERE NOT nueva) FROM escritas"
+        else:
+            # Sin índice único sobre la clave no hay ON CONFLICT (p.ej. consultas
+            # particionadas, PK (id, fecha_consulta)): UPDATE de las existentes
+            # e INSERT del resto, ambos sobre la foto previa de la tabla.
+            misma_clave = " AND ".join(f"t.{qn(c)} = v.{qn(c)}" for c in recurso.clave)
+            asignaciones = ", ".join(f"{qn(f.column)} = v.{qn(f.column)}" for f in actualizables)
+            escrituras = f"""
+                nuevas AS (
+                    INSERT INTO {tabla} ({', '.join(destino)})
+                    SELECT * FROM validas v WHERE NOT EXISTS (SELECT 1 FROM {tabla} t WHERE {misma_clave})
+                    RETURNING 1
+                ), cambiadas AS (
+                    {f"UPDATE {tabla} t SET {asignaciones} FROM validas v WHERE {misma_clave} RETURNING 1"
+                     if actualizar else "SELECT 1 WHERE FALSE"}
+                )
+            """
+            conteos = "(SELECT count(*) FROM nuevas), (SELECT count(*) FROM cambiadas)"
+        cursor.execute(
+            f"""
+            WITH validas AS ({validas}), {escrituras}
+            SELECT
+                (SELECT count(*) FROM clinica_import_stg s WHERE {where}),
+                (SELECT count(*) FROM validas),
+                {conteos}
+            """,
+            params,
+        )
+        validas, distintas, res.insertadas, res.actualizadas = cursor.fetchone()
+        res.duplicadas = validas - distintas
+        res.omitidas = distintas - res.insertadas - res.actualizadas
+
+        if "id" in columnas:
+            # Se insertaron ids explícitos: adelantar la secuencia
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+    return res
+
+
+# =========================================================
+# Otros motores: lotes con bulk_create / bulk_update
+# =========================================================
+def _importar_por_lotes(recurso, archivo, columnas, actualizar, progreso, batch_size):
+    model = recurso.model
+    campos_csv, _ = _campos(recurso, columnas)
+    res = Resultado()
+    # Claves ya procesadas en esta importación -> True si quedaron escritas
+    # (insertadas/actualizadas) o False si se omitieron. Permite que, igual
+    # que en PostgreSQL, la última aparición de una clave repetida gane.
+    procesadas = {}
+
+    def clave_de(obj):
+        return tuple(getattr(obj, c) for c in recurso.clave)
+
+    def rechazar(motivo):
+        res.rechazadas[motivo] = res.rechazadas.get(motivo, 0) + 1
+
+    def convertir(fila):
+        obj = model()
+        for f in campos_csv:
+            valor = fila[f.attname]
+            if valor in ("", None):
+                if _obligatorio(f) or f.attname in recurso.clave:
+                    rechazar(f"{f.attname} vacío")
+                    return None
+                valor = f.get_default()
+            else:
+                valor = f.to_python(valor)
+                if isinstance(valor, datetime) and timezone.is_naive(valor):
+                    valor = timezone.make_aware(valor, dt_timezone.utc)  # igual que el cast en PostgreSQL
+            setattr(obj, f.attname, valor)
+        return obj
+
+    def procesar(lote):
+        # 1) convertir y validar campos obligatorios; dentro del lote gana la última
+        objetos = {}
+        for fila in lote:
+            try:
+                obj = convertir(fila)
+            except ValidationError:
+                rechazar("valor inválido")
+                continue
+            if obj is None:
+                continue
+            if clave_de(obj) in objetos:
+                res.duplicadas += 1
+            objetos[clave_de(obj)] = obj
+
+        # 2) FKs: una query por columna para todo el lote
+        for columna, destino in recurso.fks.items():
+            if columna not in columnas:
+                continue
+            ids = {getattr(o, columna) for o in objetos.values()}
+            existentes = set(destino.objects.filter(pk__in=ids).values_list("pk", flat=True))
+            for k in [k for k, o in objetos.items() if getattr(o, columna) not in existentes]:
+                del objetos[k]
+                rechazar(f"{columna} inexistente")
+
+        # 3) separar nuevas / existentes según la clave (una query por lote)
+        filtro = {f"{recurso.clave[0]}__in": [k[0] for k in objetos]}
+        existentes = {clave_de(o): o.pk for o in model.objects.filter(**filtro).only(*recurso.clave)}
+        nuevas, cambios = [], []
+        for k, obj in objetos.items():
+            if k in procesadas:
+                res.duplicadas += 1          # ya apareció en un lote anterior
+                escribir = procesadas[k]
+            else:
+                escribir = k not in existentes or actualizar
+                if k in existentes:
+                    if actualizar:
+                        res.actualizadas += 1
+                    else:
+                        res.omitidas += 1
+                procesadas[k] = escribir
+            if not escribir:
+                continue
+            if k in existentes:
+                obj.pk = existentes[k]
+                cambios.append(obj)
+            else:
+                nuevas.append(obj)
+        model.objects.bulk_create(nuevas, batch_size=batch_size)
+        res.insertadas += len(nuevas)
+        if cambios:
+            campos = [f.name for f in campos_csv if f.attname not in recurso.clave and not f.primary_key]
+            campos += _actualizar_derivados(model, cambios)
+            model.objects.bulk_update(cambios, campos, batch_size=batch_size)
+
+    lector = csv.DictReader(archivo, fieldnames=columnas)
+    inicio = time.monotonic()
+    with transaction.atomic():
+        lote = []
+        for fila in lector:
+            lote.append(fila)
+            res.leidas += 1
+            if len(lote) >= batch_size:
+                procesar(lote)
+                lote = []
+                if progreso:
+                    segundos = time.monotonic() - inicio
+                    progreso(f"{res.leidas} filas ({res.leidas / segundos:,.0f} filas/s)")
+        if lote:
+            procesar(lote)
+        if "id" in columnas:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                    cursor.execute(sql)
+    return res
+
+
+def importar_csv(nombre_recurso, archivo, actualizar=False, progreso=None, batch_size=5000):
+    """
+    Importa `archivo` (objeto de texto con encabezado CSV) al recurso indicado.
+    `progreso` es un callable opcional que recibe mensajes de avance.
+    """
+    if nombre_recurso not in RECURSOS:
+        raise ImportacionError(f"Recurso desconocido: {nombre_recurso}. Opciones: {', '.join(RECURSOS)}")
+    recurso = RECURSOS[nombre_recurso]
+    encabezado = next(csv.reader(StringIO(archivo.readline())), None)
+    if not encabezado:
+        raise ImportacionError("El archivo está vacío o no tiene encabezado.")
+    columnas = [c.strip() for c in encabezado]
+
+    inicio = time.monotonic()
+    if connection.vendor == "postgresql":
+        res = _importar_postgres(recurso, archivo, columnas, actualizar, progreso)
+    else:
+        res = _importar_por_lotes(recurso, archivo, columnas, actualizar, progreso, batch_size)
+    res.segundos = time.monotonic() - inicio
+    if recurso.model in cache.CATALOGOS:
+        cache.invalidar(recurso.model)  # ni COPY ni bulk_create emiten post_save
+    if recurso.model is ConsultaMedica and (res.insertadas or res.actualizadas):
+        # Sin signals ni valores anteriores: se recalcula el resumen completo
+        resumenes.reconstruir()
+    return res
@@ -0,0 +1,126 @@
+# EVA2/clinica/lectura.py
+# ---------------------------------------------------------
+# Camino rápido de lectura para los list de la API.
+# - En vez de instanciar un modelo por fila y pasar cada campo por
+#   ModelSerializer.to_representation, se lee con values() y se arma cada
+#   fila con una lista de "columnas" precompiladas una vez por request:
+#   (nombre de salida, clave en values(), conversor o None).
+# - Los conversores hacen lo mismo que el to_representation de cada campo
+#   (fechas, decimales, choices), así la salida es idéntica. Las fechas
+#   con hora en ISO 8601, que son la mayoría de las columnas (created_at,
+#   updated_at), usan una versión con la zona horaria ya resuelta.
+#   Los campos que ya salen de la BD en su forma final (texto, enteros,
+#   booleanos, ids de FK) se copian tal cual.
+# - Si el serializer tiene algo que no se puede resolver desde una fila
+#   (anidados de ?expand=, SerializerMethodField, source con ".", un
+#   to_representation propio) se usa el camino normal.
+# - values() devuelve dicts: la paginación por cursor lee la posición
+#   desde el dict, así que funciona igual.
+# ---------------------------------------------------------
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metricas import medir
+from .pagination import orden_estable
+
+# Campos cuyo valor de BD ya es su representación JSON
+SIN_CONVERSION = (
+    serializers.CharField, serializers.IntegerField,
+    serializers.BooleanField, serializers.PrimaryKeyRelatedField,
+)
+# Campos que se convierten con su propio to_representation
+CON_CONVERSION = (
+    serializers.DateTimeField, serializers.DateField, serializers.TimeField,
+    serializers.DecimalField, serializers.FloatField, serializers.ChoiceField,
+    serializers.UUIDField, serializers.DurationField,
+)
+
+
+def _fecha_hora(campo):
+    """DateTimeField.to_representation con el formato y la zona resueltos una vez."""
+    formato = getattr(campo, "format", api_settings.DATETIME_FORMAT)
+    zona = campo.timezone if hasattr(campo, "timezone") else campo.default_timezone()
+    if formato is None or formato.lower() != ISO_8601 or zona is None:
+        return campo.to_representation
+
+    def convertir(valor):
+        if valor.tzinfo is None:
+            return campo.to_representation(valor)
+        texto = valor.astimezone(zona).isoformat()
+        return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+    return convertir
+
+
+def _choice(campo):
+    """ChoiceField.to_representation: devuelve la clave de la opción."""
+    opciones = campo.choice_strings_to_values
+    return lambda valor: opciones.get(str(valor), valor)
+
+
+def conversor(campo):
+    if isinstance(campo, serializers.DateTimeField):
+        return _fecha_hora(campo)
+    if isinstance(campo, serializers.ChoiceField) and not isinstance(campo, serializers.MultipleChoiceField):
+        return _choice(campo)
+    return campo.to_representation
+
+
+def compilar(serializer):
+    """
+    [(nombre, clave, conversor)] para armar filas desde values(), o None si
+    algún campo necesita el serializer completo.
+    """
+    if type(serializer).to_representation is not serializers.ModelSerializer.to_representation:
+        return None
+    columnas = []
+    for campo in serializer._readable_fields:
+        if campo.source == "*" or "." in campo.source:
+            return None
+        if isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is not None:
+            return None
+        if isinstance(campo, CON_CONVERSION):
+            columnas.append((campo.field_name, campo.source, conversor(campo)))
+        elif isinstance(campo, SIN_CONVERSION):
+            columnas.append((campo.field_name, campo.source, None))
+        else:
+            return None
+    return columnas
+
+
+def filas(valores, columnas):
+    """Dicts de salida (mismo formato que serializer.data) desde filas de values()."""
+    salida = []
+    agregar = salida.append
+    for fila in valores:
+        item = {}
+        for nombre, clave, convertir in columnas:
+            valor = fila[clave]
+            item[nombre] = valor if convertir is None or valor is None else convertir(valor)
+        agregar(item)
+    return salida
+
+
+def valores(queryset, columnas):
+    """values() con las columnas del serializer y las del orden (las lee el cursor)."""
+    claves = {clave for _, clave, _ in columnas}
+    claves.update(c.lstrip("-") for c in orden_estable(queryset) if "__" not in c)
+    return queryset.values(*claves)
+
+
+class LecturaRapidaMixin:
+    """list() desde values() cuando el serializer lo permite (lectura_rapida = False lo apaga)."""
+    lectura_rapida = True
+
+    def list(self, request, *args, **kwargs):
+        columnas = compilar(self.get_serializer()) if self.lectura_rapida else None
+        if columnas is None:
+            return super().list(request, *args, **kwargs)
+        queryset = valores(self.filter_queryset(self.get_queryset()), columnas)
+        pagina = self.paginate_queryset(queryset)
+        with medir("serializacion"):
+            datos = filas(pagina if pagina is not None else queryset, columnas)
+        if pagina is not None:
+            return self.get_paginated_response(datos)
+        return Response(datos)
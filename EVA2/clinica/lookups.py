@@ -0,0 +1,85 @@
+# EVA2/clinica/lookups.py
+# ---------------------------------------------------------
+# Búsquedas para los autocompletados de los formularios web
+# (GET /clinica/lookup/<recurso>/?q=...&page=N, ver views_web.LookupView).
+# Cada recurso define su queryset base, cómo filtrar por texto y el orden.
+# Las páginas son chicas y se piden de a una: nunca se lee la tabla entera.
+# ---------------------------------------------------------
+
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db.models import Q
+
+from .busqueda import filtrar_pacientes, normalizar_texto
+from .models import Paciente, Medico, ConsultaMedica, Tratamiento
+
+POR_PAGINA = 20
+
+
+def _por_id(queryset, q, campo="pk"):
+    return queryset.filter(**{campo: int(q)}) if q.isdigit() else None
+
+
+def _pacientes(queryset, q):
+    return filtrar_pacientes(queryset, q)
+
+
+def _medicos(queryset, q):
+    for palabra in q.split():
+        queryset = queryset.filter(
+            Q(nombre__icontains=palabra) | Q(apellido__icontains=palabra) | Q(rut__istartswith=palabra)
+        )
+    return queryset
+
+
+def _consultas(queryset, q):
+    # "123" -> consulta 123; texto -> nombre del paciente (sin tildes)
+    por_id = _por_id(queryset, q)
+    if por_id is not None:
+        return por_id
+    for palabra in normalizar_texto(q).split():
+        queryset = queryset.filter(paciente__nombre_busqueda__contains=palabra)
+    return queryset
+
+
+def _tratamientos(queryset, q):
+    # "123" -> tratamiento 123 o los de la consulta 123
+    if q.isdigit():
+        return queryset.filter(Q(pk=int(q)) | Q(consulta_id=int(q)))
+    return queryset.filter(descripcion__icontains=q)
+
+
+@dataclass(frozen=True)
+class Lookup:
+    model: type
+    filtrar: Callable
+    orden: tuple
+    select_related: tuple = ()
+
+    def queryset(self):
+        return self.model.objects.select_related(*self.select_related)
+
+
+LOOKUPS = {
+    "pacientes": Lookup(Paciente, _pacientes, ("apellido", "nombre", "pk")),
+    "medicos": Lookup(Medico, _medicos, ("apellido", "nombre", "pk")),
+    "consultas": Lookup(ConsultaMedica, _consultas, ("-fecha_consulta", "-pk"), ("paciente",)),
+    "tratamientos": Lookup(Tratamiento, _tratamientos, ("-pk",)),
+}
+
+
+def buscar(recurso, q, pagina=1):
+    """
+    Devuelve (resultados, hay_mas) para la página pedida.
+    resultados: [{"id": pk, "text": str(obj)}]
+    """
+    lookup = LOOKUPS[recurso]
+    queryset = lookup.queryset()
+    q = (q or "").strip()
+    if q:
+        queryset = lookup.filtrar(queryset, q)
+    inicio = (pagina - 1) * POR_PAGINA
+    # Una fila extra para saber si hay otra página sin hacer COUNT(*)
+    objetos = list(queryset.order_by(*lookup.orden)[inicio:inicio + POR_PAGINA + 1])
+    return [{"id": obj.pk, "text": str(obj)} for obj in objetos[:POR_PAGINA]], len(objetos) > POR_PAGINA
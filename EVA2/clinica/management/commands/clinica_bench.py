@@ -0,0 +1,127 @@
+# EVA2/clinica/management/commands/clinica_bench.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_bench [--requests 200] [--concurrencia 20]
+#        [--solo consultas,web] [--salida bench.json] [--comparar base.json]
+# Benchmark de punta a punta: recorre escenarios de la API (síncrona y
+# async) y de las vistas web, dentro del proceso (clinica/benchmark.py),
+# y reporta req/s y latencias p50/p90/p95/p99/max por escenario.
+# - Usa los datos que haya en la BD; para volumen de producción cargar
+#   antes con seed_clinica (misma semilla -> corridas comparables).
+# - --salida guarda los resultados en JSON (con el motor de BD, las
+#   filas por tabla y los parámetros); --comparar muestra la variación de
+#   req/s y p95 contra una corrida guardada.
+# ---------------------------------------------------------
+
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from clinica.benchmark import PERCENTILES, medir, pedir, silenciar_log_por_request
+from clinica.models import ConsultaMedica, Especialidad, Medicamento, Medico, Paciente, RecetaMedica
+
+
+def escenarios(page_size):
+    """(nombre, ruta, query). Los ids de muestra se toman de la BD."""
+    paciente = Paciente.objects.order_by("id").values("pk", "apellido").first()
+    consulta = ConsultaMedica.objects.order_by("-id").values_list("pk", flat=True).first()
+    medico = Medico.objects.order_by("id").values_list("pk", flat=True).first()
+    especialidad = Especialidad.objects.order_by("id").values_list("pk", flat=True).first()
+    if None in (paciente, consulta, medico, especialidad):
+        raise CommandError("Faltan datos: carga la BD antes (p.ej. con seed_clinica).")
+    pagina = f"page_size={page_size}"
+    return [
+        ("api pacientes", "/api/pacientes/", pagina),
+        ("api pacientes buscar", "/api/pacientes/buscar/", f"q={paciente['apellido'][:4]}"),
+        ("api paciente historial", f"/api/pacientes/{paciente['pk']}/historial/", ""),
+        ("api consultas", "/api/consultas/", pagina),
+        ("api consultas por medico", "/api/consultas/", f"{pagina}&medico={medico}"),
+        ("api consulta", f"/api/consultas/{consulta}/", ""),
+        ("api medicamentos", "/api/medicamentos/", pagina),
+        ("api agenda slots", "/api/agenda/slots/", f"especialidad={especialidad}"),
+        ("api dashboard", "/api/dashboard/consultas/", ""),
+        ("api facturacion", "/api/facturacion/", f"medico={medico}"),
+        ("async consultas", "/api/async/consultas/", pagina),
+        ("async paciente historial", f"/api/async/pacientes/{paciente['pk']}/historial/", ""),
+        ("web inicio", "/clinica/", ""),
+        ("web pacientes", "/clinica/pacientes/", ""),
+        ("web consultas", "/clinica/consultas/", ""),
+        ("web recetas", "/clinica/recetas/", ""),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark en proceso de la API y las vistas web; guarda y compara resultados en JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests por escenario (default: 200).")
+        parser.add_argument("--concurrencia", type=int, default=20, help="Requests simultáneos (default: 20).")
+        parser.add_argument("--page-size", type=int, default=50, help="Filas por página en las listas (default: 50).")
+        parser.add_argument("--solo", help="Sólo escenarios cuyo nombre contenga alguno de estos textos (coma).")
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior contra el cual comparar.")
+
+    def handle(self, *args, **options):
+        base = None
+        if options["comparar"]:
+            try:
+                base = json.loads(Path(options["comparar"]).read_text(encoding="utf-8"))["resultados"]
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {exc}")
+        lista = escenarios(options["page_size"])
+        if options["solo"]:
+            filtros = [f.strip() for f in options["solo"].split(",") if f.strip()]
+            lista = [e for e in lista if any(f in e[0] for f in filtros)]
+            if not lista:
+                raise CommandError("--solo no coincide con ningún escenario.")
+
+        total, concurrencia = max(options["requests"], 1), max(options["concurrencia"], 1)
+        resultados = asyncio.run(self._correr(lista, total, concurrencia))
+        self._imprimir(resultados, base)
+
+        if options["salida"]:
+            corrida = {
+                "fecha": timezone.now().isoformat(),
+                "motor": connection.vendor,
+                "filas": {
+                    m._meta.model_name: m.objects.count()
+                    for m in (Paciente, Medico, ConsultaMedica, RecetaMedica, Medicamento)
+                },
+                "parametros": {"requests": total, "concurrencia": concurrencia, "page_size": options["page_size"]},
+                "resultados": resultados,
+            }
+            Path(options["salida"]).write_text(json.dumps(corrida, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    async def _correr(self, lista, total, concurrencia):
+        app = get_asgi_application()
+        silenciar_log_por_request()  # después: get_asgi_application() reconfigura el logging
+        resultados = {}
+        for nombre, ruta, query in lista:
+            await pedir(app, ruta, query)  # calentamiento (imports, caché, plantillas)
+            resultados[nombre] = {"ruta": ruta, "query": query, **await medir(app, ruta, query, total, concurrencia)}
+        return resultados
+
+    def _imprimir(self, resultados, base):
+        columnas = ["rps", *(f"p{p}" for p in PERCENTILES), "max", "errores"]
+        encabezado = f"{'escenario':<28}" + "".join(f"{c:>9}" for c in columnas)
+        if base is not None:
+            encabezado += f"{'Δ req/s':>10}{'Δ p95':>9}"
+        self.stdout.write(encabezado)
+        for nombre, r in resultados.items():
+            linea = f"{nombre:<28}" + "".join(f"{r[c]:>9}" for c in columnas)
+            anterior = (base or {}).get(nombre)
+            if anterior:
+                linea += f"{_variacion(r['rps'], anterior['rps']):>10}{_variacion(r['p95'], anterior['p95']):>9}"
+            estilo = self.style.ERROR if r["errores"] else (lambda texto: texto)
+            self.stdout.write(estilo(linea))
+
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return "-"
+    return f"{(actual - anterior) / anterior * 100:+.0f}%"
@@ -0,0 +1,97 @@
+# EVA2/clinica/management/commands/clinica_bench_facturacion.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_bench_facturacion [--meses 12] [--repeticiones 3] [--lote 5000]
+# Compara el reporte de facturación de clinica/facturacion.py (una query
+# SQL agrupada + NumPy) con el cálculo receta por receta en Python (todas las
+# recetas del período con select_related y la posología interpretada en
+# cada fila), sobre los datos que haya en la BD: cargar antes con
+# seed_clinica. Verifica que ambos den los mismos totales por grupo.
+# ---------------------------------------------------------
+
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, time as hora
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from clinica import facturacion, particiones
+from clinica.models import PacienteSeguro, RecetaMedica
+
+
+def por_fila(desde, hasta):
+    """Referencia: {(seguro, mes, medico): [recetas, sin_posologia, costo, cubierto]}."""
+    vigentes = {}
+    for afiliacion in PacienteSeguro.objects.filter(vigente=True).order_by("-cobertura_porcentaje", "-seguro_id"):
+        vigentes[afiliacion.paciente_id] = afiliacion  # queda la de mayor cobertura
+    grupos = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    recetas = (
+        RecetaMedica.objects.select_related("medicamento", "tratamiento__consulta")
+        .filter(tratamiento__consulta__fecha_consulta__gte=desde, tratamiento__consulta__fecha_consulta__lt=hasta)
+    )
+    for receta in recetas.iterator(chunk_size=2000):
+        consulta = receta.tratamiento.consulta
+        afiliacion = vigentes.get(consulta.paciente_id)
+        precio = float(receta.medicamento.precio_unitario)
+        unidades = facturacion.tomas_por_dia(receta.frecuencia) * facturacion.dias(receta.duracion)
+        costo = precio * receta.cantidad if math.isnan(unidades) else precio * unidades
+        cobertura = min(max(afiliacion.cobertura_porcentaje, 0), 100) if afiliacion else 0
+        mes = f"{timezone.localtime(consulta.fecha_consulta):%Y-%m}"
+        grupo = grupos[(afiliacion.seguro_id if afiliacion else None, mes, consulta.medico_id)]
+        grupo[0] += 1
+        grupo[1] += math.isnan(unidades)
+        grupo[2] += costo
+        grupo[3] += costo * cobertura / 100
+    return grupos
+
+
+class Command(BaseCommand):
+    help = "Mide el reporte de facturación (SQL + NumPy) contra el cálculo receta por receta."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=12, help="Meses hacia atrás desde hoy (default: 12).")
+        parser.add_argument("--repeticiones", type=int, default=3, help="Se reporta la mejor (default: 3).")
+        parser.add_argument("--lote", type=int, default=5000, help="Filas por lote del motor (default: 5000).")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        desde = timezone.make_aware(datetime.combine(
+            particiones.sumar_meses(hoy.replace(day=1), 1 - max(options["meses"], 1)), hora.min,
+        ))
+        hasta = timezone.make_aware(datetime.combine(particiones.sumar_meses(hoy.replace(day=1), 1), hora.min))
+        recetas = RecetaMedica.objects.filter(
+            tratamiento__consulta__fecha_consulta__gte=desde, tratamiento__consulta__fecha_consulta__lt=hasta,
+        ).count()
+        if not recetas:
+            raise CommandError("No hay recetas en el período: carga la BD antes (p.ej. con seed_clinica).")
+        repeticiones = max(options["repeticiones"], 1)
+
+        t_fila, referencia = self._mejor(lambda: por_fila(desde, hasta), repeticiones)
+        t_motor, filas = self._mejor(
+            lambda: list(facturacion.reporte(desde, hasta, lote=options["lote"])), repeticiones,
+        )
+        self._comparar(referencia, filas)
+        self.stdout.write(f"Recetas: {recetas:,} en {len(filas):,} grupos (seguro, mes, médico), mejor de {repeticiones}")
+        self.stdout.write(f"  por fila    : {t_fila * 1000:10.1f} ms")
+        self.stdout.write(f"  SQL + NumPy : {t_motor * 1000:10.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  aceleración : x{t_fila / t_motor:.1f} (mismos totales)"))
+
+    def _mejor(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos), resultado
+
+    def _comparar(self, referencia, filas):
+        motor = {(f["seguro"], f["mes"], f["medico"]): f for f in filas}
+        if motor.keys() != referencia.keys():
+            raise CommandError("El motor no produce los mismos grupos que el cálculo por fila.")
+        for clave, (recetas, sin_posologia, costo, cubierto) in referencia.items():
+            fila = motor[clave]
+            if (fila["recetas"], fila["sin_posologia"]) != (recetas, sin_posologia) or not (
+                math.isclose(fila["costo"], costo, abs_tol=0.01) and math.isclose(fila["cubierto"], cubierto, abs_tol=0.01)
+            ):
+                raise CommandError(f"Totales distintos en {clave}: {fila} vs {referencia[clave]}.")
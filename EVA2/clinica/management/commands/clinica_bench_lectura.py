@@ -0,0 +1,85 @@
+# EVA2/clinica/management/commands/clinica_bench_lectura.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_bench_lectura [--filas 10000] [--repeticiones 5]
+# Compara, para una página de /api/consultas/, el camino normal
+# (modelos + ConsultaMedicaSerializer) con el camino rápido de
+# clinica/lectura.py (values() + conversores), incluyendo el render JSON.
+# Crea las filas dentro de una transacción que se revierte al final.
+# Verifica que ambos caminos produzcan exactamente el mismo JSON.
+# ---------------------------------------------------------
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from clinica import lectura
+from clinica.models import ConsultaMedica, Especialidad, Medico, Paciente
+from clinica.views import ConsultaMedicaViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mide el list de consultas con serializer vs. el camino rápido de lectura.py."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=10000, help="Filas por página (default: 10000).")
+        parser.add_argument("--repeticiones", type=int, default=5, help="Se reporta la mejor (default: 5).")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._crear_filas(options["filas"])
+                self._medir(options["filas"], max(options["repeticiones"], 1))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _crear_filas(self, n):
+        esp = Especialidad.objects.create(nombre="Bench lectura")
+        medico = Medico.objects.create(nombre="Bench", apellido="Lectura", rut="99999999-9",
+                                       correo="bench@saludvital.cl", especialidad=esp)
+        paciente = Paciente.objects.create(rut="99999999-9", nombre="Bench", apellido="Lectura",
+                                           fecha_nacimiento=date(1990, 1, 1))
+        ahora = timezone.now()
+        ConsultaMedica.objects.bulk_create(
+            (ConsultaMedica(paciente=paciente, medico=medico, motivo=f"Control {i}",
+                            fecha_consulta=ahora - timedelta(minutes=i), created_at=ahora, updated_at=ahora)
+             for i in range(n)),
+            batch_size=1000,
+        )
+        self.queryset = ConsultaMedicaViewSet.queryset.filter(medico=medico)
+
+    def _mejor(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos), resultado
+
+    def _medir(self, n, repeticiones):
+        serializer_class = ConsultaMedicaViewSet.serializer_class
+        renderer = JSONRenderer()
+        columnas = lectura.compilar(serializer_class())
+
+        def normal():
+            return renderer.render(serializer_class(list(self.queryset[:n]), many=True).data)
+
+        def rapido():
+            return renderer.render(lectura.filas(lectura.valores(self.queryset, columnas)[:n], columnas))
+
+        t_normal, json_normal = self._mejor(normal, repeticiones)
+        t_rapido, json_rapido = self._mejor(rapido, repeticiones)
+        if json_normal != json_rapido:
+            raise CommandError("El camino rápido no produce el mismo JSON que el serializer.")
+        self.stdout.write(f"Filas por página: {n} (mejor de {repeticiones})")
+        self.stdout.write(f"  serializer : {t_normal * 1000:8.1f} ms")
+        self.stdout.write(f"  values()   : {t_rapido * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  aceleración: x{t_normal / t_rapido:.1f} (JSON idéntico)"))
@@ -0,0 +1,60 @@
+# EVA2/clinica/management/commands/clinica_carga.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_carga [--requests 500] [--concurrencia 50] [--page-size 50]
+# Prueba de carga de las lecturas: API síncrona (/api/...) vs. async
+# (/api/async/..., clinica/views_async.py), sobre la misma BD.
+# - Llama a la aplicación ASGI dentro del proceso (clinica/benchmark.py):
+#   mide el costo del stack Django/DRF + ORM, no del servidor.
+# - Para cada par de rutas envía N requests con C concurrentes y reporta
+#   req/s, p50 y p95. Usa los datos que haya en la BD (ver seed_clinica).
+# Para medir con un servidor real: uvicorn salud_vital.asgi:application
+# y una herramienta externa (hey, wrk) contra las mismas rutas.
+# ---------------------------------------------------------
+
+import asyncio
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+
+from clinica.benchmark import medir, pedir, silenciar_log_por_request
+from clinica.models import Paciente
+
+
+class Command(BaseCommand):
+    help = "Prueba de carga en proceso: lecturas de la API síncrona vs. /api/async/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests por ruta (default: 500).")
+        parser.add_argument("--concurrencia", type=int, default=50, help="Requests simultáneos (default: 50).")
+        parser.add_argument("--page-size", type=int, default=50, help="Filas por página (default: 50).")
+
+    def handle(self, *args, **options):
+        paciente = Paciente.objects.order_by("id").values_list("pk", flat=True).first()
+        if paciente is None:
+            raise CommandError("No hay pacientes: carga datos antes (p.ej. con seed_clinica).")
+        query = f"page_size={options['page_size']}"
+        rutas = [
+            ("pacientes (list)", "/api/pacientes/", query),
+            ("medicos (list)", "/api/medicos/", query),
+            ("consultas (list)", "/api/consultas/", query),
+            ("paciente (retrieve)", f"/api/pacientes/{paciente}/", ""),
+            ("historial", f"/api/pacientes/{paciente}/historial/", ""),
+        ]
+        resultados = asyncio.run(self._correr(rutas, options["requests"], max(options["concurrencia"], 1)))
+        self.stdout.write(
+            f"{options['requests']} requests por ruta, {options['concurrencia']} concurrentes\n"
+            f"{'ruta':<22}{'stack':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errores':>9}"
+        )
+        for nombre, stack, r in resultados:
+            self.stdout.write(f"{nombre:<22}{stack:<7}{r['rps']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['errores']:>9}")
+
+    async def _correr(self, rutas, total, concurrencia):
+        app = get_asgi_application()
+        silenciar_log_por_request()  # después: get_asgi_application() reconfigura el logging
+        resultados = []
+        for nombre, ruta, query in rutas:
+            for stack, prefijo in (("sync", "/api/"), ("async", "/api/async/")):
+                ruta_stack = prefijo + ruta.removeprefix("/api/")
+                await pedir(app, ruta_stack, query)  # calentamiento (imports, caché)
+                resultados.append((nombre, stack, await medir(app, ruta_stack, query, total, concurrencia)))
+        return resultados
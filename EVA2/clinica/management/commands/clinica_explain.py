@@ -0,0 +1,31 @@
+# EVA2/clinica/management/commands/clinica_explain.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_explain [--plan]
+# Corre EXPLAIN sobre las rutas calientes (clinica/explain.py) y
+# verifica que cada una pueda usar el índice esperado (con el seq scan
+# desactivado; no dice qué elige el planner en producción). Sale con
+# error si no.
+# ---------------------------------------------------------
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinica.explain import verificar_indices_aplicables
+
+
+class Command(BaseCommand):
+    help = "Verifica con EXPLAIN que las consultas frecuentes pueden usar los índices de Meta.indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plan", action="store_true", help="Imprime el plan completo de cada consulta.")
+
+    def handle(self, *args, **options):
+        fallas = 0
+        for caso, plan, ok in verificar_indices_aplicables():
+            estilo = self.style.SUCCESS if ok else self.style.ERROR
+            marca = "OK " if ok else "NO "
+            self.stdout.write(estilo(f"{marca} {caso.nombre} -> {caso.indice}"))
+            if options["plan"] or not ok:
+                self.stdout.write(plan)
+            fallas += 0 if ok else 1
+        if fallas:
+            raise CommandError(f"{fallas} consulta(s) no pueden usar el índice esperado.")
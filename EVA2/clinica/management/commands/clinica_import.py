@@ -0,0 +1,57 @@
+# EVA2/clinica/management/commands/clinica_import.py
+# ---------------------------------------------------------
+# Uso:
+#   python manage.py clinica_import pacientes pacientes.csv
+#   python manage.py clinica_import recetas recetas.csv --actualizar
+#   cat medicamentos.csv | python manage.py clinica_import medicamentos -
+# El CSV debe tener encabezado con los nombres de columna del modelo
+# (los FKs como <campo>_id, p.ej. paciente_id). Ver clinica/importacion.py.
+# ---------------------------------------------------------
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinica.importacion import RECURSOS, ImportacionError, importar_csv
+
+
+class Command(BaseCommand):
+    help = "Importa un CSV masivo (COPY en PostgreSQL, bulk_create en otros motores)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("recurso", choices=sorted(RECURSOS))
+        parser.add_argument("archivo", help="Ruta del CSV, o '-' para leer desde stdin.")
+        parser.add_argument(
+            "--actualizar", action="store_true",
+            help="Actualiza las filas cuya clave ya existe (por defecto se omiten).",
+        )
+        parser.add_argument("--batch", type=int, default=5000, help="Filas por lote (sólo sin PostgreSQL).")
+        parser.add_argument("--encoding", default="utf-8")
+
+    def handle(self, *args, **options):
+        archivo = sys.stdin if options["archivo"] == "-" else open(
+            options["archivo"], encoding=options["encoding"], newline=""
+        )
+        try:
+            res = importar_csv(
+                options["recurso"], archivo,
+                actualizar=options["actualizar"],
+                progreso=lambda msg: self.stdout.write(f"  {msg}"),
+                batch_size=options["batch"],
+            )
+        except ImportacionError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if archivo is not sys.stdin:
+                archivo.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['recurso']}: {res.leidas} filas leídas en {res.segundos:.1f}s "
+            f"({res.filas_por_segundo:,.0f} filas/s)"
+        ))
+        self.stdout.write(
+            f"  insertadas={res.insertadas} actualizadas={res.actualizadas} "
+            f"omitidas={res.omitidas} duplicadas={res.duplicadas}"
+        )
+        for motivo, cantidad in sorted(res.rechazadas.items()):
+            self.stdout.write(self.style.WARNING(f"  rechazadas ({motivo}): {cantidad}"))
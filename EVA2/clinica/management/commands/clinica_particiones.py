@@ -0,0 +1,67 @@
+# EVA2/clinica/management/commands/clinica_particiones.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_particiones crear [--meses 3]
+#      python manage.py clinica_particiones archivar [--meses-activos 24] [--exportar DIR] [--eliminar]
+#      python manage.py clinica_particiones estado
+# Mantención de las particiones mensuales de consultas (clinica/particiones.py,
+# sólo PostgreSQL). Pensado para un cron mensual: `crear` y luego `archivar`.
+# crear: particiones de los próximos meses (y de los meses que hayan
+#   caído en la partición DEFAULT).
+# archivar: pasa al histórico los meses anteriores a los últimos
+#   --meses-activos; con --exportar los guarda antes en CSV gzip
+#   (consultas, tratamientos y recetas) y con --eliminar además los borra
+#   de la BD. Después reconstruye los resúmenes del dashboard.
+# estado: particiones activas e históricas con sus filas (estimadas).
+# ---------------------------------------------------------
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from clinica import particiones, resumenes
+
+
+class Command(BaseCommand):
+    help = "Crea, archiva y lista las particiones mensuales de consultas (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("accion", choices=["crear", "archivar", "estado"])
+        parser.add_argument("--meses", type=int, help="crear: meses hacia adelante (default: MESES_FUTUROS).")
+        parser.add_argument("--meses-activos", type=int, help="archivar: meses que se quedan (default: MESES_ACTIVOS).")
+        parser.add_argument(
+            "--exportar", nargs="?", const=settings.CONSULTAS_PARTICIONES["ARCHIVO_DIR"],
+            help="archivar: directorio para los CSV gzip (sin valor: ARCHIVO_DIR).",
+        )
+        parser.add_argument("--eliminar", action="store_true", help="archivar: borrar de la BD lo exportado.")
+
+    def handle(self, *args, **options):
+        if not particiones.activo():
+            raise CommandError("Las consultas no están particionadas (sólo PostgreSQL, migración 0008).")
+        getattr(self, f"_{options['accion']}")(options)
+
+    def _crear(self, options):
+        creadas = particiones.asegurar_particiones(options["meses"])
+        for nombre in creadas:
+            self.stdout.write(f"  {nombre}")
+        self.stdout.write(self.style.SUCCESS(f"{len(creadas)} partición(es) creada(s)."))
+
+    def _archivar(self, options):
+        if options["eliminar"] and not options["exportar"]:
+            raise CommandError("--eliminar requiere --exportar (no se borra nada sin respaldo).")
+        if options["meses_activos"] is not None and options["meses_activos"] < 1:
+            raise CommandError("--meses-activos debe ser positivo.")
+        archivados = particiones.archivar(options["meses_activos"], options["exportar"], options["eliminar"])
+        destino = "eliminado" if options["eliminar"] else "al histórico"
+        for mes, filas, rutas in archivados:
+            self.stdout.write(f"  {mes:%Y-%m}: {filas:,} consultas {destino}")
+            for ruta in rutas:
+                self.stdout.write(f"    {ruta}")
+        if archivados:
+            resumenes.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{len(archivados)} mes(es) archivado(s)."))
+
+    def _estado(self, options):
+        for tabla, mes, filas in particiones.estado():
+            nivel = "histórico" if tabla == particiones.HISTORICO else "activa"
+            self.stdout.write(f"  {nivel:<10} {mes:%Y-%m}  ~{filas:,}" if mes else f"  {nivel:<10} default  ~{filas:,}")
+        corte = particiones.corte()
+        self.stdout.write(f"Corte del histórico: {corte:%Y-%m-%d}" if corte else "Histórico vacío.")
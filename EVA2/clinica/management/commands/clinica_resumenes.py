@@ -0,0 +1,33 @@
+# EVA2/clinica/management/commands/clinica_resumenes.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_resumenes rebuild
+#      python manage.py clinica_resumenes verificar
+# rebuild: recalcula las tablas resumen del dashboard desde cero
+#   (después de cargas masivas por SQL, restauraciones, etc.).
+# verificar: compara los resúmenes incrementales contra un GROUP BY.
+# ---------------------------------------------------------
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clinica import resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye o verifica las tablas resumen del dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("accion", choices=["rebuild", "verificar"])
+
+    def handle(self, *args, **options):
+        if options["accion"] == "rebuild":
+            consultas, afiliaciones = resumenes.reconstruir()
+            self.stdout.write(self.style.SUCCESS(
+                f"Resúmenes reconstruidos: {consultas} filas de consultas, {afiliaciones} de afiliaciones."
+            ))
+            return
+        malas = resumenes.diferencias()
+        for tabla, clave in malas:
+            self.stdout.write(self.style.ERROR(f"Descuadre en {tabla}: {clave}"))
+        if malas:
+            raise CommandError(f"{len(malas)} fila(s) no calzan; corre `clinica_resumenes rebuild`.")
+        self.stdout.write(self.style.SUCCESS("Resúmenes al día."))
@@ -0,0 +1,64 @@
+# EVA2/clinica/management/commands/clinica_worker.py
+# ---------------------------------------------------------
+# Uso: python manage.py clinica_worker [--procesos 2] [--intervalo 1.0] [--una-vez]
+# Ejecuta los trabajos en segundo plano encolados en la BD
+# (clinica/trabajos.py, POST /api/trabajos/).
+# - --procesos: procesos en paralelo; cada uno toma trabajos con
+#   FOR UPDATE SKIP LOCKED. En SQLite se usa 1.
+# - --una-vez: procesa lo que haya en la cola y termina (cron, tests).
+# - SIGTERM/SIGINT: cada proceso termina el trabajo en curso y sale.
+# ---------------------------------------------------------
+
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from clinica import trabajos
+
+
+def _proceso(detener, intervalo, una_vez):
+    connections.close_all()  # conexiones propias, no las heredadas del padre
+    trabajos.trabajar(detener, intervalo, una_vez)
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los trabajos en segundo plano (cola en la BD con SKIP LOCKED)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, help="Procesos en paralelo (default: TRABAJOS['PROCESOS']).")
+        parser.add_argument("--intervalo", type=float, help="Segundos de espera con la cola vacía.")
+        parser.add_argument("--una-vez", action="store_true", help="Vaciar la cola y terminar.")
+
+    def handle(self, *args, **options):
+        procesos = max(options["procesos"] or settings.TRABAJOS["PROCESOS"], 1)
+        intervalo = options["intervalo"] if options["intervalo"] is not None else settings.TRABAJOS["INTERVALO"]
+        if procesos > 1 and not connection.features.has_select_for_update_skip_locked:
+            self.stdout.write(self.style.WARNING(f"{connection.vendor} no tiene SKIP LOCKED: se usa 1 proceso."))
+            procesos = 1
+
+        contexto = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        detener = contexto.Event()
+        anteriores = {senal: signal.signal(senal, lambda *_: detener.set()) for senal in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self._correr(contexto, detener, procesos, intervalo, options["una_vez"])
+        finally:
+            for senal, handler in anteriores.items():
+                signal.signal(senal, handler)
+
+    def _correr(self, contexto, detener, procesos, intervalo, una_vez):
+        if procesos == 1:
+            hechos = trabajos.trabajar(detener, intervalo, una_vez)
+            self.stdout.write(self.style.SUCCESS(f"{hechos} trabajo(s) procesado(s)."))
+            return
+        self.stdout.write(f"Worker con {procesos} procesos (Ctrl+C para detener).")
+        connections.close_all()
+        # Los hijos heredan los handlers de SIGTERM/SIGINT: terminan el trabajo en curso y salen
+        hijos = [contexto.Process(target=_proceso, args=(detener, intervalo, una_vez)) for _ in range(procesos)]
+        for hijo in hijos:
+            hijo.start()
+        for hijo in hijos:
+            hijo.join()
+        self.stdout.write(self.style.SUCCESS("Worker detenido."))
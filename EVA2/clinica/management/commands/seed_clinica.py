@@ -0,0 +1,99 @@
+# EVA2/clinica/management/commands/seed_clinica.py
+# ---------------------------------------------------------
+# Uso: python manage.py seed_clinica [--pacientes 1000] [--consultas N] [--procesos 4] [--semilla 1]
+#   p.ej. escala de producción:
+#   python manage.py seed_clinica --pacientes 1000000 --consultas 5000000 --procesos 8
+# Genera datos sintéticos coherentes (clinica/sintetico.py): catálogos,
+# médicos con horario, pacientes con su afiliación, consultas,
+# tratamientos y recetas. Se agregan a lo que ya haya en la BD.
+# Con la misma semilla y --referencia, sobre la misma BD de partida, los
+# datos son los mismos aunque cambie --procesos.
+# ---------------------------------------------------------
+
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from clinica import sintetico
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos a escala (deterministas, con bulk_create y en paralelo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pacientes", type=int, default=1000)
+        parser.add_argument("--consultas", type=int, help="Default: 5 por paciente.")
+        parser.add_argument("--medicos", type=int, help="Default: 1 cada 500 pacientes (mínimo 20).")
+        parser.add_argument("--medicamentos", type=int, default=300)
+        parser.add_argument("--tratamientos-por-consulta", type=float, default=0.6)
+        parser.add_argument("--recetas-por-tratamiento", type=float, default=1.5)
+        parser.add_argument("--dias", type=int, default=730, help="Período de consultas hacia atrás (default: 730).")
+        parser.add_argument("--referencia", help="Fin del período, aaaa-mm-dd (default: hoy).")
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--procesos", type=int, default=1, help="Procesos en paralelo (sólo PostgreSQL).")
+        parser.add_argument("--tarea", type=int, default=10000, help="Pacientes por tarea (default: 10000).")
+        parser.add_argument("--lote", type=int, default=5000, help="Filas por INSERT (default: 5000).")
+
+    def handle(self, *args, **options):
+        pacientes = options["pacientes"]
+        if pacientes < 1 or options["tarea"] < 1 or options["lote"] < 1:
+            raise CommandError("--pacientes, --tarea y --lote deben ser positivos.")
+        try:
+            referencia = (
+                timezone.make_aware(datetime.strptime(options["referencia"], "%Y-%m-%d"))
+                if options["referencia"] else sintetico.referencia_por_defecto()
+            )
+        except ValueError:
+            raise CommandError("--referencia debe tener formato aaaa-mm-dd.")
+        procesos = max(options["procesos"], 1)
+        if procesos > 1 and connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING("SQLite no admite escrituras en paralelo: se usa 1 proceso."))
+            procesos = 1
+
+        inicio = time.perf_counter()
+        plan = sintetico.planificar(
+            semilla=options["semilla"], referencia=referencia, dias=options["dias"], pacientes=pacientes,
+            consultas=options["consultas"] if options["consultas"] is not None else pacientes * 5,
+            medicos=options["medicos"] or max(20, pacientes // 500), medicamentos=options["medicamentos"],
+            tratamientos_por_consulta=options["tratamientos_por_consulta"],
+            recetas_por_tratamiento=options["recetas_por_tratamiento"],
+            tamano_tarea=options["tarea"], lote=options["lote"],
+        )
+        self.stdout.write(
+            f"{len(plan.medicos)} médicos, {len(plan.medicamentos)} medicamentos; "
+            f"{len(plan.tareas)} tareas en {procesos} proceso(s)"
+        )
+        totales = Counter()
+        for hechas, filas in enumerate(self._tareas(plan, procesos), start=1):
+            totales.update(filas)
+            self.stdout.write(f"  tarea {hechas}/{len(plan.tareas)}: {sum(totales.values()):,} filas")
+        sintetico.terminar()
+
+        segundos = time.perf_counter() - inicio
+        for model, filas in totales.items():
+            self.stdout.write(f"  {model.__name__}: {filas:,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(totales.values()):,} filas en {segundos:.1f}s ({sum(totales.values()) / segundos:,.0f} filas/s)"
+        ))
+
+    def _tareas(self, plan, procesos):
+        if procesos == 1:
+            for tarea in plan.tareas:
+                yield sintetico.generar_tarea(plan, tarea)
+            return
+        # Los hijos no deben heredar las conexiones abiertas del padre
+        connections.close_all()
+        metodo = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(
+            max_workers=procesos, mp_context=multiprocessing.get_context(metodo),
+            initializer=sintetico.iniciar_proceso,
+        ) as pool:
+            futuros = [pool.submit(sintetico.generar_en_proceso, plan, tarea) for tarea in plan.tareas]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
@@ -0,0 +1,221 @@
+# EVA2/clinica/metricas.py
+# ---------------------------------------------------------
+# Instrumentación por request (la usa MetricasMiddleware, middleware.py).
+# - Medicion: queries SQL, tiempo en BD, serialización y render de una
+#   request. Vive en un ContextVar, así también cuenta las queries que
+#   el ORM async corre en hilos (sync_to_async hereda el contexto).
+# - Las queries se miden con un execute_wrapper que se agrega a cada
+#   conexión al crearse (signal connection_created).
+# - Queries lentas (>= METRICAS["QUERY_LENTA_MS"]) se registran; una
+#   muestra (EXPLAIN_MUESTRA) se explica con EXPLAIN al terminar la request.
+# - Agregado en memoria del proceso: por ruta, las últimas VENTANA
+#   duraciones (para p50/p95/p99) y contadores; /metrics lo expone en
+#   formato de texto de Prometheus. Cada worker tiene el suyo.
+# ---------------------------------------------------------
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger("clinica.metricas")
+
+_actual = ContextVar("clinica_medicion", default=None)
+
+
+@dataclass
+class Medicion:
+    inicio: float = field(default_factory=time.perf_counter)
+    consultas: int = 0
+    db: float = 0.0
+    tramos: dict = field(default_factory=lambda: defaultdict(float))  # "serializacion", "render"
+    lentas: list = field(default_factory=list)  # (alias, sql, params, segundos)
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+
+def iniciar():
+    medicion = Medicion()
+    _actual.set(medicion)
+    return medicion
+
+
+def terminar():
+    _actual.set(None)
+
+
+def actual():
+    return _actual.get()
+
+
+@contextmanager
+def medir(tramo):
+    """Suma el tiempo del bloque al tramo de la medición en curso (si hay)."""
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.tramos[tramo] += time.perf_counter() - inicio
+
+
+# ---------- SQL ----------
+def envoltorio_sql(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.db += duracion
+        if duracion * 1000 >= settings.METRICAS["QUERY_LENTA_MS"]:
+            medicion.lentas.append((context["connection"].alias, sql, params, duracion))
+
+
+def instalar_en_conexion(sender, connection, **kwargs):
+    """Receiver de connection_created (apps.py)."""
+    if envoltorio_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(envoltorio_sql)
+
+
+def explicar_lentas(medicion, ruta):
+    """Loguea las queries lentas y corre EXPLAIN sobre una muestra de los SELECT."""
+    for alias, sql, params, duracion in medicion.lentas:
+        registro = {"evento": "query_lenta", "ruta": ruta, "db": alias, "ms": round(duracion * 1000, 1), "sql": sql[:2000]}
+        if sql.lstrip().upper().startswith("SELECT") and random.random() < settings.METRICAS["EXPLAIN_MUESTRA"]:
+            conexion = connections[alias]
+            try:
+                with conexion.cursor() as cursor:
+                    cursor.execute(f"{conexion.ops.explain_query_prefix()} {sql}", params)
+                    registro["plan"] = "\n".join(" ".join(str(c) for c in fila) for fila in cursor.fetchall())
+            except Exception as exc:  # un EXPLAIN fallido no debe romper la request
+                registro["plan_error"] = str(exc)
+        logger.warning(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+# ---------- Serialización ----------
+class ListSerializerMedido(serializers.ListSerializer):
+    @property
+    def data(self):
+        with medir("serializacion"):
+            return super().data
+
+
+class SerializacionMedidaMixin:
+    """Mide serializer.data (también con many=True) como tramo "serializacion"."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, "Meta", None)
+        if meta is not None and not hasattr(meta, "list_serializer_class"):
+            meta.list_serializer_class = ListSerializerMedido
+
+    @property
+    def data(self):
+        with medir("serializacion"):
+            return super().data
+
+
+# ---------- Salida por request ----------
+def server_timing(medicion, total):
+    partes = [f'db;desc="{medicion.consultas} queries";dur={medicion.db * 1000:.1f}']
+    partes += [f"{nombre};dur={segundos * 1000:.1f}" for nombre, segundos in medicion.tramos.items()]
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
+
+
+def registrar(request, response, medicion, total, ruta):
+    """Log estructurado de la request y suma al agregado."""
+    registro = {
+        "evento": "request", "metodo": request.method, "ruta": ruta, "path": request.path,
+        "status": response.status_code, "ms": round(total * 1000, 1), "queries": medicion.consultas,
+        "db_ms": round(medicion.db * 1000, 1),
+        **{f"{nombre}_ms": round(segundos * 1000, 1) for nombre, segundos in medicion.tramos.items()},
+    }
+    lenta = total * 1000 >= settings.METRICAS["REQUEST_LENTA_MS"]
+    if lenta:
+        logger.warning(json.dumps({**registro, "evento": "request_lenta"}, ensure_ascii=False))
+    else:
+        logger.info(json.dumps(registro, ensure_ascii=False))
+    AGREGADO.sumar(request.method, ruta, response.status_code, total, medicion, lenta)
+
+
+def ruta_de(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "sin_ruta"
+
+
+# ---------- Agregado en memoria ----------
+class Agregado:
+    CUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with getattr(self, "_lock", threading.Lock()):
+            self.duraciones = defaultdict(lambda: deque(maxlen=settings.METRICAS["VENTANA"]))
+            self.contadores = defaultdict(lambda: defaultdict(float))
+
+    def sumar(self, metodo, ruta, status, total, medicion, lenta):
+        clave = (metodo, ruta)
+        with self._lock:
+            self.duraciones[clave].append(total)
+            contador = self.contadores[clave]
+            contador["requests"] += 1
+            contador["segundos"] += total
+            contador["db_segundos"] += medicion.db
+            contador["queries"] += medicion.consultas
+            contador["lentas"] += lenta
+            contador["errores"] += status >= 500
+
+    def prometheus(self):
+        """Texto en formato de exposición de Prometheus (version 0.0.4)."""
+        with self._lock:
+            duraciones = {clave: sorted(valores) for clave, valores in self.duraciones.items()}
+            contadores = {clave: dict(valores) for clave, valores in self.contadores.items()}
+        lineas = [
+            "# HELP clinica_request_duration_seconds Duración de las requests (ventana de las últimas por ruta).",
+            "# TYPE clinica_request_duration_seconds summary",
+        ]
+        for (metodo, ruta), valores in sorted(duraciones.items()):
+            etiquetas = f'method="{metodo}",route="{_escapar(ruta)}"'
+            for q in self.CUANTILES:
+                indice = min(len(valores) - 1, int(q * len(valores)))
+                lineas.append(f'clinica_request_duration_seconds{{{etiquetas},quantile="{q}"}} {valores[indice]:.6f}')
+            lineas.append(f"clinica_request_duration_seconds_sum{{{etiquetas}}} {contadores[(metodo, ruta)]['segundos']:.6f}")
+            lineas.append(f"clinica_request_duration_seconds_count{{{etiquetas}}} {contadores[(metodo, ruta)]['requests']:.0f}")
+        for nombre, clave, ayuda in (
+            ("clinica_request_queries_total", "queries", "Queries SQL ejecutadas."),
+            ("clinica_request_db_seconds_total", "db_segundos", "Tiempo total en la base de datos."),
+            ("clinica_slow_requests_total", "lentas", "Requests sobre METRICAS['REQUEST_LENTA_MS']."),
+            ("clinica_request_errors_total", "errores", "Respuestas 5xx."),
+        ):
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+            for (metodo, ruta), valores in sorted(contadores.items()):
+                lineas.append(f'{nombre}{{method="{metodo}",route="{_escapar(ruta)}"}} {valores[clave]:g}')
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+AGREGADO = Agregado()
@@ -0,0 +1,120 @@
+# EVA2/clinica/middleware.py
+# ---------------------------------------------------------
+# Middlewares de la app clínica.
+# - ReplicaPinMiddleware: decide si la request puede leer de una réplica
+#   (ver routers.py) y "fija" al cliente en el primario después de
+#   escribir, con una cookie que dura REPLICA_PIN_SECONDS. Así quien acaba
+#   de guardar algo lo ve en la siguiente lectura aunque la réplica
+#   todavía no lo haya recibido.
+# - MetricasMiddleware: queries, tiempo de BD, serialización y render de
+#   cada request (metricas.py). Los devuelve en el header Server-Timing,
+#   los loguea en "clinica.metricas" y los suma al agregado de /metrics.
+# ---------------------------------------------------------
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import metricas, routers
+
+COOKIE_PRIMARIO = "sv_primario"
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        estado = self._iniciar(request)
+        return self._terminar(request, self.get_response(request), estado)
+
+    async def __acall__(self, request):
+        estado = self._iniciar(request)
+        return self._terminar(request, await self.get_response(request), estado)
+
+    def _iniciar(self, request):
+        return routers.iniciar_request(
+            primario=request.method not in METODOS_SEGUROS or self._fijado(request)
+        )
+
+    @staticmethod
+    def _fijado(request):
+        try:
+            return float(request.COOKIES.get(COOKIE_PRIMARIO, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _terminar(self, request, response, estado):
+        # Sin réplicas no hace falta fijar a nadie
+        if settings.DATABASE_REPLICAS and (estado.escribio or request.method not in METODOS_SEGUROS):
+            segundos = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                COOKIE_PRIMARIO, f"{time.time() + segundos:.3f}", max_age=segundos, httponly=True, samesite="Lax",
+            )
+        return response
+
+
+class MetricasMiddleware:
+    """Va primero en MIDDLEWARE para que el total incluya a los demás middlewares."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        medicion = metricas.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.terminar()
+        ruta = self._terminar(request, response, medicion)
+        if medicion.lentas:
+            metricas.explicar_lentas(medicion, ruta)
+        return response
+
+    async def __acall__(self, request):
+        medicion = metricas.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.terminar()
+        ruta = self._terminar(request, response, medicion)
+        if medicion.lentas:
+            await sync_to_async(metricas.explicar_lentas)(medicion, ruta)
+        return response
+
+    def process_template_response(self, request, response):
+        # Se llama justo antes de response.render() (p.ej. las Response de DRF)
+        medicion = metricas.actual()
+        if medicion is not None:
+            inicio = time.perf_counter()
+
+            def fin_render(rendered):
+                medicion.tramos["render"] += time.perf_counter() - inicio
+
+            response.add_post_render_callback(fin_render)
+        return response
+
+    @staticmethod
+    def _terminar(request, response, medicion):
+        total = medicion.total()
+        ruta = metricas.ruta_de(request)
+        response["Server-Timing"] = metricas.server_timing(medicion, total)
+        metricas.registrar(request, response, medicion, total, ruta)
+        return ruta
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['-fecha_consulta', '-id'], name='consulta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['medico', 'fecha_consulta', 'id'], name='consulta_medico_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['paciente', '-fecha_consulta', '-id'], name='consulta_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['estado', 'fecha_consulta', 'id'], name='consulta_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['especialidad', 'apellido'], name='medico_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['apellido', 'id'], name='paciente_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pacienteseguro',
+            index=models.Index(condition=models.Q(('vigente', True)), fields=['paciente'], name='afiliacion_vigente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pacienteseguro',
+            index=models.Index(condition=models.Q(('vigente', True)), fields=['seguro'], name='afiliacion_seguro_vigente_idx'),
+        ),
+    ]
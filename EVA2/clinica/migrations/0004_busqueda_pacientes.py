@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+import clinica.busqueda
+from django.db import migrations
+
+
+def rellenar(apps, schema_editor):
+    """Calcula las columnas normalizadas de los pacientes existentes."""
+    Paciente = apps.get_model('clinica', 'Paciente')
+    campos = [Paciente._meta.get_field('rut_normalizado'), Paciente._meta.get_field('nombre_busqueda')]
+    if schema_editor.connection.vendor == 'postgresql':
+        qn = schema_editor.quote_name
+        asignaciones = ', '.join(
+            f"{qn(c.column)} = {c.expresion_sql(*(qn(f) for f in c.fuentes))}" for c in campos
+        )
+        schema_editor.execute(f"UPDATE {qn(Paciente._meta.db_table)} SET {asignaciones}")
+        return
+    lote = []
+    for paciente in Paciente.objects.only('rut', 'nombre', 'apellido').iterator(chunk_size=2000):
+        for campo in campos:
+            setattr(paciente, campo.attname, campo.calcular(paciente))
+        lote.append(paciente)
+        if len(lote) == 2000:
+            Paciente.objects.bulk_update(lote, [c.name for c in campos])
+            lote = []
+    Paciente.objects.bulk_update(lote, [c.name for c in campos])
+
+
+def crear_indice_trigram(apps, schema_editor):
+    """
+    GIN con gin_trgm_ops sobre nombre_busqueda: acelera LIKE '%x%'.
+    Sólo PostgreSQL y sólo si pg_trgm está disponible en el servidor
+    (sin ella la búsqueda funciona igual, con un scan secuencial).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS paciente_busqueda_trgm_idx "
+        "ON clinica_paciente USING gin (nombre_busqueda gin_trgm_ops)"
+    )
+
+
+def borrar_indice_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS paciente_busqueda_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0003_marcas_de_tiempo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='nombre_busqueda',
+            field=clinica.busqueda.CampoNormalizado(db_index=True, fuentes=('apellido', 'nombre'), max_length=241, normalizar=clinica.busqueda.normalizar_texto),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='rut_normalizado',
+            field=clinica.busqueda.CampoNormalizado(db_index=True, fuentes=('rut',), max_length=12, normalizar=clinica.busqueda.normalizar_rut),
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigram, borrar_indice_trigram),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0004_busqueda_pacientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recetamedica',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='recetamedica',
+            name='dispensada_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def poblar(apps, schema_editor):
+    """Primer cálculo de los resúmenes con los datos existentes."""
+    ConsultaMedica = apps.get_model('clinica', 'ConsultaMedica')
+    PacienteSeguro = apps.get_model('clinica', 'PacienteSeguro')
+    ResumenConsultasDiario = apps.get_model('clinica', 'ResumenConsultasDiario')
+    ResumenAfiliaciones = apps.get_model('clinica', 'ResumenAfiliaciones')
+    columnas = {'PEND': 'pendientes', 'ATEN': 'atendidas', 'CANC': 'canceladas', 'NOAS': 'no_asiste'}
+    filas = (
+        ConsultaMedica.objects.order_by()
+        .annotate(fecha=TruncDate('fecha_consulta', tzinfo=timezone.get_current_timezone()))
+        .values('fecha', 'medico_id')
+        .annotate(total=Count('pk'), **{c: Count('pk', filter=Q(estado=e)) for e, c in columnas.items()})
+    )
+    ResumenConsultasDiario.objects.bulk_create((ResumenConsultasDiario(**f) for f in filas), batch_size=1000)
+    filas = (
+        PacienteSeguro.objects.order_by().values('seguro_id')
+        .annotate(total=Count('pk'), vigentes=Count('pk', filter=Q(vigente=True)))
+    )
+    ResumenAfiliaciones.objects.bulk_create((ResumenAfiliaciones(**f) for f in filas), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0005_dispensacion_recetas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAfiliaciones',
+            fields=[
+                ('seguro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='clinica.segurosalud')),
+                ('vigentes', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenConsultasDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('pendientes', models.PositiveIntegerField(default=0)),
+                ('atendidas', models.PositiveIntegerField(default=0)),
+                ('canceladas', models.PositiveIntegerField(default=0)),
+                ('no_asiste', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinica.medico')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='resumen_consultas_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'medico'), name='resumen_consultas_dia_medico_uniq')],
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0006_resumenes_dashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especialidad',
+            name='duracion_slot_minutos',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.CreateModel(
+            name='HorarioAtencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='clinica.medico')),
+            ],
+            options={
+                'ordering': ['medico', 'dia_semana', 'hora_inicio'],
+                'indexes': [models.Index(fields=['medico', 'dia_semana'], name='horario_medico_dia_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('hora_fin__gt', models.F('hora_inicio'))), name='horario_fin_despues_de_inicio')],
+            },
+        ),
+    ]
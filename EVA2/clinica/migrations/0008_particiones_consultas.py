@@ -0,0 +1,183 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from datetime import date, datetime, time
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# El DDL queda congelado aquí (no se importa clinica.particiones): una
+# migración ya aplicada no debe cambiar si después cambia el código de la app.
+TABLA = 'clinica_consultamedica'
+HISTORICO = f'{TABLA}_historico'
+VISTA = f'{TABLA}_completa'
+DEFAULT = f'{TABLA}_default'
+MESES_FUTUROS = 3
+
+
+def _sumar_meses(mes, n):
+    total = mes.year * 12 + mes.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _inicio(mes):
+    return timezone.make_aware(datetime.combine(mes, time.min))
+
+
+def _meses_con_datos(cursor, tabla):
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', fecha_consulta AT TIME ZONE %s)::date FROM {tabla}",
+        [settings.TIME_ZONE],
+    )
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def _renombrar_indices(cursor, tabla, sufijo):
+    """Los índices de una partición toman el nombre del índice del padre + sufijo."""
+    cursor.execute(
+        "SELECT hijo.relname, padre.relname FROM pg_index x "
+        "JOIN pg_class hijo ON hijo.oid = x.indexrelid "
+        "JOIN pg_inherits i ON i.inhrelid = x.indexrelid "
+        "JOIN pg_class padre ON padre.oid = i.inhparent "
+        "WHERE x.indrelid = to_regclass(%s)", [tabla],
+    )
+    for hijo, padre in cursor.fetchall():
+        nuevo = f'{padre[:54]}_{sufijo}'
+        if hijo != nuevo:
+            cursor.execute(f'ALTER INDEX {hijo} RENAME TO {nuevo}')
+
+
+def _crear_particion(cursor, mes):
+    """Partición del mes; la DEFAULT todavía está vacía (las filas se copian después)."""
+    sufijo = f'p{mes:%Y_%m}'
+    nombre = f'{TABLA}_{sufijo}'
+    cursor.execute(
+        f'CREATE TABLE {nombre} PARTITION OF {TABLA} FOR VALUES FROM (%s) TO (%s)',
+        [_inicio(mes), _inicio(_sumar_meses(mes, 1))],
+    )
+    _renombrar_indices(cursor, nombre, sufijo)
+
+
+def _indices_y_fks(cursor):
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))",
+        [TABLA, TABLA],
+    )
+    indices = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [TABLA],
+    )
+    fks = cursor.fetchall()
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [TABLA])
+    return indices, fks, cursor.fetchone()[0]
+
+
+def particionar(apps, schema_editor):
+    """
+    Convierte clinica_consultamedica en una tabla particionada por mes
+    (con sus filas) y crea el histórico y la vista. Sólo PostgreSQL: en
+    SQLite las consultas siguen en una tabla normal y la vista no existe.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    legado = f'{TABLA}_anterior'
+    with schema_editor.connection.cursor() as cursor:
+        indices, fks, pk = _indices_y_fks(cursor)
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLA])
+        secuencia = cursor.fetchone()[0]
+
+        for nombre, _ in indices:
+            cursor.execute(f'DROP INDEX {nombre}')
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {legado}')
+        cursor.execute(f'ALTER TABLE {legado} RENAME CONSTRAINT {pk} TO {legado}_pkey')
+        cursor.execute(f'ALTER SEQUENCE {secuencia} RENAME TO {legado}_id_seq')
+
+        cursor.execute(
+            f'CREATE TABLE {TABLA} (LIKE {legado} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (fecha_consulta)'
+        )
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {pk} PRIMARY KEY (id, fecha_consulta)')
+        for nombre, definicion in fks:
+            cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {nombre} {definicion}')
+        for _, definicion in indices:  # la definición ya apunta a TABLA (se leyó antes de renombrar)
+            cursor.execute(definicion)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {DEFAULT} PARTITION OF {TABLA} DEFAULT')
+        _renombrar_indices(cursor, DEFAULT, 'default')
+        actual = timezone.localdate().replace(day=1)
+        meses = {_sumar_meses(actual, n) for n in range(MESES_FUTUROS + 1)} | _meses_con_datos(cursor, legado)
+        for mes in sorted(meses):
+            _crear_particion(cursor, mes)
+        cursor.execute(f'INSERT INTO {TABLA} OVERRIDING SYSTEM VALUE SELECT * FROM {legado}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {TABLA}",
+            [TABLA],
+        )
+        cursor.execute(f'DROP TABLE {legado}')
+        cursor.execute(f'ANALYZE {TABLA}')
+
+        cursor.execute(
+            f'CREATE TABLE {HISTORICO} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES) '
+            f'PARTITION BY RANGE (fecha_consulta)'
+        )
+        cursor.execute(f'CREATE VIEW {VISTA} AS SELECT * FROM {TABLA} UNION ALL SELECT * FROM {HISTORICO}')
+
+
+def desparticionar(apps, schema_editor):
+    """Inverso: una tabla normal con las filas activas y las del histórico."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    nueva = f'{TABLA}_nueva'
+    with schema_editor.connection.cursor() as cursor:
+        indices, fks, pk = _indices_y_fks(cursor)
+        cursor.execute(
+            f'CREATE TABLE {nueva} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY)'
+        )
+        cursor.execute(f'INSERT INTO {nueva} OVERRIDING SYSTEM VALUE SELECT * FROM {VISTA}')
+        cursor.execute(f'DROP VIEW {VISTA}')
+        cursor.execute(f'DROP TABLE {HISTORICO}')
+        cursor.execute(f'DROP TABLE {TABLA}')
+        cursor.execute(f'ALTER TABLE {nueva} RENAME TO {TABLA}')
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {pk} PRIMARY KEY (id)')
+        for nombre, definicion in fks:
+            cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {nombre} {definicion}')
+        for _, definicion in indices:
+            cursor.execute(definicion.replace(' ON ONLY ', ' ON '))
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {TABLA}",
+            [TABLA],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0007_agenda_medicos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaMedicaCompleta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('fecha_consulta', models.DateTimeField()),
+                ('motivo', models.CharField(max_length=200)),
+                ('diagnostico', models.CharField(blank=True, max_length=200)),
+                ('estado', models.CharField(choices=[('PEND', 'Pendiente'), ('ATEN', 'Atendida'), ('CANC', 'Cancelada'), ('NOAS', 'No asiste')], default='PEND', max_length=4)),
+            ],
+            options={
+                'db_table': 'clinica_consultamedica_completa',
+                'managed': False,
+            },
+        ),
+        migrations.AlterField(
+            model_name='tratamiento',
+            name='consulta',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.PROTECT, related_name='tratamientos', to='clinica.consultamedica'),
+        ),
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+from .busqueda import CampoNormalizado, normalizar_rut, normalizar_texto
 
 # ---------- CHOICES ----------
 TIPO_SANGRE_CHOICES = [
@@ -14,6 +17,11 @@ SEXO_CHOICES = [
     ("X", "No especificado"),
 ]
 
+DIA_SEMANA_CHOICES = [
+    (0, "Lunes"), (1, "Martes"), (2, "Miércoles"), (3, "Jueves"),
+    (4, "Viernes"), (5, "Sábado"), (6, "Domingo"),
+]
+
 ESTADO_CONSULTA_CHOICES = [
     ("PEND", "Pendiente"),
     ("ATEN", "Atendida"),
@@ -21,13 +29,41 @@ ESTADO_CONSULTA_CHOICES = [
     ("NOAS", "No asiste"),
 ]
 
+ESTADO_TRABAJO_CHOICES = [
+    ("PEND", "Pendiente"),
+    ("EJEC", "En ejecución"),
+    ("OK", "Terminado"),
+    ("ERR", "Fallido"),
+]
+
 # ---------- MODELOS BASE ----------
-class Especialidad(models.Model):
+class TimeStampedModel(models.Model):
+    """Marca de creación/modificación: base de ETag / Last-Modified en listas."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Indexado: MAX(updated_at) es el validador de las colecciones
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    class Meta:
+        abstract = True
+
+def campos_calculados(model):
+    """
+    Campos que el modelo calcula en pre_save (updated_at, columnas de
+    búsqueda normalizadas). bulk_update y el COPY de importacion.py no
+    pasan por pre_save, así que los recalculan con esta lista.
+    """
+    return [
+        f for f in model._meta.concrete_fields
+        if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False) or isinstance(f, CampoNormalizado)
+    ]
+
+class Especialidad(TimeStampedModel):
     nombre = models.CharField(max_length=120, unique=True)
     descripcion = models.TextField(blank=True)
+    # Cuánto dura cada consulta de la especialidad (agenda.py)
+    duracion_slot_minutos = models.PositiveSmallIntegerField(default=30)
     def __str__(self): return self.nombre
 
-class Medico(models.Model):
+class Medico(TimeStampedModel):
     nombre = models.CharField(max_length=120)
     apellido = models.CharField(max_length=120)
     rut = models.CharField(max_length=12, unique=True)
@@ -36,9 +72,35 @@ class Medico(models.Model):
     activo = models.BooleanField(default=True)
     # PROTECT: no se puede borrar una especialidad si tiene médicos
     especialidad = models.ForeignKey(Especialidad, on_delete=models.PROTECT, related_name='medicos')
+    class Meta:
+        indexes = [
+            # Parcial: sólo médicos activos (los que se listan/agendan)
+            models.Index(fields=['especialidad', 'apellido'], condition=models.Q(activo=True),
+                         name='medico_activo_idx'),
+        ]
     def __str__(self): return f"{self.nombre} {self.apellido}"
 
-class Paciente(models.Model):
+class HorarioAtencion(TimeStampedModel):
+    """Bloque semanal en que atiende un médico (hora local). Puede tener varios por día."""
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='horarios')
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    class Meta:
+        ordering = ['medico', 'dia_semana', 'hora_inicio']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(hora_fin__gt=models.F('hora_inicio')),
+                                   name='horario_fin_despues_de_inicio'),
+        ]
+        indexes = [models.Index(fields=['medico', 'dia_semana'], name='horario_medico_dia_idx')]
+    def clean(self):
+        super().clean()
+        from .agenda import validar_horario
+        validar_horario(self)
+    def __str__(self):
+        return f"{self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+
+class Paciente(TimeStampedModel):
     rut = models.CharField(max_length=12, unique=True)
     nombre = models.CharField(max_length=120)
     apellido = models.CharField(max_length=120)
@@ -49,9 +111,21 @@ class Paciente(models.Model):
     telefono = models.CharField(max_length=30, blank=True)
     direccion = models.CharField(max_length=200, blank=True)
     activo = models.BooleanField(default=True)
+    # Columnas de búsqueda (ver busqueda.py). En PostgreSQL, db_index crea
+    # además el índice *_like para LIKE 'x%'; el GIN trigram está en 0004.
+    rut_normalizado = CampoNormalizado(max_length=12, fuentes=('rut',), normalizar=normalizar_rut,
+                                       db_index=True)
+    nombre_busqueda = CampoNormalizado(max_length=241, fuentes=('apellido', 'nombre'),
+                                       normalizar=normalizar_texto, db_index=True)
+    class Meta:
+        indexes = [
+            # Parcial: sólo pacientes activos, ordenados como en la lista
+            models.Index(fields=['apellido', 'id'], condition=models.Q(activo=True),
+                         name='paciente_activo_idx'),
+        ]
     def __str__(self): return f"{self.nombre} {self.apellido}"
 
-class ConsultaMedica(models.Model):
+class ConsultaMedica(TimeStampedModel):
     # PROTECT: no se puede borrar paciente/médico si hay consultas
     paciente = models.ForeignKey(Paciente, on_delete=models.PROTECT, related_name='consultas')
     medico = models.ForeignKey(Medico, on_delete=models.PROTECT, related_name='consultas')
@@ -59,34 +133,76 @@ class ConsultaMedica(models.Model):
     motivo = models.CharField(max_length=200)
     diagnostico = models.CharField(max_length=200, blank=True)
     estado = models.CharField(max_length=4, choices=ESTADO_CONSULTA_CHOICES, default='PEND')
+    class Meta:
+        indexes = [
+            # Lista general (orden por defecto + desempate del cursor).
+            # El id al final de cada índice cubre el desempate de la paginación.
+            models.Index(fields=['-fecha_consulta', '-id'], name='consulta_fecha_idx'),
+            # Agenda de un médico en un rango de fechas
+            models.Index(fields=['medico', 'fecha_consulta', 'id'], name='consulta_medico_fecha_idx'),
+            # Historial de un paciente (más reciente primero)
+            models.Index(fields=['paciente', '-fecha_consulta', '-id'], name='consulta_paciente_fecha_idx'),
+            # Consultas por estado (p.ej. pendientes) en orden de fecha
+            models.Index(fields=['estado', 'fecha_consulta', 'id'], name='consulta_estado_fecha_idx'),
+        ]
+    def clean(self):
+        super().clean()
+        # Sin doble reserva del médico y dentro de su horario (agenda.py)
+        from .agenda import validar_consulta
+        validar_consulta(self)
+    def __str__(self): return f"Consulta {self.id} - {self.paciente}"
+
+class ConsultaMedicaCompleta(models.Model):
+    """
+    Sólo lectura: consultas activas + histórico archivado (vista de
+    particiones.py, sólo PostgreSQL). La API la usa cuando ?desde= pide
+    fechas anteriores al corte del archivo.
+    """
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    paciente = models.ForeignKey(Paciente, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    medico = models.ForeignKey(Medico, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    fecha_consulta = models.DateTimeField()
+    motivo = models.CharField(max_length=200)
+    diagnostico = models.CharField(max_length=200, blank=True)
+    estado = models.CharField(max_length=4, choices=ESTADO_CONSULTA_CHOICES, default='PEND')
+    class Meta:
+        managed = False
+        db_table = 'clinica_consultamedica_completa'
     def __str__(self): return f"Consulta {self.id} - {self.paciente}"
 
-class Tratamiento(models.Model):
-    # PROTECT: no se puede borrar la consulta si tiene tratamientos
-    consulta = models.ForeignKey(ConsultaMedica, on_delete=models.PROTECT, related_name='tratamientos')
+class Tratamiento(TimeStampedModel):
+    # PROTECT: no se puede borrar la consulta si tiene tratamientos.
+    # Sin FK en la BD: en PostgreSQL las consultas están particionadas
+    # (particiones.py) y no admiten FKs entrantes; PROTECT lo aplica el ORM.
+    consulta = models.ForeignKey(ConsultaMedica, on_delete=models.PROTECT, related_name='tratamientos',
+                                 db_constraint=False)
     descripcion = models.TextField()
     duracion_dias = models.PositiveIntegerField(default=0)
     observaciones = models.TextField(blank=True)
     def __str__(self): return f"Tratamiento {self.id}"
 
-class Medicamento(models.Model):
+class Medicamento(TimeStampedModel):
     nombre = models.CharField(max_length=120)
     laboratorio = models.CharField(max_length=120, blank=True)
     stock = models.PositiveIntegerField(default=0)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     def __str__(self): return self.nombre
 
-class RecetaMedica(models.Model):
+class RecetaMedica(TimeStampedModel):
     # PROTECT: no se puede borrar tratamiento/medicamento si hay recetas
     tratamiento = models.ForeignKey(Tratamiento, on_delete=models.PROTECT, related_name='recetas')
     medicamento = models.ForeignKey(Medicamento, on_delete=models.PROTECT, related_name='recetas')
     dosis = models.CharField(max_length=60)        # ej: "500 mg"
     frecuencia = models.CharField(max_length=60)   # ej: "cada 8 horas"
     duracion = models.CharField(max_length=60)     # ej: "7 días"
+    cantidad = models.PositiveIntegerField(default=1)  # unidades a descontar del stock
+    # La fija dispensacion.py al descontar el stock (no se edita a mano)
+    dispensada_en = models.DateTimeField(null=True, blank=True, editable=False)
     def __str__(self): return f"Receta {self.id} - {self.medicamento}"
 
 # ---------- NUEVAS TABLAS: Seguros ----------
-class SeguroSalud(models.Model):
+class SeguroSalud(TimeStampedModel):
     """Catálogo de seguros: Fonasa/Isapre y su plan."""
     nombre = models.CharField(max_length=120)        # p.ej. Fonasa / Colmena
     plan = models.CharField(max_length=120, blank=True)  # p.ej. B / Oro
@@ -94,7 +210,7 @@ class SeguroSalud(models.Model):
         unique_together = ('nombre', 'plan')         # evita duplicados exactos
     def __str__(self): return f"{self.nombre} {self.plan}".strip()
 
-class PacienteSeguro(models.Model):
+class PacienteSeguro(TimeStampedModel):
     """Relación Paciente–Seguro con datos propios de afiliación."""
     # CASCADE: al borrar paciente, se borran sus afiliaciones
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='seguros')
@@ -105,4 +221,65 @@ class PacienteSeguro(models.Model):
     vigente = models.BooleanField(default=True)
     class Meta:
         unique_together = ('paciente', 'seguro')
-    def __str__(self): return f"{self.paciente} - {self.seguro}"
\ No newline at end of file
+        indexes = [
+            # Parciales: sólo afiliaciones vigentes (por paciente y por seguro)
+            models.Index(fields=['paciente'], condition=models.Q(vigente=True),
+                         name='afiliacion_vigente_idx'),
+            models.Index(fields=['seguro'], condition=models.Q(vigente=True),
+                         name='afiliacion_seguro_vigente_idx'),
+        ]
+    def __str__(self): return f"{self.paciente} - {self.seguro}"
+# ---------- RESÚMENES (dashboard) ----------
+# Los mantiene resumenes.py en cada alta/cambio/baja (signals.py) y se
+# reconstruyen con `manage.py clinica_resumenes rebuild`. related_name='+':
+# no son dependencias "reales" (no aparecen en dependencias.py).
+class ResumenConsultasDiario(models.Model):
+    """Consultas por día (zona horaria local) y médico, desglosadas por estado."""
+    fecha = models.DateField()
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='+')
+    pendientes = models.PositiveIntegerField(default=0)
+    atendidas = models.PositiveIntegerField(default=0)
+    canceladas = models.PositiveIntegerField(default=0)
+    no_asiste = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'medico'], name='resumen_consultas_dia_medico_uniq'),
+        ]
+        indexes = [models.Index(fields=['fecha'], name='resumen_consultas_fecha_idx')]
+    def __str__(self): return f"{self.fecha} - médico {self.medico_id}: {self.total}"
+
+class ResumenAfiliaciones(models.Model):
+    """Afiliaciones por seguro (todas y vigentes)."""
+    seguro = models.OneToOneField(SeguroSalud, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    vigentes = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    def __str__(self): return f"{self.seguro_id}: {self.vigentes}/{self.total}"
+
+# ---------- TRABAJOS EN SEGUNDO PLANO ----------
+# Cola en la BD (trabajos.py): exports, imports, reconstrucciones y
+# cambios masivos fuera del request. Los ejecuta `manage.py clinica_worker`.
+class Trabajo(TimeStampedModel):
+    """Una operación encolada; `tipo` es una tarea registrada en trabajos.py."""
+    tipo = models.CharField(max_length=40)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=4, choices=ESTADO_TRABAJO_CHOICES, default='PEND')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    # No se toma antes de esta hora (los reintentos esperan con backoff)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    class Meta:
+        indexes = [
+            # Próximo trabajo: WHERE estado = 'PEND' ORDER BY disponible_en, id
+            models.Index(fields=['disponible_en', 'id'], condition=models.Q(estado='PEND'),
+                         name='trabajo_pendiente_idx'),
+            # Trabajos en ejecución que quedaron colgados (worker caído)
+            models.Index(fields=['iniciado_en'], condition=models.Q(estado='EJEC'),
+                         name='trabajo_ejecucion_idx'),
+        ]
+    def __str__(self): return f"Trabajo {self.id} ({self.tipo}, {self.get_estado_display()})"
@@ -0,0 +1,48 @@
+# EVA2/clinica/pagination.py
+# ---------------------------------------------------------
+# Paginación de la API (DRF).
+# - KeysetPagination: paginación por cursor (keyset) usando el
+#   ordering que ya declara el queryset de cada ViewSet.
+#   El costo de una página no depende de qué tan "profundo" navegue
+#   el cliente: se filtra por la última posición (WHERE campo < x)
+#   en vez de usar OFFSET.
+# - OffsetPagination: paginación clásica por número de página,
+#   disponible como opción (?page=N) para la API navegable.
+# ---------------------------------------------------------
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def orden_estable(queryset, por_defecto=("-id",)):
+    """
+    Devuelve el orden del queryset como tupla de strings, agregando la PK
+    como desempate (en el mismo sentido que el primer campo) para que
+    el orden sea único.
+    """
+    ordering = tuple(queryset.query.order_by) or tuple(por_defecto)
+    ordering = tuple("-id" if campo == "-pk" else "id" if campo == "pk" else campo for campo in ordering)
+    if not any(campo.lstrip("-") == "id" for campo in ordering):
+        ordering += ("-id" if ordering[0].startswith("-") else "id",)
+    return ordering
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination tomando el orden desde `queryset.query.order_by`."""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-id",)  # sólo se usa si el queryset no trae orden
+
+    def get_ordering(self, request, queryset, view):
+        return orden_estable(queryset, self.ordering)
+
+
+class OffsetPagination(PageNumberPagination):
+    """Paginación por número de página (opt-in con ?page=N)."""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = queryset.order_by(*orden_estable(queryset))
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,278 @@
+# EVA2/clinica/particiones.py
+# ---------------------------------------------------------
+# Particionado mensual de ConsultaMedica por fecha_consulta (sólo PostgreSQL).
+# - clinica_consultamedica es una tabla particionada por rango (la
+#   convierte la migración 0008, con su propio DDL): una partición por mes
+#   (hora local, TIME_ZONE) llamada clinica_consultamedica_pAAAA_MM, más
+#   una DEFAULT para lo que no tenga partición todavía. Las consultas con
+#   rango de fechas sólo leen los meses que tocan (partition pruning) y
+#   cada índice es del tamaño de un mes.
+# - Los índices de cada partición se llaman como el del padre + el sufijo
+#   del mes (consulta_fecha_idx_p2025_01), así EXPLAIN sigue mostrando
+#   qué índice de models.py se usa (explain.py).
+# - Histórico: los meses viejos se separan (DETACH) y pasan a
+#   clinica_consultamedica_historico, con las mismas columnas. La API
+#   sólo lo lee cuando ?desde= es anterior al corte (ConsultaMedicaCompleta,
+#   una vista UNION ALL de ambas tablas). Opcionalmente se exportan a
+#   CSV comprimido (gzip) y se eliminan de la BD.
+# - Los tratamientos y recetas de los meses archivados se quedan en sus
+#   tablas: la API de tratamientos no hace JOIN con la consulta y la
+#   facturación lee la vista cuando el período toca el histórico.
+# - La PK de la tabla particionada es (id, fecha_consulta): PostgreSQL no
+#   permite una FK hacia ella, así que Tratamiento.consulta no tiene
+#   constraint en la BD (PROTECT lo sigue aplicando el ORM).
+# - Si se agrega una columna a ConsultaMedica, hay que agregarla también
+#   al histórico y recrear la vista.
+# Mantención: `manage.py clinica_particiones` (crear, archivar, estado).
+# ---------------------------------------------------------
+
+import gzip
+import re
+from datetime import date, datetime, time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+TABLA = "clinica_consultamedica"
+HISTORICO = f"{TABLA}_historico"
+VISTA = f"{TABLA}_completa"
+DEFAULT = f"{TABLA}_default"
+CLAVE_CORTE = "clinica:consultas:corte"
+
+_NOMBRE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def activo():
+    """¿La tabla de consultas está particionada? (False en SQLite y sin la migración 0008)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLA])
+        fila = cursor.fetchone()
+    return fila is not None and fila[0] == "p"
+
+
+# ---------- Meses ----------
+def mes_de(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(mes, n):
+    total = mes.year * 12 + mes.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def inicio(mes):
+    """Medianoche local del primer día del mes (límite de la partición)."""
+    return timezone.make_aware(datetime.combine(mes, time.min))
+
+
+def sufijo(mes):
+    return f"p{mes:%Y_%m}"
+
+
+def nombre_particion(mes):
+    return f"{TABLA}_{sufijo(mes)}"
+
+
+def listar(cursor, padre=TABLA):
+    """{mes: nombre} de las particiones de `padre` (la DEFAULT con mes None)."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)", [padre],
+    )
+    particiones = {}
+    for (nombre,) in cursor.fetchall():
+        coincide = _NOMBRE.search(nombre)
+        mes = date(int(coincide[1]), int(coincide[2]), 1) if coincide else None
+        particiones[mes] = nombre
+    return particiones
+
+
+def _meses_con_datos(cursor, tabla):
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', fecha_consulta AT TIME ZONE %s)::date FROM {tabla}",
+        [settings.TIME_ZONE],
+    )
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+# ---------- Creación ----------
+def _renombrar_indices(cursor, tabla, sufijo_indices):
+    """Los índices de una partición toman el nombre del índice del padre + sufijo."""
+    cursor.execute(
+        "SELECT hijo.relname, padre.relname FROM pg_index x "
+        "JOIN pg_class hijo ON hijo.oid = x.indexrelid "
+        "JOIN pg_inherits i ON i.inhrelid = x.indexrelid "
+        "JOIN pg_class padre ON padre.oid = i.inhparent "
+        "WHERE x.indrelid = to_regclass(%s)", [tabla],
+    )
+    for hijo, padre in cursor.fetchall():
+        nuevo = f"{padre[:54]}_{sufijo_indices}"  # máximo 63 caracteres
+        if hijo != nuevo:
+            cursor.execute(f"ALTER INDEX {hijo} RENAME TO {nuevo}")
+
+
+def crear_particion(cursor, mes):
+    """
+    Crea la partición del mes. Si la DEFAULT ya tiene filas de ese mes,
+    se mueven a la nueva partición (PostgreSQL no deja crearla con ellas ahí).
+    """
+    nombre = nombre_particion(mes)
+    desde, hasta = inicio(mes), inicio(sumar_meses(mes, 1))
+    rango = "fecha_consulta >= %s AND fecha_consulta < %s"
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT} WHERE {rango})", [desde, hasta])
+    mover = cursor.fetchone()[0]
+    if mover:
+        cursor.execute(f"CREATE TEMP TABLE clinica_mover (LIKE {TABLA}) ON COMMIT DROP")
+        cursor.execute(
+            f"WITH movidas AS (DELETE FROM {DEFAULT} WHERE {rango} RETURNING *) "
+            f"INSERT INTO clinica_mover SELECT * FROM movidas", [desde, hasta],
+        )
+    cursor.execute(f"CREATE TABLE {nombre} PARTITION OF {TABLA} FOR VALUES FROM (%s) TO (%s)", [desde, hasta])
+    _renombrar_indices(cursor, nombre, sufijo(mes))
+    if mover:
+        cursor.execute(f"INSERT INTO {TABLA} SELECT * FROM clinica_mover")
+        cursor.execute("DROP TABLE clinica_mover")
+    return nombre
+
+
+@transaction.atomic
+def asegurar_particiones(meses_futuros=None):
+    """
+    Crea las particiones que falten: desde el mes actual hasta
+    `meses_futuros` hacia adelante, más los meses que ya tengan filas en
+    la DEFAULT. Devuelve los nombres creados.
+    """
+    if meses_futuros is None:
+        meses_futuros = settings.CONSULTAS_PARTICIONES["MESES_FUTUROS"]
+    actual = mes_de(timezone.localdate())
+    with connection.cursor() as cursor:
+        existentes = set(listar(cursor)) | set(listar(cursor, HISTORICO))
+        meses = {sumar_meses(actual, n) for n in range(meses_futuros + 1)} | _meses_con_datos(cursor, DEFAULT)
+        return [crear_particion(cursor, mes) for mes in sorted(meses - existentes)]
+
+
+# ---------- Archivo ----------
+def _copiar_a(cursor, sql, ruta):
+    """COPY ... TO STDOUT a un archivo gzip."""
+    raw = cursor.cursor
+    with gzip.open(ruta, "wb") as archivo:
+        if hasattr(raw, "copy_expert"):  # psycopg2
+            raw.copy_expert(sql, archivo)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                for datos in copy:
+                    archivo.write(datos)
+
+
+def exportar(cursor, particion, mes, directorio):
+    """Consultas del mes y sus tratamientos y recetas, a CSV con encabezado comprimidos con gzip."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    tratamientos = f"SELECT t.* FROM clinica_tratamiento t JOIN {particion} c ON c.id = t.consulta_id"
+    consultas_sql = {
+        "consultas": f"SELECT * FROM {particion}",
+        "tratamientos": tratamientos,
+        "recetas": f"SELECT r.* FROM clinica_recetamedica r JOIN ({tratamientos}) t ON t.id = r.tratamiento_id",
+    }
+    rutas = []
+    for nombre, sql in consultas_sql.items():
+        ruta = directorio / f"{nombre}_{mes:%Y_%m}.csv.gz"
+        _copiar_a(cursor, f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", ruta)
+        rutas.append(ruta)
+    return rutas
+
+
+def archivar(meses_activos=None, directorio=None, eliminar=False):
+    """
+    Saca de la tabla activa las particiones de meses anteriores a los
+    últimos `meses_activos`. Por defecto pasan al histórico; con
+    `directorio` se exportan antes (gzip) y con `eliminar` además se
+    borran de la BD junto con sus tratamientos y recetas.
+    Devuelve [(mes, filas, rutas)].
+    """
+    if meses_activos is None:
+        meses_activos = settings.CONSULTAS_PARTICIONES["MESES_ACTIVOS"]
+    if eliminar and directorio is None:
+        raise ValueError("Para eliminar hay que exportar antes (directorio).")
+    limite = sumar_meses(mes_de(timezone.localdate()), -meses_activos)
+    archivados = []
+    with connection.cursor() as cursor:
+        for mes, nombre in sorted((m, n) for m, n in listar(cursor).items() if m is not None and m < limite):
+            with transaction.atomic():
+                cursor.execute(f"SELECT count(*) FROM {nombre}")
+                filas = cursor.fetchone()[0]
+                rutas = exportar(cursor, nombre, mes, directorio) if directorio is not None else []
+                cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}")
+                if eliminar:
+                    tratamientos = f"SELECT t.id FROM clinica_tratamiento t JOIN {nombre} c ON c.id = t.consulta_id"
+                    cursor.execute(f"DELETE FROM clinica_recetamedica WHERE tratamiento_id IN ({tratamientos})")
+                    cursor.execute(f"DELETE FROM clinica_tratamiento WHERE consulta_id IN (SELECT id FROM {nombre})")
+                    # Los chequeos de FK diferidos pendientes impiden el DROP
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                    cursor.execute(f"DROP TABLE {nombre}")
+                else:
+                    cursor.execute(
+                        f"ALTER TABLE {HISTORICO} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)",
+                        [inicio(mes), inicio(sumar_meses(mes, 1))],
+                    )
+            archivados.append((mes, filas, rutas))
+    olvidar_corte()
+    return archivados
+
+
+def estado():
+    """[(tabla, mes, filas estimadas)] de las particiones activas y del histórico."""
+    filas = []
+    with connection.cursor() as cursor:
+        for padre in (TABLA, HISTORICO):
+            for mes, nombre in sorted(listar(cursor, padre).items(), key=lambda p: p[0] or date.max):
+                cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)", [nombre])
+                filas.append((padre, mes, cursor.fetchone()[0]))
+    return filas
+
+
+# ---------- Lectura del histórico desde la API ----------
+def corte():
+    """Inicio del primer mes que no está en el histórico, o None si el histórico está vacío."""
+    def calcular():
+        if not activo():
+            return None
+        with connection.cursor() as cursor:
+            meses = [m for m in listar(cursor, HISTORICO) if m is not None]
+        return inicio(sumar_meses(max(meses), 1)) if meses else None
+    return cache.get_or_set(CLAVE_CORTE, calcular, 300)
+
+
+def olvidar_corte():
+    cache.delete(CLAVE_CORTE)
+
+
+def incluye_archivo(desde):
+    """¿El valor de ?desde= pide fechas que están en el histórico?"""
+    if not desde:
+        return False
+    fecha = parse_datetime(desde)
+    if fecha is None:
+        dia = parse_date(desde)
+        if dia is None:
+            return False  # el filterset responde 400
+        fecha = datetime.combine(dia, time.min)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    limite = corte()
+    return limite is not None and fecha < limite
+
+
+def con_archivo(queryset):
+    """El mismo queryset de consultas (select_related y orden) sobre la vista con el histórico."""
+    from .models import ConsultaMedicaCompleta
+    completo = ConsultaMedicaCompleta.objects.all()
+    if isinstance(queryset.query.select_related, dict):
+        completo = completo.select_related(*queryset.query.select_related)
+    return completo.order_by(*queryset.query.order_by)
@@ -0,0 +1,180 @@
+# EVA2/clinica/resumenes.py
+# ---------------------------------------------------------
+# Tablas resumen del dashboard, mantenidas de forma incremental.
+# - ResumenConsultasDiario: una fila por (día local, médico) con un
+#   contador por estado. ResumenAfiliaciones: una fila por seguro.
+# - Cada cambio se traduce a deltas {clave: +n/-n} que se aplican con
+#   UPDATE ... SET col = col + n (F()), sin leer-modificar-escribir.
+#   Si la fila no existe se crea; si dos transacciones la crean a la vez,
+#   la que pierde reintenta el UPDATE.
+#   Un delta negativo satura el contador en 0 (si el resumen se desfasó,
+#   p.ej. por un UPDATE directo en la BD) y deja un warning en el log en vez
+#   de romper el save con el CHECK de PositiveIntegerField.
+# - Las signals (signals.py) llaman a estas funciones en cada save/delete;
+#   los lotes (bulk, importación) agrupan los deltas antes de aplicarlos.
+# - `reconstruir()` recalcula todo con GROUP BY (comando clinica_resumenes).
+# ---------------------------------------------------------
+
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import ConsultaMedica, PacienteSeguro, ResumenAfiliaciones, ResumenConsultasDiario
+
+# estado de ConsultaMedica -> columna de ResumenConsultasDiario
+COLUMNA_ESTADO = {
+    "PEND": "pendientes",
+    "ATEN": "atendidas",
+    "CANC": "canceladas",
+    "NOAS": "no_asiste",
+}
+
+logger = logging.getLogger("clinica.resumenes")
+
+
+# ---------- Claves ----------
+def clave_consulta(fecha_consulta, medico_id, estado):
+    """(día local, médico, estado): lo que define en qué contador cae una consulta."""
+    return (timezone.localdate(fecha_consulta), medico_id, estado)
+
+
+def clave_afiliacion(seguro_id, vigente):
+    return (seguro_id, bool(vigente))
+
+
+# ---------- Aplicar deltas ----------
+def _sumar(model, filtro, incrementos):
+    """UPDATE con F() sobre la fila de `filtro`; la crea si no existe."""
+    cambios = {col: F(col) + n for col, n in incrementos.items()}
+    # Con deltas negativos el UPDATE sólo aplica si ningún contador queda bajo cero
+    alcanza = {f"{col}__gte": -n for col, n in incrementos.items() if n < 0}
+    if model.objects.filter(**filtro, **alcanza).update(**cambios):
+        return
+    saturados = {col: Greatest(F(col) + n, 0) if n < 0 else F(col) + n for col, n in incrementos.items()}
+    if alcanza and model.objects.filter(**filtro).update(**saturados):
+        _desfase(model, filtro, incrementos)
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**filtro, **{col: max(n, 0) for col, n in incrementos.items()})
+        if alcanza:
+            _desfase(model, filtro, incrementos)
+    except IntegrityError:  # otra transacción la creó primero
+        model.objects.filter(**filtro).update(**saturados)
+
+
+def _desfase(model, filtro, incrementos):
+    logger.warning(
+        "%s %s desfasado: los deltas %s lo dejaban bajo cero (se saturó en 0; "
+        "corregir con `manage.py clinica_resumenes rebuild`)",
+        model.__name__, filtro, dict(incrementos),
+    )
+
+
+def aplicar_consultas(deltas):
+    """deltas: Counter {(fecha, medico_id, estado): n} (n puede ser negativo)."""
+    por_fila = {}
+    for (fecha, medico_id, estado), n in deltas.items():
+        if not n:
+            continue
+        fila = por_fila.setdefault((fecha, medico_id), Counter())
+        fila[COLUMNA_ESTADO[estado]] += n
+        fila["total"] += n
+    for (fecha, medico_id), incrementos in sorted(por_fila.items()):
+        _sumar(ResumenConsultasDiario, {"fecha": fecha, "medico_id": medico_id}, incrementos)
+        if incrementos["total"] < 0:
+            # Sin consultas ese día: la fila no aporta nada al dashboard
+            ResumenConsultasDiario.objects.filter(fecha=fecha, medico_id=medico_id, total=0).delete()
+
+
+def aplicar_afiliaciones(deltas):
+    """deltas: Counter {(seguro_id, vigente): n}."""
+    por_fila = {}
+    for (seguro_id, vigente), n in deltas.items():
+        if not n:
+            continue
+        fila = por_fila.setdefault(seguro_id, Counter())
+        fila["total"] += n
+        if vigente:
+            fila["vigentes"] += n
+    for seguro_id, incrementos in sorted(por_fila.items()):
+        _sumar(ResumenAfiliaciones, {"seguro_id": seguro_id}, incrementos)
+        if incrementos["total"] < 0:
+            ResumenAfiliaciones.objects.filter(seguro_id=seguro_id, total=0).delete()
+
+
+def sumar_consultas(consultas, signo=1):
+    aplicar_consultas(Counter({
+        clave: signo * n for clave, n in
+        Counter(clave_consulta(c.fecha_consulta, c.medico_id, c.estado) for c in consultas).items()
+    }))
+
+
+def sumar_afiliaciones(afiliaciones, signo=1):
+    aplicar_afiliaciones(Counter({
+        clave: signo * n for clave, n in
+        Counter(clave_afiliacion(a.seguro_id, a.vigente) for a in afiliaciones).items()
+    }))
+
+
+# ---------- Reconstrucción completa ----------
+def calcular_consultas():
+    """GROUP BY sobre ConsultaMedica: [{fecha, medico_id, pendientes, ..., total}]."""
+    return (
+        ConsultaMedica.objects.order_by()
+        .annotate(fecha=TruncDate("fecha_consulta", tzinfo=timezone.get_current_timezone()))
+        .values("fecha", "medico_id")
+        .annotate(
+            total=Count("pk"),
+            **{col: Count("pk", filter=Q(estado=estado)) for estado, col in COLUMNA_ESTADO.items()},
+        )
+    )
+
+
+def calcular_afiliaciones():
+    return (
+        PacienteSeguro.objects.order_by().values("seguro_id")
+        .annotate(total=Count("pk"), vigentes=Count("pk", filter=Q(vigente=True)))
+    )
+
+
+@transaction.atomic
+def reconstruir(batch_size=1000):
+    """Borra y recalcula ambas tablas. Devuelve (filas_consultas, filas_afiliaciones)."""
+    if connection.vendor == "postgresql":
+        # Dos reconstrucciones a la vez (p.ej. en dos workers, trabajos.py) chocarían
+        # en las claves únicas; los deltas de las signals esperan a que termine.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {ResumenConsultasDiario._meta.db_table}, {ResumenAfiliaciones._meta.db_table} "
+                f"IN EXCLUSIVE MODE"
+            )
+    ResumenConsultasDiario.objects.all().delete()
+    ResumenAfiliaciones.objects.all().delete()
+    consultas = ResumenConsultasDiario.objects.bulk_create(
+        (ResumenConsultasDiario(**fila) for fila in calcular_consultas().iterator()), batch_size=batch_size,
+    )
+    afiliaciones = ResumenAfiliaciones.objects.bulk_create(
+        (ResumenAfiliaciones(**fila) for fila in calcular_afiliaciones().iterator()), batch_size=batch_size,
+    )
+    return len(consultas), len(afiliaciones)
+
+
+def diferencias():
+    """Filas en que el resumen incremental no calza con el GROUP BY (para verificar)."""
+    columnas = ["total", *COLUMNA_ESTADO.values()]
+    esperado = {(f["fecha"], f["medico_id"]): [f[c] for c in columnas] for f in calcular_consultas()}
+    actual = {
+        (f["fecha"], f["medico_id"]): [f[c] for c in columnas]
+        for f in ResumenConsultasDiario.objects.values("fecha", "medico_id", *columnas)
+    }
+    malas = [("consultas", k) for k in esperado.keys() | actual.keys() if esperado.get(k) != actual.get(k)]
+    esperado = {f["seguro_id"]: (f["total"], f["vigentes"]) for f in calcular_afiliaciones()}
+    actual = {f["seguro_id"]: (f["total"], f["vigentes"])
+              for f in ResumenAfiliaciones.objects.values("seguro_id", "total", "vigentes")}
+    malas += [("afiliaciones", k) for k in esperado.keys() | actual.keys() if esperado.get(k) != actual.get(k)]
+    return malas
@@ -0,0 +1,71 @@
+# EVA2/clinica/routers.py
+# ---------------------------------------------------------
+# Ruteo primario / réplicas de lectura (settings.DATABASE_REPLICAS).
+# - Las escrituras siempre van a 'default' (el primario).
+# - Una lectura va a una réplica sólo si ocurre dentro de una request
+#   HTTP segura (GET/HEAD/OPTIONS) de un cliente que no escribió hace poco
+#   (ReplicaPinMiddleware en middleware.py), la request todavía no
+#   escribió y no hay una transacción abierta en el primario.
+#   Todo lo demás (POST, comandos, shell, tests sin réplicas) lee del primario.
+# - El estado de la request vive en un ContextVar: funciona igual con
+#   WSGI (un hilo por request) y con ASGI (una tarea por request, y los
+#   hilos de sync_to_async heredan el contexto).
+# ---------------------------------------------------------
+
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class EstadoLectura:
+    primario: bool          # la request debe leer del primario (no es segura o el cliente escribió)
+    escribio: bool = False  # hubo una escritura durante la request
+
+
+_estado = ContextVar("clinica_estado_lectura", default=None)
+
+
+def iniciar_request(primario):
+    """Lo llama el middleware al empezar cada request."""
+    estado = EstadoLectura(primario=primario)
+    _estado.set(estado)
+    return estado
+
+
+def estado_actual():
+    return _estado.get()
+
+
+def alias_lectura():
+    """Alias para una lectura en el contexto actual."""
+    replicas = settings.DATABASE_REPLICAS
+    estado = _estado.get()
+    if not replicas or estado is None or estado.primario or estado.escribio:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS  # lo que se lee en una transacción debe ver sus propias escrituras
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instancia = hints.get("instance")
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db  # relaciones: misma BD que el objeto de origen
+        return alias_lectura()
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
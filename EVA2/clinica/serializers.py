@@ -1,54 +1,169 @@
 # clinica/serializers.py
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from . import agenda, trabajos
+from .campos import CamposDinamicosSerializerMixin
+from .metricas import SerializacionMedidaMixin
 from .models import (
     Paciente, Medico, Especialidad, ConsultaMedica,
     Tratamiento, Medicamento, RecetaMedica,
-    SeguroSalud, PacienteSeguro
+    SeguroSalud, PacienteSeguro, HorarioAtencion, Trabajo,
 )
 
-# Un serializer por modelo: transforma entre objetos Django <-> JSON
 
-class PacienteSerializer(serializers.ModelSerializer):
+def _validar(funcion, *args):
+    """Traduce un ValidationError de Django (agenda.py) al de DRF (respuesta 400)."""
+    try:
+        funcion(*args)
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError(exc.message_dict if hasattr(exc, "error_dict") else exc.messages)
+
+# Un serializer por modelo: transforma entre objetos Django <-> JSON.
+# CamposDinamicosSerializerMixin: ?fields= y ?expand= en list/retrieve
+# (ver campos.py); `expandibles` indica qué FKs se pueden anidar.
+# SerializacionMedidaMixin: tiempo de serializer.data en las métricas (metricas.py).
+
+class PacienteSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Paciente
+        # Columnas internas de búsqueda (se derivan de rut/nombre/apellido)
+        exclude = ["rut_normalizado", "nombre_busqueda"]
+
+class PacienteBusquedaSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    """Respuesta liviana del typeahead (/api/pacientes/buscar/)."""
     class Meta:
         model = Paciente
+        fields = ["id", "rut", "nombre", "apellido"]
+
+class EspecialidadSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Especialidad
         fields = "__all__"
 
-class MedicoSerializer(serializers.ModelSerializer):
+class MedicoSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"especialidad": EspecialidadSerializer}
     class Meta:
         model = Medico
         fields = "__all__"
 
-class EspecialidadSerializer(serializers.ModelSerializer):
+class ConsultaMedicaSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"paciente": PacienteSerializer, "medico": MedicoSerializer}
     class Meta:
-        model = Especialidad
+        model = ConsultaMedica
         fields = "__all__"
 
-class ConsultaMedicaSerializer(serializers.ModelSerializer):
+    # La agenda se valida con el médico bloqueado, justo antes de guardar
+    # (ver agenda.py). El endpoint bulk la valida en lote (validar_bulk del ViewSet).
+    def _guardar(self, instance):
+        with agenda.agenda_bloqueada(instance.medico_id):
+            _validar(agenda.validar_consulta, instance)
+            instance.save()
+        return instance
+
+    def create(self, validated_data):
+        return self._guardar(ConsultaMedica(**validated_data))
+
+    def update(self, instance, validated_data):
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        return self._guardar(instance)
+
+class HorarioAtencionSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"medico": MedicoSerializer}
     class Meta:
-        model = ConsultaMedica
+        model = HorarioAtencion
         fields = "__all__"
 
-class TratamientoSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        horario = HorarioAtencion(pk=getattr(self.instance, "pk", None), **{
+            **({f: getattr(self.instance, f) for f in ("medico", "dia_semana", "hora_inicio", "hora_fin")}
+               if self.instance else {}),
+            **attrs,
+        })
+        _validar(agenda.validar_horario, horario)
+        return attrs
+
+class TratamientoSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"consulta": ConsultaMedicaSerializer}
     class Meta:
         model = Tratamiento
         fields = "__all__"
 
-class MedicamentoSerializer(serializers.ModelSerializer):
+class MedicamentoSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Medicamento
         fields = "__all__"
 
-class RecetaMedicaSerializer(serializers.ModelSerializer):
+class RecetaMedicaSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"tratamiento": TratamientoSerializer, "medicamento": MedicamentoSerializer}
     class Meta:
         model = RecetaMedica
         fields = "__all__"
 
-class SeguroSaludSerializer(serializers.ModelSerializer):
+class SeguroSaludSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = SeguroSalud
         fields = "__all__"
 
-class PacienteSeguroSerializer(serializers.ModelSerializer):
+class PacienteSeguroSerializer(SerializacionMedidaMixin, CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    expandibles = {"paciente": PacienteSerializer, "seguro": SeguroSaludSerializer}
     class Meta:
         model = PacienteSeguro
         fields = "__all__"
+
+# ---------- Historial clínico (/api/pacientes/{id}/historial/) ----------
+# Anidados y de sólo lectura; las relaciones ya vienen precargadas (historial.py).
+
+class HistorialRecetaSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    medicamento = MedicamentoSerializer(read_only=True)
+    class Meta:
+        model = RecetaMedica
+        fields = ["id", "medicamento", "dosis", "frecuencia", "duracion", "cantidad", "dispensada_en"]
+
+class HistorialTratamientoSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    recetas = HistorialRecetaSerializer(many=True, read_only=True)
+    class Meta:
+        model = Tratamiento
+        fields = ["id", "descripcion", "duracion_dias", "observaciones", "recetas"]
+
+class HistorialConsultaSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    medico_nombre = serializers.CharField(source="medico.__str__", read_only=True)
+    especialidad = serializers.CharField(source="medico.especialidad.nombre", read_only=True)
+    tratamientos = HistorialTratamientoSerializer(many=True, read_only=True)
+    class Meta:
+        model = ConsultaMedica
+        fields = [
+            "id", "fecha_consulta", "estado", "motivo", "diagnostico",
+            "medico", "medico_nombre", "especialidad", "tratamientos",
+        ]
+
+class HistorialSeguroSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    nombre = serializers.CharField(source="seguro.nombre", read_only=True)
+    plan = serializers.CharField(source="seguro.plan", read_only=True)
+    class Meta:
+        model = PacienteSeguro
+        fields = ["id", "seguro", "nombre", "plan", "nro_poliza", "cobertura_porcentaje"]
+
+# ---------- Trabajos en segundo plano (/api/trabajos/) ----------
+class TrabajoSerializer(SerializacionMedidaMixin, serializers.ModelSerializer):
+    """Al crear sólo se indican tipo y parámetros; el resto lo lleva la cola (trabajos.py)."""
+    class Meta:
+        model = Trabajo
+        fields = [
+            "id", "tipo", "parametros", "estado", "intentos", "max_intentos", "disponible_en",
+            "iniciado_en", "terminado_en", "resultado", "error", "created_at", "updated_at",
+        ]
+        read_only_fields = [f for f in fields if f not in ("tipo", "parametros", "max_intentos")]
+        extra_kwargs = {"max_intentos": {"required": False, "min_value": 1}}
+
+    def validate(self, attrs):
+        try:
+            trabajos.validar(attrs["tipo"], attrs.get("parametros", {}))
+        except trabajos.TrabajoInvalido as exc:
+            raise serializers.ValidationError(str(exc))
+        return attrs
+
+    def create(self, validated_data):
+        return trabajos.encolar(
+            validated_data["tipo"], validated_data.get("parametros", {}), validated_data.get("max_intentos"),
+        )
@@ -0,0 +1,73 @@
+# EVA2/clinica/signals.py
+# ---------------------------------------------------------
+# Signals de la app (se conectan en ClinicaConfig.ready()).
+# - Catálogos: cualquier alta/cambio/baja invalida su caché (cache.py)
+#   al confirmarse la transacción.
+# - Consultas y afiliaciones: mantienen las tablas resumen (resumenes.py).
+#   pre_save guarda los valores anteriores para restarlos en post_save.
+# ---------------------------------------------------------
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import cache, resumenes
+from .models import ConsultaMedica, PacienteSeguro
+
+
+def invalidar_catalogo(sender, **kwargs):
+    # Al confirmar: antes, otro request podría cachear las filas viejas con la versión nueva
+    transaction.on_commit(lambda: cache.invalidar(sender))
+
+
+for _model in cache.CATALOGOS:
+    post_save.connect(invalidar_catalogo, sender=_model, dispatch_uid=f"catalogo_save_{_model.__name__}")
+    post_delete.connect(invalidar_catalogo, sender=_model, dispatch_uid=f"catalogo_delete_{_model.__name__}")
+
+
+# ---------- Resúmenes del dashboard ----------
+def _anterior(sender, instance, campos):
+    if instance.pk is None or instance._state.adding:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+def consulta_pre_save(sender, instance, **kwargs):
+    instance._resumen_anterior = _anterior(sender, instance, ("fecha_consulta", "medico_id", "estado"))
+
+
+def consulta_post_save(sender, instance, **kwargs):
+    deltas = Counter({resumenes.clave_consulta(instance.fecha_consulta, instance.medico_id, instance.estado): 1})
+    anterior = getattr(instance, "_resumen_anterior", None)
+    if anterior:
+        deltas[resumenes.clave_consulta(**anterior)] -= 1
+    resumenes.aplicar_consultas(deltas)
+
+
+def consulta_post_delete(sender, instance, **kwargs):
+    resumenes.sumar_consultas([instance], signo=-1)
+
+
+def afiliacion_pre_save(sender, instance, **kwargs):
+    instance._resumen_anterior = _anterior(sender, instance, ("seguro_id", "vigente"))
+
+
+def afiliacion_post_save(sender, instance, **kwargs):
+    deltas = Counter({resumenes.clave_afiliacion(instance.seguro_id, instance.vigente): 1})
+    anterior = getattr(instance, "_resumen_anterior", None)
+    if anterior:
+        deltas[resumenes.clave_afiliacion(**anterior)] -= 1
+    resumenes.aplicar_afiliaciones(deltas)
+
+
+def afiliacion_post_delete(sender, instance, **kwargs):
+    resumenes.sumar_afiliaciones([instance], signo=-1)
+
+
+pre_save.connect(consulta_pre_save, sender=ConsultaMedica, dispatch_uid="resumen_consulta_pre_save")
+post_save.connect(consulta_post_save, sender=ConsultaMedica, dispatch_uid="resumen_consulta_save")
+post_delete.connect(consulta_post_delete, sender=ConsultaMedica, dispatch_uid="resumen_consulta_delete")
+pre_save.connect(afiliacion_pre_save, sender=PacienteSeguro, dispatch_uid="resumen_afiliacion_pre_save")
+post_save.connect(afiliacion_post_save, sender=PacienteSeguro, dispatch_uid="resumen_afiliacion_save")
+post_delete.connect(afiliacion_post_delete, sender=PacienteSeguro, dispatch_uid="resumen_afiliacion_delete")
@@ -0,0 +1,288 @@
+# EVA2/clinica/sintetico.py
+# ---------------------------------------------------------
+# Datos sintéticos a escala para pruebas de carga (seed_clinica).
+# - Determinista: con la misma semilla, fecha de referencia y BD de
+#   partida se generan exactamente las mismas filas (salvo created_at /
+#   updated_at, que pone el modelo al insertar).
+# - Los pacientes se reparten en "tareas" de tamaño fijo. Cada tarea usa
+#   su propio random.Random(semilla:tarea) y un rango de ids calculado de
+#   antemano para cada tabla, así sus consultas, tratamientos, recetas y
+#   afiliaciones apuntan a FKs que existen sin consultar la BD, y el
+#   resultado no depende de cuántos procesos corran ni en qué orden.
+# - Inserta con bulk_create (ids explícitos) y una transacción por tarea;
+#   al final ajusta las secuencias, reconstruye los resúmenes (bulk_create
+#   no dispara las signals), invalida la caché de catálogos y en
+#   PostgreSQL corre ANALYZE.
+# ---------------------------------------------------------
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cache, resumenes
+from .models import (
+    ConsultaMedica, Especialidad, HorarioAtencion, Medicamento, Medico, Paciente,
+    PacienteSeguro, RecetaMedica, SeguroSalud, Tratamiento,
+)
+
+NOMBRES = [
+    "María", "José", "Juan", "Ana", "Francisca", "Luis", "Camila", "Carlos", "Valentina", "Jorge",
+    "Javiera", "Pedro", "Catalina", "Diego", "Fernanda", "Matías", "Constanza", "Sebastián", "Daniela",
+    "Felipe", "Sofía", "Cristián", "Isidora", "Rodrigo", "Antonia", "Benjamín", "Paula", "Tomás",
+    "Carolina", "Vicente", "Ignacia", "Nicolás", "Gabriela", "Joaquín", "Rocío", "Andrés",
+]
+APELLIDOS = [
+    "González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda",
+    "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya", "Flores", "Espinoza",
+    "Valenzuela", "Castillo", "Tapia", "Reyes", "Gutiérrez", "Castro", "Pizarro", "Álvarez", "Vásquez",
+    "Sánchez", "Fernández", "Ramírez", "Carrasco", "Gómez", "Cortés", "Herrera", "Núñez",
+]
+CALLES = ["Av. Providencia", "Los Carrera", "O'Higgins", "Gran Avenida", "Pajaritos", "Irarrázaval", "Vicuña Mackenna"]
+ESPECIALIDADES = [
+    ("Medicina General", 20), ("Pediatría", 30), ("Cardiología", 30), ("Dermatología", 20),
+    ("Ginecología", 30), ("Traumatología", 30), ("Oftalmología", 20), ("Neurología", 45),
+    ("Psiquiatría", 45), ("Otorrinolaringología", 20), ("Endocrinología", 30), ("Kinesiología", 45),
+]
+SEGUROS = [
+    ("Fonasa", "A", 100), ("Fonasa", "B", 90), ("Fonasa", "C", 80), ("Fonasa", "D", 70),
+    ("Colmena", "Oro", 80), ("Banmédica", "Plus", 75), ("Cruz Blanca", "Base", 60), ("Consalud", "Full", 70),
+]
+PRINCIPIOS = [
+    "Paracetamol", "Ibuprofeno", "Amoxicilina", "Losartán", "Metformina", "Omeprazol", "Atorvastatina",
+    "Salbutamol", "Loratadina", "Sertralina", "Levotiroxina", "Enalapril", "Clonazepam", "Prednisona",
+]
+PRESENTACIONES = ["100 mg", "250 mg", "500 mg", "850 mg", "1 g", "5 mg/ml", "50 mcg"]
+LABORATORIOS = ["Laboratorio Chile", "Saval", "Recalcine", "Andrómaco", "Bagó", "Pasteur"]
+MOTIVOS = ["Control", "Dolor abdominal", "Fiebre", "Tos persistente", "Cefalea", "Control crónico",
+           "Dolor lumbar", "Chequeo preventivo", "Alergia", "Hipertensión"]
+DIAGNOSTICOS = ["", "Resfrío común", "Gastritis", "Lumbago", "Migraña", "HTA controlada",
+                "Rinitis alérgica", "Diabetes tipo 2", "Bronquitis aguda"]
+INDICACIONES = ["Reposo", "Dieta liviana", "Kinesioterapia", "Control en 30 días", "Ejercicio moderado"]
+FRECUENCIAS = ["cada 6 horas", "cada 8 horas", "cada 12 horas", "cada 24 horas"]
+DURACIONES = ["3 días", "5 días", "7 días", "14 días", "30 días"]
+# (estado, peso) de las consultas pasadas; las futuras quedan pendientes
+ESTADOS_PASADOS = (["ATEN", "CANC", "NOAS"], [80, 12, 8])
+# Primer número de RUT sintético (pacientes y médicos usan rangos distintos)
+RUT_PACIENTES = 30_000_000
+RUT_MEDICOS = 5_000_000
+
+MODELOS = (Paciente, PacienteSeguro, ConsultaMedica, Tratamiento, RecetaMedica)
+
+
+def digito_verificador(numero):
+    """Dígito verificador de un RUT chileno (módulo 11)."""
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: "0", 10: "K"}.get(resto, str(resto))
+
+
+def rut(numero):
+    return f"{numero}-{digito_verificador(numero)}"
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Qué generar y con qué ids. Se arma una vez y se reparte a los procesos."""
+    semilla: int
+    referencia: datetime    # fin del período (las consultas posteriores son agenda futura)
+    dias: int               # largo del período de consultas
+    pacientes: int
+    consultas: int
+    tratamientos: int
+    recetas: int
+    tamano_tarea: int
+    lote: int
+    base: dict = field(default_factory=dict)  # model -> primer id libre
+    medicos: tuple = ()
+    seguros: tuple = ()     # (id, cobertura)
+    medicamentos: tuple = ()
+
+    @property
+    def tareas(self):
+        return range(-(-self.pacientes // self.tamano_tarea))
+
+    # Ids acumulados hasta el paciente x (x en 0..pacientes): proporcionales,
+    # de modo que cada tarea tenga su propio rango contiguo en cada tabla
+    def consultas_hasta(self, x):
+        return self.consultas * x // self.pacientes
+
+    def tratamientos_hasta(self, x):
+        return self.tratamientos * self.consultas_hasta(x) // max(self.consultas, 1)
+
+    def recetas_hasta(self, x):
+        return self.recetas * self.tratamientos_hasta(x) // max(self.tratamientos, 1)
+
+
+def _siguiente_id(model):
+    return (model.objects.aggregate(m=Max("pk"))["m"] or 0) + 1
+
+
+def crear_catalogos(semilla, n_medicos, n_medicamentos, lote):
+    """Especialidades y seguros (get_or_create), médicos con horario y medicamentos."""
+    rng = random.Random(f"{semilla}:catalogos")
+    especialidades = [
+        Especialidad.objects.get_or_create(nombre=nombre, defaults={"duracion_slot_minutos": minutos})[0].pk
+        for nombre, minutos in ESPECIALIDADES
+    ]
+    seguros = tuple(
+        (SeguroSalud.objects.get_or_create(nombre=nombre, plan=plan)[0].pk, cobertura)
+        for nombre, plan, cobertura in SEGUROS
+    )
+    base = _siguiente_id(Medico)
+    medicos = [
+        Medico(
+            pk=base + i, nombre=rng.choice(NOMBRES), apellido=rng.choice(APELLIDOS),
+            rut=rut(RUT_MEDICOS + base + i), correo=f"medico{base + i}@saludvital.cl",
+            especialidad_id=rng.choice(especialidades), activo=rng.random() > 0.05,
+        )
+        for i in range(n_medicos)
+    ]
+    Medico.objects.bulk_create(medicos, batch_size=lote)
+    # Lunes a viernes, mañana y tarde
+    HorarioAtencion.objects.bulk_create(
+        (HorarioAtencion(medico_id=m.pk, dia_semana=dia, hora_inicio=inicio, hora_fin=fin)
+         for m in medicos for dia in range(5)
+         for inicio, fin in ((time(8, 30), time(13, 0)), (time(14, 0), time(18, 0)))),
+        batch_size=lote,
+    )
+    base = _siguiente_id(Medicamento)
+    Medicamento.objects.bulk_create(
+        (Medicamento(
+            pk=base + i, nombre=f"{rng.choice(PRINCIPIOS)} {rng.choice(PRESENTACIONES)}",
+            laboratorio=rng.choice(LABORATORIOS), stock=rng.randint(0, 5000),
+            precio_unitario=Decimal(rng.randint(5, 300) * 100 - 10),
+        ) for i in range(n_medicamentos)),
+        batch_size=lote,
+    )
+    return tuple(m.pk for m in medicos), seguros, tuple(range(base, base + n_medicamentos))
+
+
+def planificar(semilla, referencia, dias, pacientes, consultas, medicos, medicamentos,
+               tratamientos_por_consulta, recetas_por_tratamiento, tamano_tarea, lote):
+    """Crea los catálogos y fija los rangos de ids del resto."""
+    medicos_ids, seguros, medicamentos_ids = crear_catalogos(semilla, medicos, medicamentos, lote)
+    tratamientos = round(consultas * tratamientos_por_consulta)
+    return Plan(
+        semilla=semilla, referencia=referencia, dias=dias, pacientes=pacientes, consultas=consultas,
+        tratamientos=tratamientos, recetas=round(tratamientos * recetas_por_tratamiento),
+        tamano_tarea=tamano_tarea, lote=lote, base={m: _siguiente_id(m) for m in MODELOS},
+        medicos=medicos_ids, seguros=seguros, medicamentos=medicamentos_ids,
+    )
+
+
+def generar_tarea(plan, tarea):
+    """Inserta los pacientes de una tarea y todo lo que cuelga de ellos. Devuelve filas por modelo."""
+    rng = random.Random(f"{plan.semilla}:{tarea}")
+    desde = tarea * plan.tamano_tarea
+    hasta = min(desde + plan.tamano_tarea, plan.pacientes)
+    base = plan.base
+    lote = plan.lote
+    inicio_periodo = plan.referencia - timedelta(days=plan.dias)
+
+    pacientes = []
+    for x in range(desde, hasta):
+        pk = base[Paciente] + x
+        nombre, apellido = rng.choice(NOMBRES), f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        pacientes.append(Paciente(
+            pk=pk, rut=rut(RUT_PACIENTES + pk), nombre=nombre, apellido=apellido,
+            fecha_nacimiento=(plan.referencia - timedelta(days=rng.randint(0, 95 * 365))).date(),
+            sexo=rng.choices("MFX", weights=(49, 49, 2))[0],
+            tipo_sangre=rng.choice(["O+", "O+", "O+", "A+", "A+", "B+", "O-", "A-", "AB+", ""]),
+            correo=f"paciente{pk}@correo.cl" if rng.random() < 0.8 else "",
+            telefono=f"+569{rng.randint(10_000_000, 99_999_999)}",
+            direccion=f"{rng.choice(CALLES)} {rng.randint(1, 9999)}",
+            activo=rng.random() > 0.03,
+        ))
+    afiliaciones = []
+    for x in range(desde, hasta):
+        seguro, cobertura = rng.choice(plan.seguros)
+        afiliaciones.append(PacienteSeguro(
+            pk=base[PacienteSeguro] + x, paciente_id=base[Paciente] + x, seguro_id=seguro,
+            nro_poliza=f"POL-{base[Paciente] + x}", cobertura_porcentaje=cobertura,
+            vigente=rng.random() < 0.9,
+        ))
+
+    # Consultas de la tarea: cada una a un paciente de la misma tarea
+    c_desde, c_hasta = plan.consultas_hasta(desde), plan.consultas_hasta(hasta)
+    consultas, fechas = [], []
+    for c in range(c_desde, c_hasta):
+        dia = inicio_periodo + timedelta(days=rng.randint(0, plan.dias + 30))
+        fecha = dia.replace(hour=rng.randint(8, 17), minute=rng.choice((0, 30)), second=0, microsecond=0)
+        estado = "PEND" if fecha > plan.referencia else rng.choices(*ESTADOS_PASADOS)[0]
+        consultas.append(ConsultaMedica(
+            pk=base[ConsultaMedica] + c, paciente_id=base[Paciente] + rng.randrange(desde, hasta),
+            medico_id=rng.choice(plan.medicos), fecha_consulta=fecha, motivo=rng.choice(MOTIVOS),
+            diagnostico=rng.choice(DIAGNOSTICOS) if estado == "ATEN" else "", estado=estado,
+        ))
+        fechas.append((fecha, estado))
+
+    t_desde, t_hasta = plan.tratamientos_hasta(desde), plan.tratamientos_hasta(hasta)
+    tratamientos, origen = [], []
+    for t in range(t_desde, t_hasta):
+        c = rng.randrange(c_desde, c_hasta)
+        tratamientos.append(Tratamiento(
+            pk=base[Tratamiento] + t, consulta_id=base[ConsultaMedica] + c,
+            descripcion=rng.choice(INDICACIONES), duracion_dias=rng.choice((3, 5, 7, 14, 30)),
+        ))
+        origen.append(fechas[c - c_desde])
+
+    recetas = []
+    for r in range(plan.recetas_hasta(desde), plan.recetas_hasta(hasta)):
+        t = rng.randrange(t_desde, t_hasta)
+        fecha, estado = origen[t - t_desde]
+        dispensada = fecha + timedelta(hours=rng.randint(1, 48)) if estado == "ATEN" and rng.random() < 0.7 else None
+        recetas.append(RecetaMedica(
+            pk=base[RecetaMedica] + r, tratamiento_id=base[Tratamiento] + t,
+            medicamento_id=rng.choice(plan.medicamentos), dosis=rng.choice(PRESENTACIONES),
+            frecuencia=rng.choice(FRECUENCIAS), duracion=rng.choice(DURACIONES),
+            cantidad=rng.randint(1, 4), dispensada_en=dispensada,
+        ))
+
+    with transaction.atomic():
+        for objs in (pacientes, afiliaciones, consultas, tratamientos, recetas):
+            if objs:
+                type(objs[0]).objects.bulk_create(objs, batch_size=lote)
+    return {
+        Paciente: len(pacientes), PacienteSeguro: len(afiliaciones), ConsultaMedica: len(consultas),
+        Tratamiento: len(tratamientos), RecetaMedica: len(recetas),
+    }
+
+
+def iniciar_proceso():
+    # Cada proceso abre sus propias conexiones (no comparte las del padre)
+    connections.close_all()
+
+
+def generar_en_proceso(plan, tarea):
+    try:
+        return generar_tarea(plan, tarea)
+    finally:
+        connections.close_all()
+
+
+def terminar():
+    """Secuencias, resúmenes, caché de catálogos y estadísticas del planner."""
+    modelos = [Medico, Medicamento, *MODELOS]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+            cursor.execute(sql)
+        resumenes.reconstruir()
+        if connection.vendor == "postgresql":
+            for model in [Especialidad, SeguroSalud, HorarioAtencion, *modelos]:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+    for model in cache.CATALOGOS:
+        cache.invalidar(model)
+
+
+def referencia_por_defecto():
+    """Hoy a medianoche (hora local): misma referencia en todas las corridas del día."""
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
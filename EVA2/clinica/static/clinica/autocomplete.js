@@ -0,0 +1,103 @@
+// EVA2/clinica/static/clinica/autocomplete.js
+// ---------------------------------------------------------
+// Autocompletado para <select data-autocomplete-url="..."> (AutocompleteSelect).
+// - El <select> queda oculto y sigue siendo el campo que se envía.
+// - Un <input> busca en el endpoint JSON (?q=&page=) con debounce y
+//   muestra los resultados en una lista; "Más resultados" pide la página
+//   siguiente. Al elegir, se reemplaza la opción del <select>.
+// ---------------------------------------------------------
+(function () {
+  "use strict";
+
+  const ESPERA_MS = 250;
+
+  function iniciar(select) {
+    const url = select.dataset.autocompleteUrl;
+    const contenedor = document.createElement("div");
+    contenedor.className = "position-relative";
+    const input = document.createElement("input");
+    input.type = "search";
+    input.className = "form-control";
+    input.autocomplete = "off";
+    input.placeholder = "Escribe para buscar…";
+    const elegida = select.options[select.selectedIndex];
+    input.value = elegida && elegida.value ? elegida.text : "";
+    const lista = document.createElement("div");
+    lista.className = "list-group position-absolute w-100 shadow-sm d-none";
+    lista.style.zIndex = 1000;
+    lista.style.maxHeight = "18rem";
+    lista.style.overflowY = "auto";
+
+    select.classList.add("d-none");
+    select.parentNode.insertBefore(contenedor, select);
+    contenedor.append(input, lista, select);
+
+    let temporizador = null;
+    let pedido = 0;
+    let pagina = 1;
+
+    function elegir(id, texto) {
+      select.innerHTML = "";
+      select.add(new Option(texto, id, true, true));
+      select.dispatchEvent(new Event("change", { bubbles: true }));
+      input.value = texto;
+      lista.classList.add("d-none");
+    }
+
+    function item(texto, clase, alElegir) {
+      const boton = document.createElement("button");
+      boton.type = "button";
+      boton.className = "list-group-item list-group-item-action " + (clase || "");
+      boton.textContent = texto;
+      boton.addEventListener("mousedown", function (ev) {
+        ev.preventDefault();  // que el blur del input no cierre la lista antes del click
+        alElegir();
+      });
+      return boton;
+    }
+
+    function buscar(acumular) {
+      const numero = ++pedido;
+      const params = new URLSearchParams({ q: input.value.trim(), page: pagina });
+      fetch(url + "?" + params, { headers: { Accept: "application/json" } })
+        .then(function (resp) { return resp.json(); })
+        .then(function (datos) {
+          if (numero !== pedido) return;  // llegó una respuesta vieja
+          if (!acumular) lista.innerHTML = "";
+          const mas = lista.querySelector(".sv-mas");
+          if (mas) mas.remove();
+          datos.results.forEach(function (r) {
+            lista.append(item(r.text, "", function () { elegir(r.id, r.text); }));
+          });
+          if (!datos.results.length && !acumular) {
+            lista.append(item("Sin resultados", "disabled text-muted", function () {}));
+          }
+          if (datos.more) {
+            lista.append(item("Más resultados…", "sv-mas text-primary", function () {
+              pagina += 1;
+              buscar(true);
+            }));
+          }
+          lista.classList.remove("d-none");
+        });
+    }
+
+    input.addEventListener("input", function () {
+      clearTimeout(temporizador);
+      if (!input.value.trim() && !select.required) {
+        select.innerHTML = "";
+        select.add(new Option("", "", true, true));
+      }
+      temporizador = setTimeout(function () { pagina = 1; buscar(false); }, ESPERA_MS);
+    });
+    input.addEventListener("focus", function () {
+      if (!lista.children.length) { pagina = 1; buscar(false); }
+      else lista.classList.remove("d-none");
+    });
+    input.addEventListener("blur", function () { lista.classList.add("d-none"); });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    document.querySelectorAll("select[data-autocomplete-url]").forEach(iniciar);
+  });
+})();
@@ -0,0 +1,96 @@
+# EVA2/clinica/tablas.py
+# ---------------------------------------------------------
+# Tabla genérica de las listas HTML (template clinica/lista.html).
+# - Cada BaseListView declara sus columnas con Columna(titulo, valor, ...).
+# - Las celdas se arman en Python (format_html) y el template sólo las
+#   recorre: sin un {{ obj.campo|filtro }} ni un {% url %} por fila.
+# - Las URLs de editar/eliminar salen de un prefijo/sufijo calculado una
+#   vez por página (url_por_pk) en vez de un reverse() por fila.
+# - Filas es perezoso: si el fragmento de la tabla está en la caché
+#   ({% cache %} con la versión de la tabla), la página no se lee de la BD.
+# ---------------------------------------------------------
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Union
+
+from django.urls import reverse
+from django.utils import dateformat, timezone
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+PK_MUESTRA = 0  # pk con el que se resuelve la URL; luego se reemplaza por el de cada fila
+
+
+@dataclass(frozen=True)
+class Columna:
+    """
+    titulo: encabezado.
+    valor: atributo del objeto ("rut", "paciente", "get_estado_display";
+           si es callable se llama) o función(obj) -> valor.
+    orden: alias de sort_fields para el encabezado ordenable ("" = no ordenable).
+    vacio: texto si el valor está vacío (p.ej. "-").
+    fuerte: valor en <strong>.
+    """
+    titulo: str
+    valor: Union[str, Callable]
+    orden: str = ""
+    vacio: str = ""
+    fuerte: bool = False
+
+    def texto(self, obj):
+        if callable(self.valor):
+            valor = self.valor(obj)
+        else:
+            valor = getattr(obj, self.valor)
+            if callable(valor):
+                valor = valor()
+        if isinstance(valor, bool):
+            return "Sí" if valor else "No"
+        if isinstance(valor, datetime):
+            return dateformat.format(timezone.localtime(valor), "d/m/Y H:i")
+        if isinstance(valor, date):
+            return dateformat.format(valor, "d/m/Y")
+        if valor is None or valor == "":
+            return self.vacio
+        return str(valor)
+
+    def celda(self, obj):
+        return format_html("<td><strong>{}</strong></td>" if self.fuerte else "<td>{}</td>", self.texto(obj))
+
+
+def url_por_pk(nombre):
+    """('paciente_update') -> ('/clinica/pacientes/', '/editar/'): prefijo + pk + sufijo."""
+    url = reverse(nombre, args=[PK_MUESTRA])
+    marca = f"/{PK_MUESTRA}/"
+    corte = url.rindex(marca)
+    return url[:corte + 1], url[corte + len(marca) - 1:]
+
+
+@dataclass(frozen=True)
+class Fila:
+    pk: int
+    celdas: str
+    url_editar: str
+    url_eliminar: str
+
+
+class Filas:
+    """Filas de la página; el queryset se lee recién cuando el template las recorre."""
+
+    def __init__(self, objetos, columnas, url_editar, url_eliminar):
+        self.objetos = objetos
+        self.columnas = columnas
+        self.url_editar = url_editar
+        self.url_eliminar = url_eliminar
+
+    def __iter__(self):
+        (editar, editar_fin), (eliminar, eliminar_fin) = self.url_editar, self.url_eliminar
+        for obj in self.objetos:
+            pk = str(obj.pk)
+            yield Fila(
+                pk=obj.pk,
+                celdas=mark_safe("".join(c.celda(obj) for c in self.columnas)),  # cada celda ya viene escapada
+                url_editar=editar + pk + editar_fin,
+                url_eliminar=eliminar + pk + eliminar_fin,
+            )
@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import math
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import facturacion, metricas, particiones, resumenes, routers, sintetico, tablas, trabajos
+from .dispensacion import StockInsuficiente, dispensar_receta
+from .explain import verificar_indices_aplicables
+from .middleware import COOKIE_PRIMARIO, ReplicaPinMiddleware
+from .routers import ReplicaRouter
+from .views import BaseModelViewSet
+from .models import (
+    Paciente, Medico, Especialidad,
+    ConsultaMedica, ConsultaMedicaCompleta, Tratamiento, Medicamento,
+    RecetaMedica, SeguroSalud, PacienteSeguro, HorarioAtencion,
+    ResumenConsultasDiario, ResumenAfiliaciones, Trabajo,
+)
+
+
+def crear_datos(n=10):
+    """Crea n filas relacionadas en cada tabla (datos mínimos para los tests)."""
+    esp = Especialidad.objects.create(nombre="Medicina General")
+    seguro = SeguroSalud.objects.create(nombre="Fonasa", plan="B")
+    ahora = timezone.now()
+    for i in range(n):
+        med = Medico.objects.create(
+            nombre=f"Médico{i}", apellido=f"Apellido{i}", rut=f"1000{i}-K",
+            correo=f"medico{i}@saludvital.cl", especialidad=esp,
+        )
+        pac = Paciente.objects.create(
+            rut=f"2000{i}-{i % 10}", nombre=f"Paciente{i}", apellido=f"Pérez{i}",
+            fecha_nacimiento=date(1980, 1, 1) + timedelta(days=i),
+        )
+        PacienteSeguro.objects.create(paciente=pac, seguro=seguro, cobertura_porcentaje=50)
+        consulta = ConsultaMedica.objects.create(
+            paciente=pac, medico=med, motivo="Control",
+            fecha_consulta=ahora - timedelta(days=i),
+        )
+        tratamiento = Tratamiento.objects.create(consulta=consulta, descripcion="Reposo", duracion_dias=3)
+        medicamento = Medicamento.objects.create(nombre=f"Paracetamol {i}", stock=100, precio_unitario="990.00")
+        RecetaMedica.objects.create(
+            tratamiento=tratamiento, medicamento=medicamento,
+            dosis="500 mg", frecuencia="cada 8 horas", duracion="7 días",
+        )
+
+
+# ---------- Listas HTML: presupuesto de consultas SQL ----------
+class ListQueryBudgetTests(TestCase):
+    """
+    Cada lista HTML debe costar un número fijo de queries (COUNT/MAX + SELECT),
+    sin importar cuántas filas muestre la página.
+    Si alguien agrega una columna con un FK sin select_related, falla aquí.
+    """
+    LISTAS = [
+        "paciente_list", "medico_list", "especialidad_list",
+        "consulta_list", "tratamiento_list", "medicamento_list",
+        "receta_list", "seguro_list", "paciente_seguro_list",
+    ]
+    PRESUPUESTO = 2
+
+    def test_presupuesto_fijo_con_pocas_filas(self):
+        crear_datos(3)
+        for nombre in self.LISTAS:
+            with self.subTest(lista=nombre), self.assertNumQueries(self.PRESUPUESTO):
+                resp = self.client.get(reverse(nombre))
+                self.assertEqual(resp.status_code, 200)
+
+    def test_presupuesto_fijo_con_pagina_llena(self):
+        crear_datos(30)
+        for nombre in self.LISTAS:
+            with self.subTest(lista=nombre), self.assertNumQueries(self.PRESUPUESTO):
+                resp = self.client.get(reverse(nombre))
+                self.assertEqual(resp.status_code, 200)
+
+    def test_paginacion_y_orden(self):
+        crear_datos(30)
+        resp = self.client.get(reverse("consulta_list"), {"orden": "fecha", "page": 2})
+        self.assertEqual(resp.context["page_obj"].number, 2)
+        fechas = [c.fecha_consulta for c in resp.context["object_list"]]
+        self.assertEqual(fechas, sorted(fechas))
+        self.assertEqual(resp.context["querystring"], "orden=fecha")
+
+    def test_orden_invalido_usa_el_por_defecto(self):
+        crear_datos(3)
+        resp = self.client.get(reverse("consulta_list"), {"orden": "motivo; DROP"})
+        self.assertEqual(resp.context["orden"], "-fecha")
+
+
+# ---------- Índices: verificación con EXPLAIN ----------
+class IndexApplicabilityTests(TestCase):
+    """
+    Los índices deben servir para las rutas calientes de la API y las listas
+    HTML. Se fuerza el uso de índices (sin seq scan): no cubre qué elige el
+    planner con la configuración por defecto.
+    """
+
+    def setUp(self):
+        # Con tablas chicas el plan depende del tamaño en disco, que crece con
+        # las filas muertas que dejan los rollbacks de otros tests. TRUNCATE
+        # (dentro de la transacción del test) parte de tablas recién creadas.
+        # Las particiones de consultas sin ANALYZE se estiman con filas que no
+        # tienen y el planner deja de leer en orden por el índice.
+        if connection.vendor == "postgresql":
+            tablas = ", ".join(
+                connection.ops.quote_name(m._meta.db_table) for m in apps.get_app_config("clinica").get_models()
+                if m._meta.managed
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {tablas}")
+                cursor.execute("ANALYZE clinica_consultamedica")
+
+    def test_rutas_calientes_pueden_usar_indices(self):
+        crear_datos(5)
+        for caso, plan, ok in verificar_indices_aplicables():
+            with self.subTest(caso=caso.nombre):
+                self.assertTrue(ok, f"{caso.nombre}: se esperaba {caso.indice}\n{plan}")
+
+    def test_comando_clinica_explain(self):
+        salida = StringIO()
+        call_command("clinica_explain", stdout=salida)
+        self.assertNotIn("NO ", salida.getvalue())
+
+
+# ---------- API: paginación por cursor y filtros ----------
+class ApiListTests(TestCase):
+
+    def test_cursor_recorre_todo_sin_repetir(self):
+        crear_datos(12)
+        ids, url = [], "/api/consultas/?page_size=5"
+        while url:
+            data = self.client.get(url).json()
+            ids += [c["id"] for c in data["results"]]
+            url = data["next"]
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+
+    def test_offset_opt_in(self):
+        crear_datos(12)
+        data = self.client.get("/api/consultas/", {"page": 2, "page_size": 5}).json()
+        self.assertEqual(data["count"], 12)
+        self.assertEqual(len(data["results"]), 5)
+
+    def test_filtro_medico_y_rango(self):
+        crear_datos(5)
+        medico = Medico.objects.first()
+        consulta = medico.consultas.get()
+        desde = (consulta.fecha_consulta - timedelta(hours=1)).isoformat()
+        hasta = (consulta.fecha_consulta + timedelta(hours=1)).isoformat()
+        data = self.client.get("/api/consultas/", {"medico": medico.pk, "desde": desde, "hasta": hasta}).json()
+        self.assertEqual([c["id"] for c in data["results"]], [consulta.pk])
+
+
+# ---------- API: ingesta masiva ----------
+class BulkEndpointTests(TestCase):
+
+    def paciente(self, rut, **extra):
+        return {"rut": rut, "nombre": "Ana", "apellido": "Rojas", "fecha_nacimiento": "1990-05-01", **extra}
+
+    def test_upsert_pacientes_por_rut(self):
+        Paciente.objects.create(rut="11111111-1", nombre="Viejo", apellido="Nombre", fecha_nacimiento=date(1970, 1, 1))
+        lote = [self.paciente("11111111-1", nombre="Nuevo"), self.paciente("22222222-2")]
+        resp = self.client.post("/api/pacientes/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(resp.json()["creados"]), 1)
+        self.assertEqual(len(resp.json()["actualizados"]), 1)
+        self.assertEqual(Paciente.objects.get(rut="11111111-1").nombre, "Nuevo")
+        self.assertEqual(Paciente.objects.count(), 2)
+
+    def test_errores_por_item_no_abortan_el_lote(self):
+        lote = [
+            self.paciente("33333333-3"),
+            self.paciente("44444444-4", fecha_nacimiento="no-es-fecha"),
+            self.paciente("33333333-3"),  # repetido dentro del lote
+        ]
+        resp = self.client.post("/api/pacientes/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual([e["indice"] for e in resp.json()["errores"]], [1, 2])
+        self.assertEqual(Paciente.objects.count(), 1)
+
+    def test_consultas_resuelve_fks_en_lote(self):
+        crear_datos(3)
+        paciente, medico = Paciente.objects.first(), Medico.objects.first()
+        lote = [
+            {"paciente": paciente.pk, "medico": medico.pk, "motivo": f"M{i}",
+             "fecha_consulta": f"2025-03-01T{8 + i // 2:02}:{i % 2 * 3}0:00Z"}  # sin choques: cada 30 min
+            for i in range(20)
+        ] + [{"paciente": 999999, "medico": medico.pk, "fecha_consulta": "2025-03-01T10:00:00Z", "motivo": "X"}]
+        # 2 FKs precargados + transacción (savepoint) + agenda (médicos bloqueados,
+        # consultas cercanas y horarios) + INSERT, más el resumen del dashboard
+        # (UPDATE y, como la fila no existe, INSERT en savepoint) por cada
+        # (día, médico): no crece con el tamaño del lote
+        with self.assertNumQueries(12):
+            resp = self.client.post("/api/consultas/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual(len(resp.json()["creados"]), 20)
+        self.assertIn("paciente", resp.json()["errores"][0]["errores"])
+
+    def test_conflicto_no_expone_el_error_de_la_bd(self):
+        error = IntegrityError('duplicate key value violates unique constraint "clinica_paciente_rut_key"')
+        with mock.patch("django.db.models.query.QuerySet.bulk_create", side_effect=error), \
+                self.assertLogs("clinica.bulk", "WARNING"):
+            resp = self.client.post("/api/pacientes/bulk/", [self.paciente("77777777-7")], content_type="application/json")
+        self.assertEqual(resp.status_code, 409)
+        self.assertNotIn("clinica_paciente_rut_key", resp.json()["detail"])
+
+    def test_clave_de_upsert_no_escalar_es_error_del_item(self):
+        lote = [self.paciente(["55555555-5"]), self.paciente("66666666-6")]
+        resp = self.client.post("/api/pacientes/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual(resp.json()["errores"][0]["indice"], 0)
+        self.assertIn("rut", resp.json()["errores"][0]["errores"])
+        self.assertEqual(Paciente.objects.get().rut, "66666666-6")
+
+    def test_unicidad_en_lote_no_crece_con_el_lote(self):
+        def post(n, inicio):
+            lote = [{"nombre": f"Isapre {inicio + i}", "plan": "Oro"} for i in range(n)]
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post("/api/seguros/bulk/", lote, content_type="application/json")
+            self.assertEqual(resp.status_code, 201)
+            return len(queries)
+
+        self.assertEqual(post(5, 0), post(50, 100))
+
+    def test_unicidad_contra_la_bd_es_error_por_item(self):
+        crear_datos(3)
+        afiliacion = PacienteSeguro.objects.first()
+        otro = Paciente.objects.exclude(pk=afiliacion.paciente_id).first()
+        PacienteSeguro.objects.filter(paciente=otro).delete()
+        lote = [
+            {"paciente": afiliacion.paciente_id, "seguro": afiliacion.seguro_id},  # ya existe
+            {"paciente": otro.pk, "seguro": afiliacion.seguro_id, "cobertura_porcentaje": 50},
+        ]
+        resp = self.client.post("/api/afiliaciones/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual(len(resp.json()["creados"]), 1)
+        self.assertEqual([e["indice"] for e in resp.json()["errores"]], [0])
+        self.assertIn("non_field_errors", resp.json()["errores"][0]["errores"])
+
+        nombre = Especialidad.objects.first().nombre
+        resp = self.client.post(
+            "/api/especialidades/bulk/", [{"nombre": nombre}, {"nombre": "Geriatría"}], content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 207)
+        self.assertIn("nombre", resp.json()["errores"][0]["errores"])
+        self.assertTrue(Especialidad.objects.filter(nombre="Geriatría").exists())
+
+
+# ---------- API: exportación por streaming ----------
+class ExportTests(TestCase):
+
+    def test_ndjson_igual_al_listado_y_con_filtros(self):
+        crear_datos(4)
+        medico = Medico.objects.first()
+        resp = self.client.get("/api/consultas/export.ndjson/", {"medico": medico.pk})
+        self.assertTrue(resp.streaming)
+        filas = [json.loads(linea) for linea in b"".join(resp.streaming_content).decode().splitlines()]
+        listado = self.client.get("/api/consultas/", {"medico": medico.pk}).json()["results"]
+        self.assertEqual(filas, listado)
+
+    def test_csv_con_encabezado(self):
+        crear_datos(3)
+        resp = self.client.get("/api/recetas/export.csv/", HTTP_ACCEPT="text/csv")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/csv"))
+        lineas = list(csv.reader(b"".join(resp.streaming_content).decode().splitlines()))
+        self.assertEqual(lineas[0][:4], ["id", "created_at", "updated_at", "dosis"])
+        self.assertEqual(len(lineas), 4)
+
+
+# ---------- Importación masiva (clinica_import) ----------
+class ImportCommandTests(TestCase):
+    """En SQLite se ejercita el camino por lotes (bulk_create); en PostgreSQL, COPY."""
+
+    def importar(self, recurso, contenido, *args):
+        ruta = Path(self.tmp.name) / f"{recurso}.csv"
+        ruta.write_text(contenido, encoding="utf-8")
+        salida = StringIO()
+        call_command("clinica_import", recurso, str(ruta), "--batch", "2", *args, stdout=salida)
+        return salida.getvalue()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_pacientes_deduplica_y_rechaza_vacios(self):
+        Paciente.objects.create(rut="1-9", nombre="Existente", apellido="X", fecha_nacimiento=date(1970, 1, 1))
+        salida = self.importar("pacientes", (
+            "rut,nombre,apellido,fecha_nacimiento,sexo\n"
+            "1-9,Cambiado,X,1970-01-01,F\n"
+            "2-7,Ana,Rojas,1990-05-01,F\n"
+            "3-5,Luis,Soto,1985-02-03,M\n"
+            "2-7,Ana María,Rojas,1990-05-01,F\n"
+            "4-3,,Sin Nombre,1990-01-01,X\n"
+        ))
+        self.assertIn("insertadas=2", salida)
+        self.assertIn("omitidas=1", salida)
+        self.assertIn("duplicadas=1", salida)
+        self.assertIn("rechazadas (nombre vacío): 1", salida)
+        self.assertEqual(Paciente.objects.get(rut="2-7").nombre, "Ana María")
+        self.assertEqual(Paciente.objects.get(rut="1-9").nombre, "Existente")
+
+    def test_valores_invalidos_se_rechazan_por_fila(self):
+        # En PostgreSQL un CAST inválido abortaría todo el INSERT ... SELECT
+        salida = self.importar("pacientes", (
+            "rut,nombre,apellido,fecha_nacimiento\n"
+            "2-7,Ana,Rojas,1990-05-01\n"
+            "3-5,Luis,Soto,1990-13-45\n"
+            "4-3,Eva,Díaz,ayer\n"
+        ))
+        self.assertIn("insertadas=1", salida)
+        self.assertIn("rechazadas (valor inválido): 2", salida)
+        salida = self.importar("medicamentos", "id,nombre,stock,precio_unitario\n500,Ibuprofeno,diez,1500\n501,Aspirina,5,990\n")
+        self.assertIn("insertadas=1", salida)
+        self.assertIn("rechazadas (valor inválido): 1", salida)
+        crear_datos(1)
+        salida = self.importar("recetas", (
+            "id,tratamiento_id,medicamento_id,dosis,frecuencia,duracion\n"
+            f"900,{Tratamiento.objects.get().pk},abc,1 g,cada 8 horas,3 días\n"
+        ))
+        self.assertIn("rechazadas (valor inválido): 1", salida)
+        self.assertNotIn("inexistente", salida)
+        self.assertEqual(Paciente.objects.filter(rut="2-7").count(), 1)
+
+    def test_actualizar_y_fks(self):
+        crear_datos(1)
+        tratamiento = Tratamiento.objects.get()
+        self.importar("medicamentos", "id,nombre,stock,precio_unitario\n500,Ibuprofeno,10,1500.50\n")
+        salida = self.importar("recetas", (
+            "id,tratamiento_id,medicamento_id,dosis,frecuencia,duracion\n"
+            f"900,{tratamiento.pk},500,400 mg,cada 12 horas,5 días\n"
+            f"901,{tratamiento.pk},777,1 g,cada 8 horas,3 días\n"
+            f"902,999,500,1 g,cada 8 horas,3 días\n"
+        ))
+        self.assertIn("insertadas=1", salida)
+        self.assertIn("rechazadas (medicamento_id inexistente): 1", salida)
+        self.assertIn("rechazadas (tratamiento_id inexistente): 1", salida)
+        self.importar("medicamentos", "id,nombre,stock,precio_unitario\n500,Ibuprofeno 400,20,1500.50\n", "--actualizar")
+        self.assertEqual(Medicamento.objects.get(pk=500).stock, 20)
+        # La secuencia quedó adelantada: un alta normal no choca con los ids importados
+        self.assertGreater(Medicamento.objects.create(nombre="Nuevo").pk, 500)
+
+    def test_consultas_por_id(self):
+        # En PostgreSQL la tabla está particionada: la PK es (id, fecha_consulta)
+        crear_datos(1)
+        paciente, medico = Paciente.objects.get(), Medico.objects.get()
+        encabezado = "id,paciente_id,medico_id,fecha_consulta,motivo,estado\n"
+        salida = self.importar("consultas", encabezado + f"700,{paciente.pk},{medico.pk},2025-03-10T10:00:00Z,Control,PEND\n")
+        self.assertIn("insertadas=1", salida)
+        salida = self.importar("consultas", encabezado + f"700,{paciente.pk},{medico.pk},2025-04-02T10:00:00Z,Control,ATEN\n")
+        self.assertIn("omitidas=1", salida)
+        salida = self.importar(
+            "consultas", encabezado + f"700,{paciente.pk},{medico.pk},2025-04-02T10:00:00Z,Control,ATEN\n", "--actualizar",
+        )
+        self.assertIn("actualizadas=1", salida)
+        consulta = ConsultaMedica.objects.get(pk=700)
+        self.assertEqual((consulta.estado, consulta.fecha_consulta.month), ("ATEN", 4))
+
+
+# ---------- Caché de catálogos ----------
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+        crear_datos(3)
+
+    def test_api_list_y_retrieve_desde_cache(self):
+        primera = self.client.get("/api/especialidades/").json()
+        esp = Especialidad.objects.get()
+        self.client.get(f"/api/especialidades/{esp.pk}/")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/especialidades/").json(), primera)
+            self.client.get(f"/api/especialidades/{esp.pk}/")
+
+    def test_signal_invalida_al_guardar_y_borrar(self):
+        def nombres():
+            return [s["nombre"] for s in self.client.get("/api/seguros/").json()["results"]]
+
+        nombres()
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = SeguroSalud.objects.create(nombre="Isapre", plan="Oro")
+            # Sin confirmar la transacción la versión de la caché no cambia
+            self.assertNotIn("Isapre", nombres())
+        self.assertIn("Isapre", nombres())
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertNotIn("Isapre", nombres())
+
+    def test_bulk_invalida(self):
+        self.client.get("/api/medicamentos/")
+        with self.captureOnCommitCallbacks(execute=True):  # se invalida al confirmar el lote
+            self.client.post("/api/medicamentos/bulk/", [{"nombre": "Aspirina"}], content_type="application/json")
+        nombres = [m["nombre"] for m in self.client.get("/api/medicamentos/").json()["results"]]
+        self.assertIn("Aspirina", nombres)
+
+    def test_formulario_usa_choices_cacheadas(self):
+        self.client.get(reverse("medico_create"))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("medico_create"))
+        self.assertContains(resp, "Medicina General")
+
+
+# ---------- Tabla genérica de las listas HTML ----------
+class TablaGenericaTests(TestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+        crear_datos(30)
+
+    def test_urls_por_prefijo_y_escape(self):
+        paciente = Paciente.objects.first()
+        paciente.nombre = "<b>Ana</b>"
+        paciente.save()
+        with mock.patch("clinica.tablas.reverse", wraps=reverse) as espia:
+            resp = self.client.get(reverse("paciente_list"))
+        self.assertEqual(espia.call_count, 2)  # editar y eliminar, no dos por fila
+        prefijo, sufijo = tablas.url_por_pk("paciente_update")
+        self.assertEqual(f"{prefijo}{paciente.pk}{sufijo}", reverse("paciente_update", args=[paciente.pk]))
+        self.assertContains(resp, f'href="{reverse("paciente_delete", args=[paciente.pk])}"')
+        self.assertContains(resp, "&lt;b&gt;Ana&lt;/b&gt;")
+        self.assertContains(resp, "<th>Tipo sangre</th>", html=True)
+
+    def test_tabla_desde_cache_por_version(self):
+        url = reverse("consulta_list")
+        primera = self.client.get(url)
+        with self.assertNumQueries(1):  # sólo COUNT/MAX: la tabla sale de la caché
+            segunda = self.client.get(url)
+        self.assertEqual(segunda.content, primera.content)
+        paciente = Paciente.objects.first()
+        paciente.nombre = "Renombrado"
+        paciente.save()
+        self.assertContains(self.client.get(url), "Renombrado")
+        # Otra página u orden es otra entrada de la caché
+        self.assertNotEqual(self.client.get(url, {"page": 2}).content, primera.content)
+
+
+# ---------- GET condicional (ETag / Last-Modified) ----------
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        crear_datos(3)
+
+    def test_api_list_304_con_una_query(self):
+        resp = self.client.get("/api/pacientes/")
+        self.assertIn("ETag", resp)
+        self.assertIn("Last-Modified", resp)
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/pacientes/", HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+    def test_api_cambios_invalidan_etag(self):
+        extra = Paciente.objects.create(
+            rut="30000-1", nombre="Extra", apellido="Soto", fecha_nacimiento=date(1990, 1, 1),
+        )
+        etag = self.client.get("/api/pacientes/")["ETag"]
+        paciente = Paciente.objects.first()
+        paciente.nombre = "Otro"
+        paciente.save()
+        resp = self.client.get("/api/pacientes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        # Una baja cambia la cantidad aunque el máximo siga igual
+        etag = resp["ETag"]
+        extra.delete()
+        self.assertEqual(self.client.get("/api/pacientes/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_api_etag_por_filtros_y_retrieve(self):
+        etag = self.client.get("/api/pacientes/")["ETag"]
+        resp = self.client.get("/api/pacientes/", {"sexo": "F"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        paciente = Paciente.objects.first()
+        resp = self.client.get(f"/api/pacientes/{paciente.pk}/")
+        resp = self.client.get(f"/api/pacientes/{paciente.pk}/", HTTP_IF_MODIFIED_SINCE=resp["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.client.get("/api/pacientes/999999/").status_code, 404)
+
+    def test_api_expand_cuenta_la_relacion(self):
+        url = "/api/consultas/"
+        expandido = self.client.get(url, {"expand": "paciente"})["ETag"]
+        plano = self.client.get(url)["ETag"]
+        paciente = Paciente.objects.first()
+        paciente.nombre = "Renombrado"
+        paciente.save()
+        resp = self.client.get(url, {"expand": "paciente"}, HTTP_IF_NONE_MATCH=expandido)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("Renombrado", [c["paciente"]["nombre"] for c in resp.json()["results"]])
+        # Sin expand la respuesta sólo trae el id: sigue vigente
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=plano).status_code, 304)
+
+    def test_bulk_actualiza_updated_at(self):
+        paciente = Paciente.objects.first()
+        antes = paciente.updated_at
+        resp = self.client.post(
+            "/api/pacientes/bulk/",
+            [{"rut": paciente.rut, "nombre": "Nuevo", "apellido": paciente.apellido,
+              "fecha_nacimiento": str(paciente.fecha_nacimiento)}],
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 201)
+        paciente.refresh_from_db()
+        self.assertGreater(paciente.updated_at, antes)
+
+    def test_lista_web_304(self):
+        resp = self.client.get(reverse("consulta_list"))
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("consulta_list"), HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        # La tabla muestra el nombre del paciente: editarlo también cuenta
+        etag = resp["ETag"]
+        paciente = Paciente.objects.first()
+        paciente.nombre = "Renombrado"
+        paciente.save()
+        resp = self.client.get(reverse("consulta_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+
+# ---------- Búsqueda de pacientes (RUT / nombre) ----------
+class PacienteSearchTests(TestCase):
+
+    def setUp(self):
+        self.jose = Paciente.objects.create(
+            rut="12.345.678-k", nombre="José Luis", apellido="Pérez", fecha_nacimiento=date(1980, 1, 1),
+        )
+        Paciente.objects.create(rut="9.876.543-2", nombre="Ana", apellido="Núñez", fecha_nacimiento=date(1990, 1, 1))
+        Paciente.objects.create(rut="12.399.000-1", nombre="Pedro", apellido="López", fecha_nacimiento=date(1970, 1, 1))
+
+    def buscar(self, q):
+        resp = self.client.get("/api/pacientes/buscar/", {"q": q})
+        self.assertEqual(resp.status_code, 200)
+        return [p["rut"] for p in resp.json()["results"]]
+
+    def test_columnas_normalizadas(self):
+        self.assertEqual(self.jose.rut_normalizado, "12345678K")
+        self.assertEqual(self.jose.nombre_busqueda, "perez jose luis")
+        self.assertNotIn("rut_normalizado", self.client.get(f"/api/pacientes/{self.jose.pk}/").json())
+
+    def test_rut_parcial_en_cualquier_formato(self):
+        self.assertEqual(self.buscar("12.345"), ["12.345.678-k"])
+        self.assertEqual(self.buscar("12345678-K"), ["12.345.678-k"])
+        self.assertEqual(len(self.buscar("123")), 2)
+
+    def test_nombre_sin_tildes_ni_mayusculas(self):
+        self.assertEqual(self.buscar("perez"), ["12.345.678-k"])
+        self.assertEqual(self.buscar("NUÑEZ"), ["9.876.543-2"])
+        self.assertEqual(self.buscar("jose per"), ["12.345.678-k"])
+        self.assertEqual(self.buscar(""), [])
+
+    def test_bulk_e_importacion_normalizan(self):
+        self.client.post("/api/pacientes/bulk/", [
+            {"rut": "12.345.678-k", "nombre": "José", "apellido": "Álvarez", "fecha_nacimiento": "1980-01-01"},
+            {"rut": "5.555.555-5", "nombre": "Íñigo", "apellido": "Soto", "fecha_nacimiento": "1980-01-01"},
+        ], content_type="application/json")
+        self.assertEqual(self.buscar("alvarez"), ["12.345.678-k"])
+        self.assertEqual(self.buscar("5555"), ["5.555.555-5"])
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / "pacientes.csv"
+            ruta.write_text("rut,nombre,apellido,fecha_nacimiento\n7.777.777-7,Érika,Muñoz,1990-01-01\n", encoding="utf-8")
+            call_command("clinica_import", "pacientes", str(ruta), stdout=StringIO())
+        self.assertEqual(Paciente.objects.get(rut="7.777.777-7").nombre_busqueda, "munoz erika")
+        self.assertEqual(Paciente.objects.get(rut="7.777.777-7").rut_normalizado, "77777777")
+
+    def test_lista_web_y_api_con_q(self):
+        resp = self.client.get(reverse("paciente_list"), {"q": "lopez"})
+        self.assertEqual([p.rut for p in resp.context["object_list"]], ["12.399.000-1"])
+        resp = self.client.get("/api/pacientes/", {"q": "12.3"})
+        self.assertEqual(len(resp.json()["results"]), 2)
+
+
+# ---------- Autocompletado de FKs en formularios ----------
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        crear_datos(30)
+
+    def test_formulario_no_carga_tablas_grandes(self):
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("consulta_create"))
+        self.assertContains(resp, 'data-autocomplete-url="/clinica/lookup/pacientes/"')
+        self.assertContains(resp, "clinica/autocomplete.js")
+        self.assertNotContains(resp, "Paciente0 Pérez0")
+
+    def test_edicion_solo_carga_la_opcion_elegida(self):
+        consulta = ConsultaMedica.objects.get(paciente__nombre="Paciente3")
+        # objeto + paciente elegido + médico elegido
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse("consulta_update", args=[consulta.pk]))
+        self.assertContains(resp, "Paciente3 Pérez3")
+        self.assertNotContains(resp, "Paciente4 Pérez4")
+        select = re.search(r'<select name="paciente".*?</select>', resp.content.decode(), re.S).group()
+        self.assertEqual(select.count("<option"), 2)  # vacía + la elegida
+
+    def test_guardar_con_autocompletado(self):
+        tratamiento = Tratamiento.objects.first()
+        medicamento = Medicamento.objects.first()
+        resp = self.client.post(reverse("receta_create"), {
+            "tratamiento": tratamiento.pk, "medicamento": medicamento.pk,
+            "dosis": "1 comprimido", "frecuencia": "cada 12 horas", "duracion": "3 días", "cantidad": 1,
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(RecetaMedica.objects.filter(dosis="1 comprimido", tratamiento=tratamiento).exists())
+
+    def test_lookup_paginado(self):
+        url = reverse("clinica_lookup", args=["pacientes"])
+        with self.assertNumQueries(1):
+            datos = self.client.get(url).json()
+        self.assertEqual(len(datos["results"]), 20)
+        self.assertTrue(datos["more"])
+        datos = self.client.get(url, {"page": 2}).json()
+        self.assertEqual(len(datos["results"]), 10)
+        self.assertFalse(datos["more"])
+        datos = self.client.get(url, {"q": "perez12"}).json()
+        self.assertEqual([r["text"] for r in datos["results"]], ["Paciente12 Pérez12"])
+        consulta = ConsultaMedica.objects.first()
+        datos = self.client.get(reverse("clinica_lookup", args=["consultas"]), {"q": str(consulta.pk)}).json()
+        self.assertEqual(datos["results"], [{"id": consulta.pk, "text": str(consulta)}])
+        self.assertEqual(self.client.get(reverse("clinica_lookup", args=["usuarios"])).status_code, 404)
+
+
+# ---------- Dependencias antes de eliminar ----------
+class DependencyInspectorTests(TestCase):
+
+    def setUp(self):
+        crear_datos(1)
+
+    def test_api_una_query_con_bloqueos_y_cascada(self):
+        paciente = Paciente.objects.get()
+        with self.assertNumQueries(1):
+            datos = self.client.get(f"/api/pacientes/{paciente.pk}/dependencies/").json()
+        self.assertFalse(datos["puede_eliminar"])
+        self.assertEqual([b["motivo"] for b in datos["bloqueos"]], ["Tiene consultas médicas registradas."])
+        self.assertEqual([c["modelo"] for c in datos["cascada"]], ["clinica.pacienteseguro"])
+        self.assertEqual(self.client.get("/api/pacientes/999999/dependencies/").status_code, 404)
+
+    def test_se_puede_eliminar_sin_relaciones(self):
+        receta = RecetaMedica.objects.get()
+        datos = self.client.get(f"/api/recetas/{receta.pk}/dependencies/").json()
+        self.assertEqual(datos, {"puede_eliminar": True, "bloqueos": [], "cascada": []})
+
+    def test_web_muestra_motivos_y_cascada(self):
+        medicamento = Medicamento.objects.get()
+        resp = self.client.get(reverse("medicamento_delete", args=[medicamento.pk]))
+        self.assertContains(resp, "Está referenciado por recetas médicas.")
+        # Sin consultas, el paciente se puede borrar: sus afiliaciones caen en cascada
+        paciente = Paciente.objects.create(rut="3-3", nombre="Sin", apellido="Consultas", fecha_nacimiento=date(2000, 1, 1))
+        PacienteSeguro.objects.create(paciente=paciente, seguro=SeguroSalud.objects.get(), cobertura_porcentaje=10)
+        resp = self.client.get(reverse("paciente_delete", args=[paciente.pk]))
+        self.assertNotContains(resp, "No se puede eliminar")
+        self.assertContains(resp, "Tiene afiliaciones de seguro de salud.")
+        resp = self.client.post(reverse("paciente_delete", args=[paciente.pk]))
+        self.assertFalse(Paciente.objects.filter(pk=paciente.pk).exists())
+
+
+# ---------- Dispensación y stock ----------
+class DispensacionTests(TestCase):
+
+    def setUp(self):
+        crear_datos(1)
+        self.tratamiento = Tratamiento.objects.get()
+        self.receta = RecetaMedica.objects.get()
+        self.otro = Medicamento.objects.create(nombre="Ibuprofeno", stock=5)
+        self.segunda = RecetaMedica.objects.create(
+            tratamiento=self.tratamiento, medicamento=self.otro, cantidad=3,
+            dosis="400 mg", frecuencia="cada 8 horas", duracion="3 días",
+        )
+
+    def test_dispensar_receta_descuenta_stock(self):
+        resp = self.client.post(f"/api/recetas/{self.receta.pk}/dispensar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Medicamento.objects.get(pk=self.receta.medicamento_id).stock, 99)
+        resp = self.client.post(f"/api/recetas/{self.receta.pk}/dispensar/")
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(Medicamento.objects.get(pk=self.receta.medicamento_id).stock, 99)
+
+    def test_tratamiento_todo_o_nada(self):
+        Medicamento.objects.filter(pk=self.otro.pk).update(stock=2)
+        resp = self.client.post(f"/api/tratamientos/{self.tratamiento.pk}/dispensar/")
+        self.assertEqual(resp.status_code, 409)
+        self.assertIn("Ibuprofeno", resp.json()["detail"])
+        # Nada se descontó ni se marcó
+        self.assertEqual(Medicamento.objects.get(pk=self.receta.medicamento_id).stock, 100)
+        self.assertFalse(RecetaMedica.objects.filter(dispensada_en__isnull=False).exists())
+
+        Medicamento.objects.filter(pk=self.otro.pk).update(stock=5)
+        resp = self.client.post(f"/api/tratamientos/{self.tratamiento.pk}/dispensar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sorted(resp.json()["recetas"]), sorted([self.receta.pk, self.segunda.pk]))
+        self.assertEqual(Medicamento.objects.get(pk=self.otro.pk).stock, 2)
+        self.assertEqual(self.client.post(f"/api/tratamientos/{self.tratamiento.pk}/dispensar/").status_code, 409)
+
+    def test_invalida_cache_de_medicamentos(self):
+        caches["default"].clear()
+        self.client.get("/api/medicamentos/")
+        with self.captureOnCommitCallbacks(execute=True):
+            dispensar_receta(self.segunda.pk)
+        stock = {m["nombre"]: m["stock"] for m in self.client.get("/api/medicamentos/").json()["results"]}
+        self.assertEqual(stock["Ibuprofeno"], 2)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class DispensacionConcurrenteTests(TransactionTestCase):
+    """Muchos hilos dispensan a la vez: el stock nunca queda negativo ni se pierden descuentos."""
+
+    HILOS = 12
+
+    def test_contencion(self):
+        crear_datos(1)
+        tratamiento = Tratamiento.objects.get()
+        medicamento = Medicamento.objects.create(nombre="Amoxicilina", stock=7)
+        recetas = [
+            RecetaMedica.objects.create(
+                tratamiento=tratamiento, medicamento=medicamento, cantidad=1,
+                dosis="500 mg", frecuencia="cada 8 horas", duracion="7 días",
+            ).pk
+            for _ in range(self.HILOS)
+        ]
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+
+        def trabajar(receta_id):
+            try:
+                barrera.wait()
+                dispensar_receta(receta_id)
+                resultados.append("ok")
+            except StockInsuficiente:
+                resultados.append("sin stock")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar, args=(pk,)) for pk in recetas]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count("ok"), 7)
+        self.assertEqual(resultados.count("sin stock"), self.HILOS - 7)
+        self.assertEqual(Medicamento.objects.get(pk=medicamento.pk).stock, 0)
+        self.assertEqual(RecetaMedica.objects.filter(medicamento=medicamento, dispensada_en__isnull=False).count(), 7)
+
+
+# ---------- Resúmenes del dashboard ----------
+class ResumenTests(TestCase):
+
+    def setUp(self):
+        crear_datos(3)
+        self.medico = Medico.objects.first()
+        self.paciente = Paciente.objects.first()
+
+    def assertResumenAlDia(self):
+        self.assertEqual(resumenes.diferencias(), [])
+
+    def test_incremental_en_save_y_delete(self):
+        self.assertResumenAlDia()
+        consulta = ConsultaMedica.objects.create(
+            paciente=self.paciente, medico=self.medico, motivo="Control", fecha_consulta=timezone.now(),
+        )
+        consulta.estado = "ATEN"
+        consulta.save()
+        self.assertResumenAlDia()
+        consulta.medico = Medico.objects.last()
+        consulta.fecha_consulta -= timedelta(days=40)
+        consulta.save()
+        self.assertResumenAlDia()
+        consulta.delete()
+        self.assertResumenAlDia()
+        # Sin filas en cero que ensucien el dashboard
+        self.assertFalse(ResumenConsultasDiario.objects.filter(total=0).exists())
+
+    def test_afiliaciones_y_cascada(self):
+        afiliacion = PacienteSeguro.objects.first()
+        afiliacion.vigente = False
+        afiliacion.save()
+        self.assertEqual(ResumenAfiliaciones.objects.get().vigentes, 2)
+        paciente = Paciente.objects.create(rut="9-9", nombre="Sin", apellido="Consultas", fecha_nacimiento=date(2000, 1, 1))
+        PacienteSeguro.objects.create(paciente=paciente, seguro=afiliacion.seguro)
+        paciente.delete()  # CASCADE a sus afiliaciones
+        self.assertResumenAlDia()
+        self.assertEqual(ResumenAfiliaciones.objects.get().total, 3)
+
+    def test_delta_negativo_desfasado_satura_en_cero(self):
+        consulta = ConsultaMedica.objects.filter(medico=self.medico).get()
+        fila = {"fecha": timezone.localdate(consulta.fecha_consulta), "medico_id": self.medico.pk}
+        ResumenConsultasDiario.objects.filter(**fila).update(pendientes=0)  # resumen desfasado
+        with self.assertLogs("clinica.resumenes", "WARNING"):
+            consulta.estado = "ATEN"
+            consulta.save()
+        self.assertEqual(ResumenConsultasDiario.objects.get(**fila).pendientes, 0)
+        self.assertEqual(ResumenConsultasDiario.objects.get(**fila).atendidas, 1)
+        call_command("clinica_resumenes", "rebuild", stdout=StringIO())
+        self.assertResumenAlDia()
+
+    def test_bulk_y_rebuild(self):
+        resp = self.client.post("/api/consultas/bulk/", [
+            {"paciente": self.paciente.pk, "medico": self.medico.pk, "motivo": "Lote",
+             "fecha_consulta": f"2025-03-01T1{i}:00:00Z", "estado": "NOAS"}
+            for i in range(3)
+        ], content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertResumenAlDia()
+        ResumenConsultasDiario.objects.all().delete()
+        salida = StringIO()
+        call_command("clinica_resumenes", "rebuild", stdout=salida)
+        self.assertIn("reconstruidos", salida.getvalue())
+        call_command("clinica_resumenes", "verificar", stdout=StringIO())
+
+    def test_dashboard_lee_solo_resumenes(self):
+        hoy = timezone.localdate()
+        with self.assertNumQueries(1):
+            datos = self.client.get("/api/dashboard/consultas/").json()
+        self.assertEqual(sum(f["total"] for f in datos["results"]), 3)
+        self.assertEqual(datos["results"][0]["fecha"], str(hoy - timedelta(days=2)))
+        datos = self.client.get("/api/dashboard/consultas/", {"agrupar": "especialidad", "desde": str(hoy)}).json()
+        self.assertEqual(datos["results"], [{
+            "fecha": str(hoy), "especialidad": self.medico.especialidad_id, "especialidad_nombre": "Medicina General",
+            "pendientes": 1, "atendidas": 0, "canceladas": 0, "no_asiste": 0, "total": 1,
+        }])
+        for consulta, estado in zip(ConsultaMedica.objects.order_by("pk"), ["ATEN", "ATEN", "NOAS"]):
+            consulta.estado = estado
+            consulta.save()
+        with self.assertNumQueries(1):
+            datos = self.client.get("/api/dashboard/estados/").json()
+        self.assertEqual(datos["tasa_asistencia"], 0.6667)
+        self.assertEqual(datos["tasa_inasistencia"], 0.3333)
+        datos = self.client.get("/api/dashboard/afiliaciones/").json()
+        self.assertEqual(datos["results"][0]["vigentes"], 3)
+        self.assertEqual(self.client.get("/api/dashboard/consultas/", {"desde": "ayer"}).status_code, 400)
+
+
+# ---------- Agenda: sin doble reserva y horas libres ----------
+class AgendaTests(TestCase):
+    LUNES = date(2030, 1, 7)
+
+    def setUp(self):
+        self.esp = Especialidad.objects.create(nombre="Cardiología", duracion_slot_minutos=30)
+        self.m1 = Medico.objects.create(nombre="Ana", apellido="Uno", rut="1-9", correo="a@sv.cl", especialidad=self.esp)
+        self.m2 = Medico.objects.create(nombre="Beto", apellido="Dos", rut="2-7", correo="b@sv.cl", especialidad=self.esp)
+        HorarioAtencion.objects.create(medico=self.m1, dia_semana=0, hora_inicio="09:00", hora_fin="11:00")
+        HorarioAtencion.objects.create(medico=self.m2, dia_semana=0, hora_inicio="10:00", hora_fin="12:00")
+        self.paciente = Paciente.objects.create(rut="3-5", nombre="Pía", apellido="Tres", fecha_nacimiento=date(1990, 1, 1))
+
+    def hora(self, h, m=0):
+        return timezone.make_aware(datetime(2030, 1, 7, h, m))
+
+    def reservar(self, medico, inicio):
+        return self.client.post("/api/consultas/", {
+            "paciente": self.paciente.pk, "medico": medico.pk, "motivo": "Control",
+            "fecha_consulta": inicio.isoformat(),
+        }, content_type="application/json")
+
+    def test_api_rechaza_doble_reserva_y_fuera_de_horario(self):
+        self.assertEqual(self.reservar(self.m1, self.hora(9)).status_code, 201)
+        resp = self.reservar(self.m1, self.hora(9, 15))
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("fecha_consulta", resp.json())
+        self.assertEqual(self.reservar(self.m2, self.hora(10)).status_code, 201)  # otro médico, sin choque
+        self.assertEqual(self.reservar(self.m1, self.hora(11)).status_code, 400)  # termina después de las 11:00
+        # Cancelar libera la hora
+        consulta = ConsultaMedica.objects.get(medico=self.m1)
+        self.client.patch(f"/api/consultas/{consulta.pk}/", {"estado": "CANC"}, content_type="application/json")
+        self.assertEqual(self.reservar(self.m1, self.hora(9, 15)).status_code, 201)
+
+    def test_cambiar_solo_el_estado_no_revalida_la_agenda(self):
+        # Consulta histórica fuera del horario actual (cargada sin validar)
+        consulta = ConsultaMedica.objects.create(
+            paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(20),
+        )
+        url = f"/api/consultas/{consulta.pk}/"
+        resp = self.client.patch(url, {"estado": "ATEN"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        resp = self.client.patch(url, {"estado": "CANC"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        # Salir de CANC vuelve a ocupar la hora: ahí sí se valida
+        resp = self.client.patch(url, {"estado": "PEND"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.patch(url, {"fecha_consulta": self.hora(21).isoformat()}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)  # sigue cancelada
+        # ModelForm / admin (full_clean): mismo criterio
+        otra = ConsultaMedica.objects.create(
+            paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(19),
+        )
+        otra.estado = "NOAS"
+        otra.full_clean()
+        otra.fecha_consulta = self.hora(18)
+        with self.assertRaises(ValidationError):
+            otra.full_clean()
+
+    def test_bulk_valida_la_agenda(self):
+        ConsultaMedica.objects.create(paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(9))
+        lote = [
+            {"paciente": self.paciente.pk, "medico": self.m1.pk, "motivo": "A", "fecha_consulta": inicio.isoformat()}
+            for inicio in [self.hora(9, 15), self.hora(10), self.hora(10, 10), self.hora(11), self.hora(9, 30)]
+        ]
+        resp = self.client.post("/api/consultas/bulk/", lote, content_type="application/json")
+        self.assertEqual(resp.status_code, 207)
+        # choca con la guardada, con la anterior del lote y fuera de horario
+        self.assertEqual([e["indice"] for e in resp.json()["errores"]], [0, 2, 3])
+        self.assertIn("fecha_consulta", resp.json()["errores"][0]["errores"])
+        self.assertEqual(len(resp.json()["creados"]), 2)
+        self.assertEqual(ConsultaMedica.objects.filter(medico=self.m1).count(), 3)
+
+    def test_trabajo_reabrir_cancelada_valida_la_agenda(self):
+        cancelada = ConsultaMedica.objects.create(
+            paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(9), estado="CANC",
+        )
+        libre = ConsultaMedica.objects.create(
+            paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(10), estado="CANC",
+        )
+        ConsultaMedica.objects.create(paciente=self.paciente, medico=self.m1, motivo="Otra", fecha_consulta=self.hora(9, 15))
+        trabajos.encolar("cambiar_estado_consultas", {"estado": "PEND", "consultas": [cancelada.pk, libre.pk]})
+        trabajo = trabajos.procesar_uno()
+        self.assertEqual(trabajo.resultado, {"consultas": 2, "cambiadas": 1, "rechazadas": [cancelada.pk]})
+        cancelada.refresh_from_db()
+        libre.refresh_from_db()
+        self.assertEqual((cancelada.estado, libre.estado), ("CANC", "PEND"))
+
+    def test_formulario_web_muestra_el_choque(self):
+        ConsultaMedica.objects.create(paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(9))
+        resp = self.client.post(reverse("consulta_create"), {
+            "paciente": self.paciente.pk, "medico": self.m1.pk, "motivo": "Otra",
+            "fecha_consulta": "2030-01-07 09:20", "estado": "PEND",
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("fecha_consulta", resp.context["form"].errors)
+        self.assertEqual(ConsultaMedica.objects.count(), 1)
+
+    def test_horarios_traslapados(self):
+        resp = self.client.post("/api/horarios/", {
+            "medico": self.m1.pk, "dia_semana": 0, "hora_inicio": "10:30", "hora_fin": "13:00",
+        }, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post("/api/horarios/", {
+            "medico": self.m1.pk, "dia_semana": 0, "hora_inicio": "11:00", "hora_fin": "13:00",
+        }, content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+
+    def test_slots_libres(self):
+        ConsultaMedica.objects.create(paciente=self.paciente, medico=self.m1, motivo="Control", fecha_consulta=self.hora(9))
+        params = {"especialidad": self.esp.pk, "desde": "2030-01-07", "n": 5}
+        # médicos + horarios + consultas de la ventana, sin importar su tamaño
+        with self.assertNumQueries(3):
+            datos = self.client.get("/api/agenda/slots/", params).json()
+        obtenidos = [(r["medico"], timezone.localtime(datetime.fromisoformat(r["inicio"])).strftime("%H:%M"))
+                     for r in datos["results"]]
+        self.assertEqual(obtenidos, [
+            (self.m1.pk, "09:30"), (self.m1.pk, "10:00"), (self.m2.pk, "10:00"),
+            (self.m1.pk, "10:30"), (self.m2.pk, "10:30"),
+        ])
+        # La semana siguiente vuelve a haber horas desde las 09:00
+        datos = self.client.get("/api/agenda/slots/", {**params, "desde": "2030-01-08", "n": 1}).json()
+        self.assertEqual(datos["results"][0]["inicio"][:10], "2030-01-14")
+        self.assertEqual(self.client.get("/api/agenda/slots/", {"n": 5}).status_code, 400)
+        self.assertEqual(self.client.get("/api/agenda/slots/", {**params, "n": 1000}).status_code, 400)
+
+
+# ---------- Historial clínico en una request ----------
+class HistorialTests(TestCase):
+
+    def setUp(self):
+        crear_datos(2)
+        self.paciente = Paciente.objects.first()
+        medico = Medico.objects.first()
+        medicamento = Medicamento.objects.first()
+        ahora = timezone.now()
+        for i in range(1, 8):
+            consulta = ConsultaMedica.objects.create(
+                paciente=self.paciente, medico=medico, motivo=f"Control {i}",
+                fecha_consulta=ahora - timedelta(days=10 * i),
+            )
+            for _ in range(2):
+                tratamiento = Tratamiento.objects.create(consulta=consulta, descripcion="Reposo")
+                RecetaMedica.objects.create(
+                    tratamiento=tratamiento, medicamento=medicamento,
+                    dosis="500 mg", frecuencia="cada 8 horas", duracion="7 días",
+                )
+        PacienteSeguro.objects.create(
+            paciente=self.paciente, seguro=SeguroSalud.objects.create(nombre="Isapre"), vigente=False,
+        )
+        self.url = f"/api/pacientes/{self.paciente.pk}/historial/"
+
+    def test_documento_anidado_en_queries_fijas(self):
+        # paciente + seguros + consultas + tratamientos + recetas(medicamento)
+        with self.assertNumQueries(5):
+            datos = self.client.get(self.url, {"page_size": 5}).json()
+        self.assertEqual(datos["paciente"]["rut"], self.paciente.rut)
+        self.assertEqual([s["nombre"] for s in datos["seguros"]], ["Fonasa"])  # sólo vigentes
+        self.assertEqual(len(datos["results"]), 5)
+        primera = datos["results"][0]
+        self.assertEqual(primera["especialidad"], "Medicina General")
+        self.assertEqual(len(primera["tratamientos"]), 1)
+        self.assertEqual(primera["tratamientos"][0]["recetas"][0]["medicamento"]["nombre"], "Paracetamol 0")
+        with self.assertNumQueries(5):
+            siguiente = self.client.get(datos["next"]).json()
+        self.assertEqual(len(siguiente["results"]), 3)
+        self.assertIsNone(siguiente["next"])
+        self.assertEqual(len(siguiente["results"][-1]["tratamientos"]), 2)
+
+    def test_filtro_por_fechas(self):
+        desde = (timezone.now() - timedelta(days=55)).isoformat()
+        datos = self.client.get(self.url, {"desde": desde}).json()
+        self.assertEqual([c["motivo"] for c in datos["results"]],
+                         ["Control", "Control 1", "Control 2", "Control 3", "Control 4", "Control 5"])
+        self.assertEqual(self.client.get(self.url, {"desde": "ayer"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/pacientes/999999/historial/").status_code, 404)
+
+
+# ---------- ?fields= y ?expand= ----------
+class CamposDinamicosTests(TestCase):
+
+    def setUp(self):
+        crear_datos(5)
+
+    def test_fields_recorta_columnas_en_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            datos = self.client.get("/api/consultas/", {"fields": "id,estado"}).json()
+        self.assertEqual(set(datos["results"][0]), {"id", "estado"})
+        select = next(q["sql"] for q in queries if "fecha_consulta" in q["sql"] and "LIMIT" in q["sql"])
+        self.assertNotIn('"motivo"', select)
+        self.assertNotIn("clinica_paciente", select)
+        self.assertEqual(self.client.get("/api/consultas/", {"fields": "id,clave"}).status_code, 400)
+
+    def test_expand_sin_n_mas_1(self):
+        # COUNT/MAX + página con los FKs en un JOIN, igual con 5 que con 50 filas
+        with self.assertNumQueries(2):
+            datos = self.client.get("/api/consultas/", {"expand": "paciente,medico"}).json()
+        primera = datos["results"][0]
+        self.assertEqual(primera["paciente"]["rut"], Paciente.objects.get(pk=primera["paciente"]["id"]).rut)
+        self.assertIn("especialidad", primera["medico"])
+        datos = self.client.get("/api/afiliaciones/", {"fields": "id,seguro", "expand": "seguro,paciente"}).json()
+        self.assertEqual(datos["results"][0], {"id": datos["results"][0]["id"],
+                                               "seguro": {**datos["results"][0]["seguro"], "nombre": "Fonasa"}})
+        consulta = ConsultaMedica.objects.first()
+        datos = self.client.get(f"/api/consultas/{consulta.pk}/", {"expand": "medico", "fields": "id,medico"}).json()
+        self.assertEqual(datos["medico"]["rut"], consulta.medico.rut)
+        self.assertEqual(self.client.get("/api/consultas/", {"expand": "motivo"}).status_code, 400)
+
+
+# ---------- list desde values() ----------
+class LecturaRapidaTests(TestCase):
+    RECURSOS = [
+        "pacientes", "medicos", "especialidades", "consultas", "tratamientos",
+        "medicamentos", "recetas", "seguros", "afiliaciones", "horarios",
+    ]
+
+    def setUp(self):
+        crear_datos(4)
+        HorarioAtencion.objects.create(medico=Medico.objects.first(), dia_semana=2, hora_inicio="08:30", hora_fin="13:00")
+        dispensar_receta(RecetaMedica.objects.first().pk)  # dispensada_en con valor y en null
+
+    def test_misma_salida_que_el_serializer(self):
+        for recurso in self.RECURSOS:
+            for params in ({}, {"page": 1}, {"page_size": 2}, {"fields": "id,created_at"}):
+                with self.subTest(recurso=recurso, params=params):
+                    rapido = self.client.get(f"/api/{recurso}/", params)
+                    with mock.patch.object(BaseModelViewSet, "lectura_rapida", False):
+                        normal = self.client.get(f"/api/{recurso}/", params)
+                    self.assertEqual(rapido.status_code, 200)
+                    self.assertEqual(rapido.content, normal.content)
+
+    def test_no_instancia_modelos(self):
+        with mock.patch.object(ConsultaMedica, "from_db", side_effect=AssertionError("instanció un modelo")):
+            datos = self.client.get("/api/consultas/", {"page_size": 2}).json()
+            siguiente = self.client.get(datos["next"]).json()
+        self.assertEqual(len(datos["results"]) + len(siguiente["results"]), 4)
+
+    def test_comando_benchmark(self):
+        salida = StringIO()
+        call_command("clinica_bench_lectura", "--filas", "50", "--repeticiones", "1", stdout=salida)
+        self.assertIn("JSON idéntico", salida.getvalue())
+        self.assertEqual(ConsultaMedica.objects.count(), 4)  # se revierte
+
+
+# ---------- Lecturas async (/api/async/) ----------
+class AsyncReadTests(TestCase):
+
+    def setUp(self):
+        crear_datos(5)
+
+    async def _json(self, url, **params):
+        resp = await self.async_client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(b"".join([c async for c in resp.streaming_content]) if resp.streaming else resp.content)
+
+    async def test_misma_salida_que_la_api_sincrona(self):
+        for recurso in ("pacientes", "medicos", "consultas"):
+            with self.subTest(recurso=recurso):
+                esperado = (await self.async_client.get(f"/api/{recurso}/", {"page_size": 3})).json()
+                datos = await self._json(f"/api/async/{recurso}/", page_size=3)
+                self.assertEqual(datos["results"], esperado["results"])
+                resto = await self._json(datos["next"])
+                self.assertEqual(len(resto["results"]), 2)
+                self.assertIsNone(resto["next"])
+                pk = esperado["results"][0]["id"]
+                uno = (await self.async_client.get(f"/api/{recurso}/{pk}/")).content
+                self.assertEqual((await self.async_client.get(f"/api/async/{recurso}/{pk}/")).content, uno)
+
+    async def test_filtros_304_y_errores(self):
+        medico = await Medico.objects.afirst()
+        datos = await self._json("/api/async/consultas/", medico=medico.pk)
+        self.assertEqual([c["medico"] for c in datos["results"]], [medico.pk])
+        resp = await self.async_client.get("/api/async/consultas/")
+        [_ async for _ in resp.streaming_content]
+        resp = await self.async_client.get("/api/async/consultas/", headers={"if-none-match": resp["ETag"]})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual((await self.async_client.get("/api/async/consultas/", {"cursor": "xx"})).status_code, 400)
+        self.assertEqual((await self.async_client.get("/api/async/medicos/999999/")).status_code, 404)
+        self.assertEqual((await self.async_client.post("/api/async/medicos/")).status_code, 405)
+
+    async def test_historial(self):
+        paciente = await Paciente.objects.afirst()
+        esperado = (await self.async_client.get(f"/api/pacientes/{paciente.pk}/historial/")).json()
+        datos = await self._json(f"/api/async/pacientes/{paciente.pk}/historial/")
+        for clave in ("paciente", "seguros", "results"):
+            self.assertEqual(datos[clave], esperado[clave])
+        self.assertIsNone(datos["next"])
+
+
+class CargaComandoTests(TransactionTestCase):
+    """clinica_carga llama a la app ASGI en otros hilos: los datos deben estar confirmados."""
+    databases = "__all__"  # los GET pueden ir a una réplica
+
+    def test_compara_sync_y_async_sin_errores(self):
+        crear_datos(2)
+        salida = StringIO()
+        call_command("clinica_carga", "--requests", "4", "--concurrencia", "2", stdout=salida)
+        filas = salida.getvalue().splitlines()[2:]
+        self.assertEqual(len(filas), 10)
+        self.assertTrue(all(fila.split()[-1] == "0" for fila in filas), salida.getvalue())
+
+
+# ---------- Datos sintéticos y benchmark ----------
+class SeedBenchTests(TransactionTestCase):
+    """clinica_bench llama a la app ASGI en otros hilos: los datos deben estar confirmados."""
+    databases = "__all__"
+    SEED = ["--pacientes", "30", "--consultas", "90", "--medicos", "4", "--medicamentos", "5",
+            "--tarea", "7", "--referencia", "2026-01-01", "--semilla", "3"]
+
+    def _contenido(self):
+        return (
+            list(Paciente.objects.order_by("id").values_list("rut", "nombre", "apellido", "fecha_nacimiento")),
+            list(ConsultaMedica.objects.order_by("id").values_list("paciente_id", "medico_id", "fecha_consulta", "estado")),
+            list(RecetaMedica.objects.order_by("id").values_list("tratamiento_id", "medicamento_id", "dispensada_en")),
+        )
+
+    def test_seed_determinista_y_coherente(self):
+        call_command("seed_clinica", *self.SEED, stdout=StringIO())
+        self.assertEqual(Paciente.objects.count(), 30)
+        self.assertEqual(ConsultaMedica.objects.count(), 90)
+        self.assertEqual(Tratamiento.objects.count(), 54)
+        self.assertEqual(RecetaMedica.objects.count(), 81)
+        self.assertEqual(PacienteSeguro.objects.count(), 30)
+        self.assertEqual(resumenes.diferencias(), [])
+        self.assertTrue(all(r.split("-")[1] == sintetico.digito_verificador(int(r.split("-")[0]))
+                            for r in Paciente.objects.values_list("rut", flat=True)))
+        primero = self._contenido()
+        for model in (RecetaMedica, Tratamiento, ConsultaMedica, PacienteSeguro, Paciente):
+            model.objects.all().delete()
+        call_command("seed_clinica", *self.SEED, stdout=StringIO())
+        # Mismo contenido (los médicos y medicamentos de la segunda corrida son nuevos)
+        segundo = self._contenido()
+        self.assertEqual(segundo[0], primero[0])
+        self.assertEqual([(c[0], *c[2:]) for c in segundo[1]], [(c[0], *c[2:]) for c in primero[1]])
+        self.assertEqual([r[::2] for r in segundo[2]], [r[::2] for r in primero[2]])
+        # Las secuencias quedan después de los ids explícitos
+        self.assertEqual(Paciente.objects.create(rut="1-9", nombre="A", apellido="B",
+                                                 fecha_nacimiento=date(2000, 1, 1)).pk, 31)
+
+    def test_benchmark_guarda_y_compara(self):
+        call_command("seed_clinica", *self.SEED, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = Path(carpeta) / "bench.json"
+            call_command("clinica_bench", "--requests", "3", "--concurrencia", "2", "--solo", "consultas,web pacientes",
+                         "--salida", str(archivo), stdout=StringIO())
+            corrida = json.loads(archivo.read_text(encoding="utf-8"))
+            salida = StringIO()
+            call_command("clinica_bench", "--requests", "2", "--solo", "web", "--comparar", str(archivo), stdout=salida)
+        self.assertEqual(corrida["filas"]["paciente"], 30)
+        self.assertEqual(set(corrida["resultados"]), {
+            "api consultas", "api consultas por medico", "async consultas", "web consultas", "web pacientes",
+        })
+        for r in corrida["resultados"].values():
+            self.assertEqual(r["errores"], 0)
+            self.assertLessEqual(r["p50"], r["p99"])
+        self.assertIn("Δ p95", salida.getvalue())
+
+    def test_benchmark_facturacion(self):
+        call_command("seed_clinica", *self.SEED, stdout=StringIO())
+        salida = StringIO()
+        call_command("clinica_bench_facturacion", "--meses", "120", "--repeticiones", "1", "--lote", "7", stdout=salida)
+        self.assertIn("mismos totales", salida.getvalue())
+
+
+# ---------- Particiones de consultas (PostgreSQL) ----------
+@skipUnless(connection.vendor == "postgresql", "particiones: sólo PostgreSQL")
+class ParticionesTests(TestCase):
+    def setUp(self):
+        particiones.olvidar_corte()
+        self.addCleanup(particiones.olvidar_corte)
+        crear_datos(2)
+        # Más de 24 meses atrás: cae en la partición DEFAULT
+        self.antigua = ConsultaMedica.objects.create(
+            paciente=Paciente.objects.first(), medico=Medico.objects.first(), motivo="Antigua",
+            fecha_consulta=timezone.now() - timedelta(days=800),
+        )
+        Tratamiento.objects.create(consulta=self.antigua, descripcion="Reposo")
+        self.mes = particiones.mes_de(timezone.localtime(self.antigua.fecha_consulta))
+        self.particion = particiones.nombre_particion(self.mes)
+
+    def contar(self, tabla):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {tabla}")
+            return cursor.fetchone()[0]
+
+    def test_crear_mueve_filas_de_default(self):
+        self.assertEqual(self.contar(particiones.DEFAULT), 1)
+        call_command("clinica_particiones", "crear", stdout=StringIO())
+        self.assertEqual(self.contar(particiones.DEFAULT), 0)
+        self.assertEqual(self.contar(self.particion), 1)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [self.particion])
+            indices = {fila[0] for fila in cursor.fetchall()}
+        self.assertIn(f"consulta_fecha_idx_{particiones.sufijo(self.mes)}", indices)
+        # Idempotente
+        self.assertEqual(particiones.asegurar_particiones(), [])
+
+    def test_archivar_y_api_con_desde(self):
+        particiones.asegurar_particiones()
+        archivados = particiones.archivar(meses_activos=24)
+        self.assertEqual([(mes, filas) for mes, filas, _ in archivados], [(self.mes, 1)])
+        self.assertEqual(particiones.corte(), particiones.inicio(particiones.sumar_meses(self.mes, 1)))
+        self.assertFalse(ConsultaMedica.objects.filter(pk=self.antigua.pk).exists())
+        self.assertTrue(ConsultaMedicaCompleta.objects.filter(pk=self.antigua.pk).exists())
+
+        url = reverse("consulta-list")
+        ids = [c["id"] for c in self.client.get(url).json()["results"]]
+        self.assertNotIn(self.antigua.pk, ids)
+        desde = (self.antigua.fecha_consulta - timedelta(days=1)).isoformat()
+        resp = self.client.get(url, {"desde": desde, "medico": self.antigua.medico_id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(self.antigua.pk, [c["id"] for c in resp.json()["results"]])
+        # Desde después del corte: sólo la tabla activa
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {"desde": timezone.now().isoformat()})
+        self.assertNotIn(particiones.VISTA, " ".join(q["sql"] for q in queries.captured_queries))
+
+    def test_tratamientos_de_consultas_archivadas(self):
+        tratamiento = Tratamiento.objects.get(consulta=self.antigua)
+        RecetaMedica.objects.create(
+            tratamiento=tratamiento, medicamento=Medicamento.objects.first(),
+            dosis="1 g", frecuencia="cada 8 horas", duracion="7 días",
+        )
+        particiones.asegurar_particiones()
+        particiones.archivar(meses_activos=24)
+
+        ids = [t["id"] for t in self.client.get("/api/tratamientos/").json()["results"]]
+        self.assertIn(tratamiento.pk, ids)
+        self.assertEqual(self.client.get(f"/api/tratamientos/{tratamiento.pk}/").status_code, 200)
+        resp = self.client.get(f"/api/tratamientos/{tratamiento.pk}/", {"expand": "consulta"})
+        self.assertEqual(resp.json()["consulta"]["motivo"], "Antigua")
+        etag = self.client.get("/api/tratamientos/", {"expand": "consulta"})["ETag"]
+        tratamiento.descripcion = "Editado"
+        tratamiento.save()
+        resp = self.client.get("/api/tratamientos/", {"expand": "consulta"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        # La facturación sin período también cuenta las recetas archivadas
+        self.assertEqual(sum(f["recetas"] for f in facturacion.reporte()), RecetaMedica.objects.count())
+
+    def test_exportar_y_eliminar(self):
+        particiones.asegurar_particiones()
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command(
+                "clinica_particiones", "archivar", "--meses-activos", "24",
+                "--exportar", directorio, "--eliminar", stdout=StringIO(),
+            )
+            with gzip.open(Path(directorio) / f"consultas_{self.mes:%Y_%m}.csv.gz", "rt", encoding="utf-8") as archivo:
+                filas = list(csv.DictReader(archivo))
+            with gzip.open(Path(directorio) / f"tratamientos_{self.mes:%Y_%m}.csv.gz", "rt", encoding="utf-8") as archivo:
+                tratamientos = list(csv.DictReader(archivo))
+        self.assertEqual([f["motivo"] for f in filas], ["Antigua"])
+        self.assertEqual([t["consulta_id"] for t in tratamientos], [str(self.antigua.pk)])
+        self.assertFalse(ConsultaMedicaCompleta.objects.filter(pk=self.antigua.pk).exists())
+        self.assertFalse(Tratamiento.objects.filter(consulta_id=self.antigua.pk).exists())
+        self.assertEqual(resumenes.diferencias(), [])
+
+
+# ---------- Réplicas de lectura ----------
+@override_settings(DATABASE_REPLICAS=["replica_prueba"])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.addCleanup(routers._estado.set, None)
+
+    def test_solo_lecturas_seguras_van_a_la_replica(self):
+        self.assertEqual(self.router.db_for_read(Paciente), "default")  # fuera de una request
+        routers.iniciar_request(primario=False)
+        self.assertEqual(self.router.db_for_read(Paciente), "replica_prueba")
+        paciente = Paciente(nombre="X")
+        paciente._state.db = "default"
+        self.assertEqual(self.router.db_for_read(ConsultaMedica, instance=paciente), "default")
+        self.assertEqual(self.router.db_for_write(Paciente), "default")
+        self.assertEqual(self.router.db_for_read(Paciente), "default")  # ya escribió
+        routers.iniciar_request(primario=True)
+        self.assertEqual(self.router.db_for_read(Paciente), "default")
+
+    def test_middleware_fija_al_cliente_tras_escribir(self):
+        vistos = []
+
+        def vista(request):
+            vistos.append(routers.estado_actual().primario)
+            if request.method == "POST":
+                self.router.db_for_write(Paciente)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(vista)
+        factory = RequestFactory()
+        self.assertNotIn(COOKIE_PRIMARIO, middleware(factory.get("/")).cookies)
+        response = middleware(factory.post("/"))
+        cookie = response.cookies[COOKIE_PRIMARIO]
+        self.assertEqual(cookie["max-age"], 5)
+        request = factory.get("/")
+        request.COOKIES[COOKIE_PRIMARIO] = cookie.value
+        middleware(request)
+        request = factory.get("/")
+        request.COOKIES[COOKIE_PRIMARIO] = str(time.time() - 1)  # vencida
+        middleware(request)
+        self.assertEqual(vistos, [False, True, True, False])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "sin réplicas configuradas (DB_REPLICA_HOSTS / DB_REPLICA_NAMES)")
+class ReplicaRoutingIntegrationTests(TransactionTestCase):
+    """Con réplicas reales (espejo de default en los tests): qué conexión ejecuta cada query."""
+    databases = "__all__"
+
+    def test_get_en_replica_y_lectura_propia_en_primario(self):
+        crear_datos(1)
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with override_settings(DATABASE_REPLICAS=[replica.alias]), CaptureQueriesContext(replica) as en_replica:
+            self.client.get("/api/pacientes/")
+            self.assertGreater(len(en_replica), 0)
+            resp = self.client.post("/api/especialidades/", {"nombre": "Nueva"}, content_type="application/json")
+            self.assertEqual(resp.status_code, 201)
+            antes = len(en_replica)
+            self.client.get("/api/especialidades/")  # la cookie lo fija al primario
+            self.assertEqual(len(en_replica), antes)
+
+
+# ---------- Métricas por request ----------
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        crear_datos(3)
+        metricas.AGREGADO.reiniciar()
+
+    def test_server_timing_cuenta_las_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get("/api/consultas/", {"expand": "medico"})
+        tiempos = resp["Server-Timing"]
+        self.assertIn(f'db;desc="{len(queries)} queries"', tiempos)
+        for tramo in ("serializacion;dur=", "render;dur=", "total;dur="):
+            self.assertIn(tramo, tiempos)
+
+    async def test_server_timing_en_vistas_async(self):
+        resp = await self.async_client.get("/api/async/consultas/")
+        self.assertRegex(resp["Server-Timing"], r'db;desc="[1-9]\d* queries"')
+
+    def test_requests_y_queries_lentas(self):
+        umbrales = {**settings.METRICAS, "REQUEST_LENTA_MS": 0, "QUERY_LENTA_MS": 0, "EXPLAIN_MUESTRA": 1}
+        with override_settings(METRICAS=umbrales), self.assertLogs("clinica.metricas", "WARNING") as logs:
+            self.client.get("/api/pacientes/")
+        registros = [json.loads(r.getMessage()) for r in logs.records]
+        self.assertEqual({r["evento"] for r in registros}, {"request_lenta", "query_lenta"})
+        self.assertTrue(all("plan" in r for r in registros if r["evento"] == "query_lenta"))
+
+    def test_endpoint_prometheus_solo_staff(self):
+        for _ in range(3):
+            self.client.get("/api/medicos/")
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        staff = User.objects.create_user("admin", password="x", is_staff=True)
+        self.client.force_login(staff)
+        texto = self.client.get("/metrics").content.decode()
+        self.assertIn('clinica_request_duration_seconds{method="GET",route="medico-list",quantile="0.99"}', texto)
+        self.assertIn('clinica_request_duration_seconds_count{method="GET",route="medico-list"} 3', texto)
+        self.assertRegex(texto, r'clinica_request_queries_total\{method="GET",route="medico-list"\} [1-9]')
+
+
+# ---------- Trabajos en segundo plano ----------
+class TrabajoTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directorio = Path(tmp.name)
+        ajuste = override_settings(TRABAJOS={**settings.TRABAJOS, "DIRECTORIO": tmp.name})
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_api_encola_y_worker_exporta(self):
+        crear_datos(3)
+        medico = Medico.objects.first()
+        resp = self.client.post(reverse("trabajo-list"), {
+            "tipo": "exportar", "parametros": {"recurso": "consultas", "filtros": {"medico": medico.pk}},
+        }, content_type="application/json")
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["estado"], "PEND")
+        salida = StringIO()
+        call_command("clinica_worker", "--una-vez", "--procesos", "1", stdout=salida)
+        self.assertIn("1 trabajo(s)", salida.getvalue())
+
+        trabajo = self.client.get(reverse("trabajo-detail", args=[resp.json()["id"]])).json()
+        self.assertEqual((trabajo["estado"], trabajo["intentos"]), ("OK", 1))
+        archivo = self.client.get(reverse("trabajo-archivo", args=[trabajo["id"]]))
+        directo = self.client.get(f"/api/consultas/export.csv/?medico={medico.pk}")
+        self.assertEqual(b"".join(archivo.streaming_content), b"".join(directo.streaming_content))
+
+    def test_validacion_al_encolar(self):
+        url = reverse("trabajo-list")
+        for tipo, parametros in [
+            ("no_existe", {}),
+            ("exportar", {"recurso": "usuarios"}),
+            ("importar", {"recurso": "pacientes", "archivo": "../../etc/passwd"}),
+            ("cambiar_estado_consultas", {"estado": "XXXX", "consultas": [1]}),
+        ]:
+            with self.subTest(tipo=tipo):
+                resp = self.client.post(url, {"tipo": tipo, "parametros": parametros}, content_type="application/json")
+                self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Trabajo.objects.exists())
+
+    def test_reintentos_con_backoff(self):
+        with mock.patch.dict(trabajos.TAREAS, {"falla": trabajos.Tarea(lambda trabajo: 1 / 0, None)}):
+            trabajo = trabajos.encolar("falla", max_intentos=2)
+            with self.assertLogs("clinica.trabajos", "WARNING"):
+                trabajos.procesar_uno()
+            trabajo.refresh_from_db()
+            self.assertEqual((trabajo.estado, trabajo.intentos), ("PEND", 1))
+            self.assertIn("ZeroDivisionError", trabajo.error)
+            espera = (trabajo.disponible_en - timezone.now()).total_seconds()
+            self.assertAlmostEqual(espera, trabajos.backoff(1), delta=5)
+            self.assertIsNone(trabajos.procesar_uno())  # todavía no está disponible
+
+            Trabajo.objects.filter(pk=trabajo.pk).update(disponible_en=timezone.now())
+            with self.assertLogs("clinica.trabajos", "WARNING"):
+                trabajos.procesar_uno()
+            trabajo.refresh_from_db()
+            self.assertEqual((trabajo.estado, trabajo.intentos), ("ERR", 2))
+            self.assertIsNotNone(trabajo.terminado_en)
+        self.assertEqual(trabajos.backoff(3), settings.TRABAJOS["BACKOFF_SEGUNDOS"] * 4)
+
+    def test_rescatar_trabajos_colgados(self):
+        hace_rato = timezone.now() - timedelta(seconds=settings.TRABAJOS["TIMEOUT_SEGUNDOS"] + 1)
+        devuelto = Trabajo.objects.create(tipo="reconstruir_resumenes", estado="EJEC", intentos=1, iniciado_en=hace_rato)
+        agotado = Trabajo.objects.create(
+            tipo="reconstruir_resumenes", estado="EJEC", intentos=3, max_intentos=3, iniciado_en=hace_rato,
+        )
+        self.assertEqual(trabajos.rescatar(), (1, 1))
+        self.assertEqual(Trabajo.objects.get(pk=devuelto.pk).estado, "PEND")
+        self.assertEqual(Trabajo.objects.get(pk=agotado.pk).estado, "ERR")
+        self.assertEqual(trabajos.procesar_uno().estado, "OK")
+
+    def test_cambiar_estado_e_importar(self):
+        crear_datos(4)
+        medico = Medico.objects.first()
+        trabajos.encolar("cambiar_estado_consultas", {"estado": "CANC", "filtros": {"medico": medico.pk}})
+        (self.directorio / "medicamentos.csv").write_text("id,nombre,stock\n800,Ibuprofeno,10\n801,Aspirina,5\n", encoding="utf-8")
+        trabajos.encolar("importar", {"recurso": "medicamentos", "archivo": "medicamentos.csv"})
+
+        cambio, importacion = trabajos.procesar_uno(), trabajos.procesar_uno()
+        self.assertEqual(cambio.resultado, {"consultas": 1, "cambiadas": 1, "rechazadas": []})
+        self.assertEqual(list(ConsultaMedica.objects.filter(medico=medico).values_list("estado", flat=True)), ["CANC"])
+        self.assertEqual(resumenes.diferencias(), [])
+        self.assertEqual(importacion.resultado["insertadas"], 2, importacion.error)
+        self.assertTrue(Medicamento.objects.filter(nombre="Aspirina").exists())
+
+
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+class TrabajoSkipLockedTests(TransactionTestCase):
+    """Un worker se salta el trabajo que otro tiene bloqueado en vez de esperarlo."""
+
+    def test_skip_locked(self):
+        primero = trabajos.encolar("reconstruir_resumenes")
+        segundo = trabajos.encolar("reconstruir_resumenes")
+        bloqueado, soltar = threading.Event(), threading.Event()
+
+        def otro_worker():
+            try:
+                with transaction.atomic():
+                    Trabajo.objects.select_for_update().get(pk=primero.pk)
+                    bloqueado.set()
+                    soltar.wait(10)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=otro_worker)
+        hilo.start()
+        bloqueado.wait(10)
+        try:
+            tomado = trabajos.tomar("test")
+        finally:
+            soltar.set()
+            hilo.join()
+        self.assertEqual(tomado.pk, segundo.pk)
+        self.assertEqual(Trabajo.objects.get(pk=primero.pk).estado, "PEND")
+
+
+# ---------- Facturación por seguro, mes y médico ----------
+class FacturacionTests(TestCase):
+
+    def setUp(self):
+        crear_datos(3)  # 3 recetas de $990, "cada 8 horas" x "7 días" = 21 unidades, cobertura 50 %
+        self.medico = Medico.objects.first()
+        isapre = SeguroSalud.objects.create(nombre="Isapre", plan="Plus")
+        # Con dos afiliaciones vigentes manda la de mayor cobertura
+        PacienteSeguro.objects.create(paciente=Paciente.objects.first(), seguro=isapre, cobertura_porcentaje=80)
+        particular = Paciente.objects.create(rut="9-9", nombre="Sin", apellido="Seguro", fecha_nacimiento=date(2000, 1, 1))
+        consulta = ConsultaMedica.objects.create(paciente=particular, medico=self.medico, motivo="Dolor",
+                                                 fecha_consulta=timezone.now())
+        tratamiento = Tratamiento.objects.create(consulta=consulta, descripcion="Analgesia")
+        RecetaMedica.objects.create(tratamiento=tratamiento, medicamento=Medicamento.objects.first(),
+                                    dosis="1 comp", frecuencia="SOS", duracion="según dolor", cantidad=4)
+
+    def test_posologia(self):
+        self.assertEqual(facturacion.tomas_por_dia("Cada 8 horas"), 3)
+        self.assertEqual(facturacion.tomas_por_dia("2 veces al día"), 2)
+        self.assertEqual(facturacion.tomas_por_dia("cada 2 días"), 0.5)
+        self.assertEqual(facturacion.tomas_por_dia("una vez a la semana"), 1 / 7)
+        self.assertEqual(facturacion.dias("2 semanas"), 14)
+        self.assertEqual(facturacion.dias("1 mes"), 30)
+        self.assertTrue(math.isnan(facturacion.tomas_por_dia("SOS")))
+        self.assertTrue(math.isnan(facturacion.dias("")))
+
+    def test_reporte(self):
+        with self.assertNumQueries(3):  # la query agrupada + nombres de seguros y médicos
+            filas = list(facturacion.reporte())
+        por_clave = {(f["seguro_nombre"], f["medico"]): f for f in filas}
+        self.assertEqual(len(filas), 4)
+        isapre = por_clave[("Isapre Plus", self.medico.pk)]
+        self.assertEqual((isapre["recetas"], isapre["costo"], isapre["cubierto"], isapre["copago"]),
+                         (1, 20790.0, 16632.0, 4158.0))
+        particular = por_clave[(facturacion.PARTICULAR, self.medico.pk)]
+        self.assertEqual((particular["seguro"], particular["sin_posologia"], particular["costo"], particular["copago"]),
+                         (None, 1, 3960.0, 3960.0))
+        self.assertEqual(sum(f["cubierto"] for f in filas if f["seguro_nombre"] == "Fonasa B"), 2 * 10395.0)
+        self.assertEqual({f["mes"] for f in filas} - {f"{timezone.localdate() - timedelta(days=d):%Y-%m}" for d in range(3)}, set())
+        # Lotes de una fila: los grupos que cruzan de lote se suman igual
+        self.assertEqual(list(facturacion.reporte(lote=1)), filas)
+        self.assertEqual([f["seguro"] for f in facturacion.reporte(seguro=0)], [None])
+
+    def test_api_y_export(self):
+        datos = self.client.get("/api/facturacion/", {"medico": self.medico.pk}).json()
+        self.assertEqual(datos["totales"]["recetas"], 2)
+        self.assertEqual(datos["totales"]["costo"], 20790.0 + 3960.0)
+        resp = self.client.get("/api/facturacion/export.csv/")
+        self.assertTrue(resp.streaming)
+        lineas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], ",".join(facturacion.COLUMNAS))
+        self.assertEqual(len(lineas), 5)
+        self.assertEqual(self.client.get("/api/facturacion/", {"hasta": "mañana"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/facturacion/", {"desde": "2030-01-01"}).status_code, 400)
@@ -0,0 +1,329 @@
+# EVA2/clinica/trabajos.py
+# ---------------------------------------------------------
+# Trabajos en segundo plano con la BD como cola (sin broker externo).
+# - encolar() guarda un Trabajo PEND; la API lo hace con POST /api/trabajos/.
+# - `manage.py clinica_worker` corre N procesos que toman trabajos con
+#   SELECT ... FOR UPDATE SKIP LOCKED: cada worker se salta las filas que
+#   otro ya bloqueó, así que nunca esperan entre ellos ni ejecutan dos
+#   veces el mismo trabajo. En SQLite (sin FOR UPDATE) corre un solo worker.
+# - Si una tarea falla se reintenta con backoff exponencial
+#   (BACKOFF_SEGUNDOS * 2^(intento-1), hasta BACKOFF_MAXIMO) hasta
+#   max_intentos; TrabajoInvalido (parámetros malos) falla sin reintentos.
+# - Un trabajo en ejecución por más de TIMEOUT_SEGUNDOS (worker caído) se
+#   devuelve a la cola, o falla si ya agotó sus intentos (rescatar()).
+# - Tareas: exportar, importar, reconstruir_resumenes y
+#   cambiar_estado_consultas. Se registran con @tarea("nombre").
+# ---------------------------------------------------------
+
+import logging
+import os
+import socket
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.test import RequestFactory
+from django.utils import timezone
+
+from . import agenda, resumenes
+from .importacion import RECURSOS, ImportacionError, importar_csv
+from .models import ESTADO_CONSULTA_CHOICES, ConsultaMedica, Trabajo
+
+logger = logging.getLogger("clinica.trabajos")
+
+
+class TrabajoInvalido(ValueError):
+    """Parámetros que no sirven: el trabajo falla sin reintentos."""
+
+
+@dataclass
+class Tarea:
+    ejecutar: Callable          # (trabajo) -> resultado (JSON)
+    validar: Optional[Callable]  # (parametros) -> None o TrabajoInvalido
+
+
+TAREAS = {}
+
+
+def tarea(nombre, validar=None):
+    def registrar(funcion):
+        TAREAS[nombre] = Tarea(funcion, validar)
+        return funcion
+    return registrar
+
+
+def validar(tipo, parametros):
+    if tipo not in TAREAS:
+        raise TrabajoInvalido(f"Tipo de trabajo desconocido: {tipo} (opciones: {', '.join(sorted(TAREAS))}).")
+    if not isinstance(parametros, dict):
+        raise TrabajoInvalido("Los parámetros deben ser un objeto JSON.")
+    if TAREAS[tipo].validar is not None:
+        TAREAS[tipo].validar(parametros)
+
+
+def encolar(tipo, parametros=None, max_intentos=None):
+    parametros = parametros if parametros is not None else {}
+    validar(tipo, parametros)
+    return Trabajo.objects.create(
+        tipo=tipo, parametros=parametros,
+        max_intentos=max_intentos or settings.TRABAJOS["MAX_INTENTOS"],
+    )
+
+
+# ---------- Ejecución ----------
+def nombre_trabajador():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff(intentos):
+    """Segundos de espera antes del siguiente intento."""
+    return min(settings.TRABAJOS["BACKOFF_SEGUNDOS"] * 2 ** (intentos - 1), settings.TRABAJOS["BACKOFF_MAXIMO"])
+
+
+def tomar(trabajador):
+    """El próximo trabajo disponible, ya marcado EJEC, o None."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        trabajo = (
+            Trabajo.objects.select_for_update(skip_locked=True)
+            .filter(estado="PEND", disponible_en__lte=ahora)
+            .order_by("disponible_en", "id")
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = "EJEC"
+        trabajo.intentos += 1
+        trabajo.iniciado_en = ahora
+        trabajo.terminado_en = None
+        trabajo.trabajador = trabajador
+        trabajo.save(update_fields=["estado", "intentos", "iniciado_en", "terminado_en", "trabajador", "updated_at"])
+    return trabajo
+
+
+def ejecutar(trabajo):
+    """Corre la tarea y deja el trabajo OK, ERR o PEND (reintento con backoff)."""
+    inicio = time.perf_counter()
+    try:
+        if trabajo.tipo not in TAREAS:
+            raise TrabajoInvalido(f"Tipo de trabajo desconocido: {trabajo.tipo}.")
+        trabajo.resultado = TAREAS[trabajo.tipo].ejecutar(trabajo)
+        trabajo.estado, trabajo.error = "OK", ""
+    except TrabajoInvalido as exc:
+        trabajo.estado, trabajo.error = "ERR", str(exc)
+    except Exception:
+        trabajo.error = traceback.format_exc()
+        if trabajo.intentos < trabajo.max_intentos:
+            trabajo.estado = "PEND"
+            trabajo.disponible_en = timezone.now() + timedelta(seconds=backoff(trabajo.intentos))
+        else:
+            trabajo.estado = "ERR"
+    if trabajo.estado != "PEND":
+        trabajo.terminado_en = timezone.now()
+    trabajo.save(update_fields=["estado", "resultado", "error", "disponible_en", "terminado_en", "updated_at"])
+    nivel = logging.INFO if trabajo.estado == "OK" else logging.WARNING
+    logger.log(
+        nivel, "trabajo %s (%s) intento %s/%s: %s en %.1fs", trabajo.pk, trabajo.tipo,
+        trabajo.intentos, trabajo.max_intentos, trabajo.get_estado_display(), time.perf_counter() - inicio,
+    )
+    return trabajo
+
+
+def rescatar():
+    """Trabajos EJEC vencidos: vuelven a la cola o fallan si agotaron sus intentos."""
+    ahora = timezone.now()
+    colgados = Trabajo.objects.filter(
+        estado="EJEC", iniciado_en__lt=ahora - timedelta(seconds=settings.TRABAJOS["TIMEOUT_SEGUNDOS"])
+    )
+    error = "Tiempo agotado: el worker no terminó el trabajo."
+    devueltos = colgados.filter(intentos__lt=F("max_intentos")).update(
+        estado="PEND", disponible_en=ahora, error=error, updated_at=ahora,
+    )
+    fallidos = colgados.update(estado="ERR", terminado_en=ahora, error=error, updated_at=ahora)
+    return devueltos, fallidos
+
+
+def procesar_uno(trabajador=None):
+    """Toma y ejecuta un trabajo. Devuelve el trabajo o None si la cola está vacía."""
+    trabajo = tomar(trabajador or nombre_trabajador())
+    return ejecutar(trabajo) if trabajo is not None else None
+
+
+def trabajar(detener, intervalo, una_vez=False):
+    """
+    Bucle de un worker hasta que `detener` (un Event) se active; con
+    `una_vez`, termina cuando la cola queda vacía. Devuelve los trabajos hechos.
+    """
+    trabajador, hechos, ultimo_rescate = nombre_trabajador(), 0, 0.0
+    while not detener.is_set():
+        # Como Django entre requests: descarta conexiones caídas o vencidas
+        # (CONN_MAX_AGE); nunca dentro de una transacción abierta
+        if not connection.in_atomic_block:
+            close_old_connections()
+        if time.monotonic() - ultimo_rescate > 60:
+            rescatar()
+            ultimo_rescate = time.monotonic()
+        if procesar_uno(trabajador) is not None:
+            hechos += 1
+        elif una_vez:
+            break
+        else:
+            detener.wait(intervalo)
+    return hechos
+
+
+# ---------- Archivos ----------
+def directorio():
+    ruta = Path(settings.TRABAJOS["DIRECTORIO"])
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def ruta_archivo(nombre):
+    """Ruta de un archivo dentro de TRABAJOS['DIRECTORIO'] (nunca fuera)."""
+    if not isinstance(nombre, str) or not nombre:
+        raise TrabajoInvalido("Falta el nombre del archivo.")
+    base = directorio().resolve()
+    ruta = (base / nombre).resolve()
+    if base not in ruta.parents:
+        raise TrabajoInvalido("El archivo debe estar dentro del directorio de trabajos.")
+    return ruta
+
+
+# ---------- Tareas ----------
+def _exportables():
+    from .urls import router  # evita el import circular urls -> views -> trabajos
+    return {prefijo: viewset for prefijo, viewset, _ in router.registry if hasattr(viewset, "export")}
+
+
+def _validar_exportar(parametros):
+    if parametros.get("recurso") not in _exportables():
+        raise TrabajoInvalido(f"recurso: uno de {', '.join(sorted(_exportables()))}.")
+    if parametros.get("formato", "csv") not in ("csv", "ndjson"):
+        raise TrabajoInvalido("formato: csv o ndjson.")
+    if not isinstance(parametros.get("filtros", {}), dict):
+        raise TrabajoInvalido("filtros: un objeto con los mismos parámetros del listado.")
+
+
+@tarea("exportar", validar=_validar_exportar)
+def exportar(trabajo):
+    """El mismo export.csv/export.ndjson de la API (export.py), a un archivo."""
+    parametros = trabajo.parametros
+    _validar_exportar(parametros)
+    recurso, formato = parametros["recurso"], parametros.get("formato", "csv")
+    vista = _exportables()[recurso].as_view({"get": "export"})
+    respuesta = vista(RequestFactory().get("/", parametros.get("filtros", {})), formato=formato)
+    if respuesta.status_code != 200:
+        respuesta.render()
+        raise TrabajoInvalido(f"El export respondió {respuesta.status_code}: {respuesta.content.decode()}")
+    ruta = directorio() / f"trabajo_{trabajo.pk}_{recurso}.{formato}"
+    with open(ruta, "wb") as archivo:
+        for trozo in respuesta.streaming_content:
+            archivo.write(trozo)
+    return {"archivo": ruta.name, "bytes": ruta.stat().st_size}
+
+
+def _validar_importar(parametros):
+    if parametros.get("recurso") not in RECURSOS:
+        raise TrabajoInvalido(f"recurso: uno de {', '.join(sorted(RECURSOS))}.")
+    if not ruta_archivo(parametros.get("archivo")).is_file():
+        raise TrabajoInvalido(f"No existe el archivo {parametros['archivo']}.")
+
+
+@tarea("importar", validar=_validar_importar)
+def importar(trabajo):
+    """Un CSV del directorio de trabajos con importacion.py (como clinica_import)."""
+    parametros = trabajo.parametros
+    _validar_importar(parametros)
+    with open(ruta_archivo(parametros["archivo"]), encoding=parametros.get("encoding", "utf-8"), newline="") as archivo:
+        try:
+            res = importar_csv(parametros["recurso"], archivo, actualizar=bool(parametros.get("actualizar")))
+        except ImportacionError as exc:
+            raise TrabajoInvalido(str(exc))
+    return {
+        "leidas": res.leidas, "insertadas": res.insertadas, "actualizadas": res.actualizadas,
+        "omitidas": res.omitidas, "duplicadas": res.duplicadas, "rechazadas": dict(res.rechazadas),
+    }
+
+
+@tarea("reconstruir_resumenes")
+def reconstruir_resumenes(trabajo):
+    consultas, afiliaciones = resumenes.reconstruir()
+    return {"consultas": consultas, "afiliaciones": afiliaciones}
+
+
+def _consultas_a_cambiar(parametros):
+    """Ids de consultas: lista explícita (`consultas`) o filtros del listado (`filtros`)."""
+    from .filters import ConsultaMedicaFilter
+    if "consultas" in parametros:
+        ids = parametros["consultas"]
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise TrabajoInvalido("consultas: una lista de ids.")
+        return ids
+    filtros = parametros.get("filtros")
+    if not isinstance(filtros, dict) or not filtros:
+        raise TrabajoInvalido("Indica `consultas` (ids) o `filtros` (los del listado de consultas).")
+    filterset = ConsultaMedicaFilter(filtros, queryset=ConsultaMedica.objects.order_by("id"))
+    if not filterset.is_valid():
+        raise TrabajoInvalido(f"filtros: {dict(filterset.errors)}")
+    return list(filterset.qs.values_list("pk", flat=True))
+
+
+def _validar_cambiar_estado(parametros):
+    if parametros.get("estado") not in dict(ESTADO_CONSULTA_CHOICES):
+        raise TrabajoInvalido(f"estado: uno de {', '.join(dict(ESTADO_CONSULTA_CHOICES))}.")
+    if "consultas" not in parametros and not isinstance(parametros.get("filtros"), dict):
+        raise TrabajoInvalido("Indica `consultas` (ids) o `filtros` (los del listado de consultas).")
+
+
+@tarea("cambiar_estado_consultas", validar=_validar_cambiar_estado)
+def cambiar_estado_consultas(trabajo, lote=1000):
+    """
+    Cambia el estado de muchas consultas por lotes, con los resúmenes al día.
+    Una cancelada que vuelve a ocupar hora pasa por la agenda (agenda.py):
+    si choca o queda fuera del horario no se cambia (`rechazadas`).
+    """
+    parametros = trabajo.parametros
+    _validar_cambiar_estado(parametros)
+    estado, ids = parametros["estado"], _consultas_a_cambiar(parametros)
+    cambiadas, rechazadas = 0, []
+    for i in range(0, len(ids), lote):
+        bloque = ids[i:i + lote]
+        with transaction.atomic():
+            if estado != agenda.CANCELADA:
+                # Médicos antes que consultas: el mismo orden de bloqueo que una reserva
+                agenda.bloquear_medicos(
+                    ConsultaMedica.objects.filter(pk__in=bloque, estado=agenda.CANCELADA)
+                    .values_list("medico_id", flat=True)
+                )
+            consultas = list(
+                ConsultaMedica.objects.select_for_update().filter(pk__in=bloque).exclude(estado=estado)
+                .only("id", "fecha_consulta", "medico_id", "estado")
+            )
+            if estado != agenda.CANCELADA:
+                reabiertas = [c for c in consultas if c.estado == agenda.CANCELADA]
+                errores = agenda.validar_reservas([
+                    ConsultaMedica(pk=c.pk, medico_id=c.medico_id, fecha_consulta=c.fecha_consulta, estado=estado)
+                    for c in reabiertas
+                ])
+                sin_hora = {reabiertas[pos].pk for pos in errores}
+                rechazadas += sorted(sin_hora)
+                consultas = [c for c in consultas if c.pk not in sin_hora]
+            if not consultas:
+                continue
+            # update() no emite signals: los resúmenes se ajustan aquí
+            resumenes.sumar_consultas(consultas, -1)
+            ConsultaMedica.objects.filter(pk__in=[c.pk for c in consultas]).update(
+                estado=estado, updated_at=timezone.now(),
+            )
+            for consulta in consultas:
+                consulta.estado = estado
+            resumenes.sumar_consultas(consultas)
+            cambiadas += len(consultas)
+    return {"consultas": len(ids), "cambiadas": cambiadas, "rechazadas": rechazadas}
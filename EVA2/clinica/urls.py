@@ -12,6 +12,11 @@ from .views import (
     RecetaMedicaViewSet,
     SeguroSaludViewSet,
     PacienteSeguroViewSet,
+    DashboardViewSet,
+    HorarioAtencionViewSet,
+    AgendaViewSet,
+    FacturacionViewSet,
+    TrabajoViewSet,
 )
 
 # Router de DRF:
@@ -22,11 +27,16 @@ from .views import (
 #   PUT    /<recurso>/<id>/     -> update
 #   PATCH  /<recurso>/<id>/     -> partial_update
 #   DELETE /<recurso>/<id>/     -> destroy
+#   POST   /<recurso>/bulk/     -> bulk (lote de objetos; ver clinica/bulk.py)
+#   GET    /<recurso>/export.csv/ , /<recurso>/export.ndjson/
+#                               -> export por streaming (ver clinica/export.py)
+#   GET    /<recurso>/<id>/dependencies/ -> ¿se puede eliminar? (clinica/dependencias.py)
 # - Usa slash final por defecto (ej: /api/pacientes/).
 router = DefaultRouter()
 
 # Registra cada ViewSet con un prefijo. Ejemplos resultantes:
-#   /api/pacientes/ , /api/pacientes/1/
+#   /api/pacientes/ , /api/pacientes/1/ , /api/pacientes/buscar/?q=
+#   /api/pacientes/1/historial/  (ficha clínica anidada; ver clinica/historial.py)
 router.register(r"pacientes", PacienteViewSet, basename="paciente")
 
 #   /api/medicos/ , /api/medicos/1/
@@ -38,13 +48,19 @@ router.register(r"especialidades", EspecialidadViewSet, basename="especialidad")
 #   /api/consultas/ , /api/consultas/1/
 router.register(r"consultas", ConsultaMedicaViewSet, basename="consulta")
 
-#   /api/tratamientos/ , /api/tratamientos/1/
+#   /api/horarios/ , /api/horarios/1/  (horario de atención semanal de cada médico)
+router.register(r"horarios", HorarioAtencionViewSet, basename="horario")
+
+#   /api/agenda/slots/?especialidad=1&n=10  (próximas horas libres; ver clinica/agenda.py)
+router.register(r"agenda", AgendaViewSet, basename="agenda")
+
+#   /api/tratamientos/ , /api/tratamientos/1/ , POST /api/tratamientos/1/dispensar/
 router.register(r"tratamientos", TratamientoViewSet, basename="tratamiento")
 
 #   /api/medicamentos/ , /api/medicamentos/1/
 router.register(r"medicamentos", MedicamentoViewSet, basename="medicamento")
 
-#   /api/recetas/ , /api/recetas/1/
+#   /api/recetas/ , /api/recetas/1/ , POST /api/recetas/1/dispensar/
 router.register(r"recetas", RecetaMedicaViewSet, basename="receta")
 
 #   /api/seguros/ , /api/seguros/1/
@@ -53,6 +69,18 @@ router.register(r"seguros", SeguroSaludViewSet, basename="seguro")
 #   /api/afiliaciones/ , /api/afiliaciones/1/
 router.register(r"afiliaciones", PacienteSeguroViewSet, basename="paciente-seguro")
 
+#   /api/dashboard/consultas/ , /api/dashboard/estados/ , /api/dashboard/afiliaciones/
+#   (leen las tablas resumen; ver clinica/resumenes.py)
+router.register(r"dashboard", DashboardViewSet, basename="dashboard")
+
+#   /api/facturacion/?desde=&hasta=&seguro=&medico= , /api/facturacion/export.csv/
+#   (costo, cobertura y copago de las recetas por seguro, mes y médico; ver clinica/facturacion.py)
+router.register(r"facturacion", FacturacionViewSet, basename="facturacion")
+
+#   /api/trabajos/ , /api/trabajos/1/ , /api/trabajos/1/archivo/
+#   (exports, imports y cambios masivos en segundo plano; ver clinica/trabajos.py)
+router.register(r"trabajos", TrabajoViewSet, basename="trabajo")
+
 urlpatterns = [
     # Incluye todas las rutas generadas por el router:
     #   /api/pacientes/, /api/medicos/, etc.
@@ -0,0 +1,23 @@
+# EVA2/clinica/urls_async.py
+# ---------------------------------------------------------
+# Rutas de las lecturas async (clinica/views_async.py), bajo /api/async/.
+# Sólo GET; las escrituras van a los ViewSets de /api/.
+# ---------------------------------------------------------
+from django.urls import path
+
+from . import views_async
+
+urlpatterns = [
+    #   /api/async/pacientes/ , /api/async/pacientes/1/ , /api/async/pacientes/1/historial/
+    path("pacientes/", views_async.lista, {"recurso": "pacientes"}, name="async_paciente_list"),
+    path("pacientes/<int:pk>/", views_async.detalle, {"recurso": "pacientes"}, name="async_paciente_detail"),
+    path("pacientes/<int:pk>/historial/", views_async.historial_paciente, name="async_paciente_historial"),
+
+    #   /api/async/medicos/ , /api/async/medicos/1/
+    path("medicos/", views_async.lista, {"recurso": "medicos"}, name="async_medico_list"),
+    path("medicos/<int:pk>/", views_async.detalle, {"recurso": "medicos"}, name="async_medico_detail"),
+
+    #   /api/async/consultas/ , /api/async/consultas/1/
+    path("consultas/", views_async.lista, {"recurso": "consultas"}, name="async_consulta_list"),
+    path("consultas/<int:pk>/", views_async.detalle, {"recurso": "consultas"}, name="async_consulta_detail"),
+]
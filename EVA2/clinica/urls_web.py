@@ -16,6 +16,7 @@ from .views_web import (
     RecetaList, RecetaCreate, RecetaUpdate, RecetaDelete,
     SeguroList, SeguroCreate, SeguroUpdate, SeguroDelete,
     PacienteSeguroList, PacienteSeguroCreate, PacienteSeguroUpdate, PacienteSeguroDelete,
+    LookupView,
 )
 
 urlpatterns = [
@@ -75,4 +76,7 @@ urlpatterns = [
     path("afiliaciones/nuevo/", PacienteSeguroCreate.as_view(), name="paciente_seguro_create"),
     path("afiliaciones/<int:pk>/editar/", PacienteSeguroUpdate.as_view(), name="paciente_seguro_update"),
     path("afiliaciones/<int:pk>/eliminar/", PacienteSeguroDelete.as_view(), name="paciente_seguro_delete"),
+
+    # Autocompletado de FKs en formularios (JSON paginado, ver lookups.py)
+    path("lookup/<str:recurso>/", LookupView.as_view(), name="clinica_lookup"),
 ]
\ No newline at end of file
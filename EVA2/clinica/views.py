@@ -4,38 +4,182 @@
 # El ruteo de estos ViewSets está en clinica/urls.py
 # ---------------------------------------------------------
 
-from rest_framework import viewsets, permissions
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch, Sum
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
+from . import (
+    agenda, busqueda, conditional, dependencias, dispensacion, facturacion, historial, metricas, particiones,
+    resumenes, trabajos,
+)
+from .bulk import BulkMixin
+from .campos import CamposDinamicosMixin
+from .cache import CachedCatalogMixin
+from .export import CSVRenderer, ExportMixin, NDJSONRenderer, filas_csv, filas_ndjson
+from .lectura import LecturaRapidaMixin
+from .filters import (
+    PacienteFilter, MedicoFilter, ConsultaMedicaFilter, ConsultaMedicaCompletaFilter,
+    TratamientoFilter, RecetaMedicaFilter, PacienteSeguroFilter, HorarioAtencionFilter
+)
+from .pagination import KeysetPagination, OffsetPagination
 from .models import (
     Paciente, Medico, Especialidad,
-    ConsultaMedica, Tratamiento, Medicamento,
-    RecetaMedica, SeguroSalud, PacienteSeguro
+    ConsultaMedica, ConsultaMedicaCompleta, Tratamiento, Medicamento,
+    RecetaMedica, SeguroSalud, PacienteSeguro, HorarioAtencion,
+    ResumenConsultasDiario, ResumenAfiliaciones, Trabajo,
 )
 from .serializers import (
-    PacienteSerializer, MedicoSerializer, EspecialidadSerializer,
+    PacienteSerializer, PacienteBusquedaSerializer, MedicoSerializer, EspecialidadSerializer,
     ConsultaMedicaSerializer, TratamientoSerializer, MedicamentoSerializer,
-    RecetaMedicaSerializer, SeguroSaludSerializer, PacienteSeguroSerializer
+    RecetaMedicaSerializer, SeguroSaludSerializer, PacienteSeguroSerializer,
+    HorarioAtencionSerializer, HistorialConsultaSerializer, HistorialSeguroSerializer, TrabajoSerializer,
 )
 
-class BaseModelViewSet(viewsets.ModelViewSet):
+
+class NoModificado(Exception):
+    """Corta el dispatch desde initial() con la respuesta 304 ya armada."""
+    def __init__(self, response):
+        self.response = response
+
+
+class BaseModelViewSet(CamposDinamicosMixin, LecturaRapidaMixin, BulkMixin, ExportMixin, viewsets.ModelViewSet):
     """
     Comportamiento común:
       - Permitir lectura a cualquiera y escritura abierta para evaluación.
         (ajusta permisos según lo que te pidan)
+      - Paginación por cursor (keyset) según el orden del queryset.
+        Con ?page=N se usa paginación por número de página (opt-in).
+      - POST /<recurso>/bulk/ para crear (o upsert) lotes (ver bulk.py).
+      - GET /<recurso>/export.csv/ y export.ndjson/ por streaming (ver export.py).
+      - GET /<recurso>/<id>/dependencies/: ¿se puede eliminar? (ver dependencias.py)
+      - list/retrieve con ?fields=a,b (sólo esas columnas) y ?expand=fk
+        (relación anidada, con select_related/prefetch; ver campos.py).
+      - list arma las filas desde values() sin instanciar modelos ni
+        serializers por fila, con la misma salida (ver lectura.py).
+      - list/retrieve con ETag y Last-Modified: si nada cambió, 304 tras
+        una sola query COUNT/MAX(updated_at) (ver conditional.py).
     """
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    offset_pagination_class = OffsetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            usar_offset = request is not None and "page" in request.query_params
+            clase = self.offset_pagination_class if usar_offset else self.pagination_class
+            self._paginator = clase() if clase is not None else None
+        return self._paginator
+
+    def estado_coleccion(self, queryset):
+        # Lo anidado con ?expand= es parte de la respuesta: su updated_at también cuenta
+        _, expandir = self.campos_solicitados()
+        return conditional.estado(queryset, expandir)
+
+    def dispensar_con(self, funcion):
+        """Respuesta común de las acciones `dispensar` (409 si no se pudo)."""
+        obj = self.get_object()
+        try:
+            resultado = funcion(obj.pk)
+        except dispensacion.DispensacionError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(resultado.as_dict())
+
+    @action(detail=True, methods=["get"], url_path="dependencies")
+    def dependencies(self, request, pk=None):
+        """Relaciones que bloquean el DELETE (PROTECT) o que se borrarían en cascada."""
+        try:
+            deps = dependencias.inspeccionar(self.get_queryset().model, pk)
+        except (TypeError, ValueError):
+            deps = None
+        if deps is None:
+            raise NotFound()
+        return Response(deps.as_dict())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validadores = None
+        if request.method not in ("GET", "HEAD") or self.action not in ("list", "retrieve"):
+            return
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup]})
+        est = self.estado_coleccion(queryset)
+        if self.action == "retrieve" and not est.total:
+            return  # 404: lo resuelve retrieve()
+        self._validadores = conditional.validadores(request, est)
+        response = conditional.no_modificado(request, *self._validadores)
+        if response is not None:
+            raise NoModificado(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NoModificado):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "_validadores", None):
+            conditional.agregar_validadores(response, *self._validadores)
+        return response
 
 
 class PacienteViewSet(BaseModelViewSet):
     queryset = Paciente.objects.all().order_by("id")
     serializer_class = PacienteSerializer
+    bulk_upsert_field = "rut"
+    filterset_class = PacienteFilter
+
+    @action(detail=False, methods=["get"], pagination_class=None, filterset_class=None)
+    def buscar(self, request):
+        """Typeahead: ?q=<RUT parcial o nombre>&limite=N (máx. 50)."""
+        try:
+            limite = min(max(int(request.query_params.get("limite", busqueda.LIMITE)), 1), 50)
+        except ValueError:
+            limite = busqueda.LIMITE
+        queryset = Paciente.objects.only("rut", "nombre", "apellido")
+        pacientes = busqueda.buscar_pacientes(queryset, request.query_params.get("q"), limite)
+        return Response({"results": PacienteBusquedaSerializer(pacientes, many=True).data})
+
+    @action(detail=True, methods=["get"], filterset_class=None)
+    def historial(self, request, pk=None):
+        """
+        Ficha completa en un documento (ver historial.py). Las consultas se
+        paginan por cursor y aceptan los filtros de /consultas/:
+        ?desde=&hasta= (ISO 8601, hasta exclusivo), ?medico=, ?estado=.
+        """
+        paciente = self.get_object()
+        filtro = ConsultaMedicaFilter(request.query_params, queryset=historial.consultas(paciente.pk))
+        if not filtro.is_valid():
+            raise ValidationError(filtro.errors)
+        paginador = historial.HistorialPagination()
+        pagina = paginador.paginate_queryset(filtro.qs, request, view=self)
+        response = paginador.get_paginated_response(HistorialConsultaSerializer(pagina, many=True).data)
+        response.data = {
+            "paciente": self.get_serializer(paciente).data,
+            "seguros": HistorialSeguroSerializer(historial.seguros_vigentes(paciente.pk), many=True).data,
+            **response.data,
+        }
+        return response
 
 
 class MedicoViewSet(BaseModelViewSet):
     queryset = Medico.objects.all().order_by("id")
     serializer_class = MedicoSerializer
+    bulk_upsert_field = "rut"
+    filterset_class = MedicoFilter
 
 
-class EspecialidadViewSet(BaseModelViewSet):
+class EspecialidadViewSet(CachedCatalogMixin, BaseModelViewSet):
     queryset = Especialidad.objects.all().order_by("id")
     serializer_class = EspecialidadSerializer
 
@@ -43,14 +187,57 @@ class EspecialidadViewSet(BaseModelViewSet):
 class ConsultaMedicaViewSet(BaseModelViewSet):
     queryset = ConsultaMedica.objects.select_related("paciente", "medico").all().order_by("-fecha_consulta")
     serializer_class = ConsultaMedicaSerializer
+    filterset_class = ConsultaMedicaFilter
+
+    def get_queryset(self):
+        # ?desde= anterior al corte del archivo: la lista incluye el histórico (particiones.py)
+        if self.action == "list" and particiones.incluye_archivo(self.request.query_params.get("desde")):
+            self.filterset_class = ConsultaMedicaCompletaFilter
+            return particiones.con_archivo(super().get_queryset())
+        return super().get_queryset()
+
+    def validar_bulk(self, objetos):
+        # bulk_create no pasa por el serializer: la agenda (choques con las
+        # guardadas y dentro del lote, horario) se valida aquí
+        rechazos = super().validar_bulk(objetos)
+        rechazos.update({pos: e.message_dict for pos, e in agenda.validar_reservas(objetos).items()})
+        return rechazos
+
+    def despues_de_bulk(self, creados, actualizados):
+        super().despues_de_bulk(creados, actualizados)
+        # bulk_create no emite signals (sin bulk_upsert_field no hay actualizados)
+        resumenes.sumar_consultas(creados)
+
+
+class HorarioAtencionViewSet(BaseModelViewSet):
+    queryset = HorarioAtencion.objects.select_related("medico").all().order_by("-id")
+    serializer_class = HorarioAtencionSerializer
+    filterset_class = HorarioAtencionFilter
 
 
 class TratamientoViewSet(BaseModelViewSet):
-    queryset = Tratamiento.objects.select_related("consulta").all().order_by("-id")
+    # Sin select_related("consulta"): sería un INNER JOIN y los tratamientos
+    # de consultas archivadas (particiones.py) desaparecerían de la API
+    queryset = Tratamiento.objects.all().order_by("-id")
     serializer_class = TratamientoSerializer
+    filterset_class = TratamientoFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if "consulta" in self.campos_solicitados()[1] and particiones.corte() is not None:
+            # ?expand=consulta con histórico: la consulta se lee aparte, también del archivo
+            queryset = queryset.select_related(None).prefetch_related(
+                Prefetch("consulta", queryset=ConsultaMedicaCompleta.objects.all()),
+            )
+        return queryset
 
+    @action(detail=True, methods=["post"])
+    def dispensar(self, request, pk=None):
+        """Dispensa todas las recetas pendientes del tratamiento (todo o nada)."""
+        return self.dispensar_con(dispensacion.dispensar_tratamiento)
 
-class MedicamentoViewSet(BaseModelViewSet):
+
+class MedicamentoViewSet(CachedCatalogMixin, BaseModelViewSet):
     queryset = Medicamento.objects.all().order_by("nombre")
     serializer_class = MedicamentoSerializer
 
@@ -58,13 +245,257 @@ class MedicamentoViewSet(BaseModelViewSet):
 class RecetaMedicaViewSet(BaseModelViewSet):
     queryset = RecetaMedica.objects.select_related("tratamiento", "medicamento").all().order_by("-id")
     serializer_class = RecetaMedicaSerializer
+    filterset_class = RecetaMedicaFilter
+
+    @action(detail=True, methods=["post"])
+    def dispensar(self, request, pk=None):
+        """Descuenta del stock la cantidad de la receta (ver dispensacion.py)."""
+        return self.dispensar_con(dispensacion.dispensar_receta)
 
 
-class SeguroSaludViewSet(BaseModelViewSet):
+class SeguroSaludViewSet(CachedCatalogMixin, BaseModelViewSet):
     queryset = SeguroSalud.objects.all().order_by("nombre")
     serializer_class = SeguroSaludSerializer
 
 
 class PacienteSeguroViewSet(BaseModelViewSet):
     queryset = PacienteSeguro.objects.select_related("paciente", "seguro").all().order_by("-id")
-    serializer_class = PacienteSeguroSerializer
\ No newline at end of file
+    serializer_class = PacienteSeguroSerializer
+    filterset_class = PacienteSeguroFilter
+
+    def despues_de_bulk(self, creados, actualizados):
+        super().despues_de_bulk(creados, actualizados)
+        resumenes.sumar_afiliaciones(creados)
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    """
+    Indicadores del dashboard. Sólo leen las tablas resumen (resumenes.py),
+    nunca hacen GROUP BY sobre ConsultaMedica/PacienteSeguro.
+      GET /dashboard/consultas/?desde=&hasta=&medico=&agrupar=medico|especialidad
+      GET /dashboard/estados/?desde=&hasta=&medico=
+      GET /dashboard/afiliaciones/
+    Fechas en formato aaaa-mm-dd; `hasta` inclusive. Por defecto, últimos 30 días.
+    """
+    permission_classes = [permissions.AllowAny]
+    DIAS_POR_DEFECTO = 30
+    DIAS_MAXIMO = 366
+    CONTADORES = ("pendientes", "atendidas", "canceladas", "no_asiste", "total")
+
+    def _resumen_consultas(self, request):
+        hoy = timezone.localdate()
+        fechas = {}
+        for nombre, por_defecto in (("hasta", hoy), ("desde", None)):
+            valor = request.query_params.get(nombre)
+            fechas[nombre] = parse_date(valor) if valor else por_defecto
+            if valor and fechas[nombre] is None:
+                raise ValidationError({nombre: "Fecha inválida (aaaa-mm-dd)."})
+        desde = fechas["desde"] or fechas["hasta"] - timedelta(days=self.DIAS_POR_DEFECTO - 1)
+        hasta = fechas["hasta"]
+        if desde > hasta or (hasta - desde).days >= self.DIAS_MAXIMO:
+            raise ValidationError({"desde": f"Rango inválido (máximo {self.DIAS_MAXIMO} días)."})
+        queryset = ResumenConsultasDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        medico = request.query_params.get("medico")
+        if medico:
+            if not medico.isdigit():
+                raise ValidationError({"medico": "Debe ser un id."})
+            queryset = queryset.filter(medico_id=int(medico))
+        return queryset, desde, hasta
+
+    @action(detail=False, methods=["get"])
+    def consultas(self, request):
+        """Consultas por día y por médico (o por especialidad con ?agrupar=especialidad)."""
+        queryset, desde, hasta = self._resumen_consultas(request)
+        agrupar = request.query_params.get("agrupar", "medico")
+        if agrupar == "especialidad":
+            claves = {"fecha": "fecha", "especialidad": "medico__especialidad_id",
+                      "especialidad_nombre": "medico__especialidad__nombre"}
+        elif agrupar == "medico":
+            claves = {"fecha": "fecha", "medico": "medico_id",
+                      "medico_nombre": "medico__nombre", "medico_apellido": "medico__apellido"}
+        else:
+            raise ValidationError({"agrupar": "Opciones: medico, especialidad."})
+        filas = (
+            queryset.values(*claves.values())
+            .annotate(**{f"suma_{c}": Sum(c) for c in self.CONTADORES})
+            .order_by(*list(claves.values())[:2])
+        )
+        resultados = [
+            {**{salida: f[campo] for salida, campo in claves.items()},
+             **{c: f[f"suma_{c}"] for c in self.CONTADORES}}
+            for f in filas
+        ]
+        return Response({"desde": desde, "hasta": hasta, "agrupar": agrupar, "results": resultados})
+
+    @action(detail=False, methods=["get"])
+    def estados(self, request):
+        """Totales por estado y tasas de asistencia / inasistencia / cancelación."""
+        queryset, desde, hasta = self._resumen_consultas(request)
+        totales = {c: v or 0 for c, v in queryset.aggregate(**{c: Sum(c) for c in self.CONTADORES}).items()}
+        con_resultado = totales["atendidas"] + totales["no_asiste"]
+
+        def tasa(parte, todo):
+            return round(parte / todo, 4) if todo else None
+
+        return Response({
+            "desde": desde, "hasta": hasta, **totales,
+            "tasa_asistencia": tasa(totales["atendidas"], con_resultado),
+            "tasa_inasistencia": tasa(totales["no_asiste"], con_resultado),
+            "tasa_cancelacion": tasa(totales["canceladas"], totales["total"]),
+        })
+
+    @action(detail=False, methods=["get"])
+    def afiliaciones(self, request):
+        """Afiliaciones vigentes y totales por seguro."""
+        filas = (
+            ResumenAfiliaciones.objects.select_related("seguro")
+            .order_by("-vigentes", "seguro__nombre")
+        )
+        return Response({"results": [
+            {"seguro": f.seguro_id, "nombre": f.seguro.nombre, "plan": f.seguro.plan,
+             "vigentes": f.vigentes, "total": f.total}
+            for f in filas
+        ]})
+
+
+class FacturacionViewSet(viewsets.ViewSet):
+    """
+    Reporte de facturación por seguro, mes y médico (ver facturacion.py).
+      GET /facturacion/?desde=&hasta=&seguro=&medico=
+      GET /facturacion/export.csv/ , /facturacion/export.ndjson/  (streaming)
+    Fechas aaaa-mm-dd; `hasta` inclusive. Por defecto, los últimos 12 meses
+    (desde el primer día del mes). ?seguro=0 -> sólo recetas particulares.
+    """
+    permission_classes = [permissions.AllowAny]
+    MESES_POR_DEFECTO = 12
+
+    def _parametros(self, request):
+        fechas = {}
+        for nombre in ("desde", "hasta"):
+            valor = request.query_params.get(nombre)
+            fechas[nombre] = parse_date(valor) if valor else None
+            if valor and fechas[nombre] is None:
+                raise ValidationError({nombre: "Fecha inválida (aaaa-mm-dd)."})
+        hasta = fechas["hasta"] or timezone.localdate()
+        desde = fechas["desde"] or particiones.sumar_meses(hasta.replace(day=1), 1 - self.MESES_POR_DEFECTO)
+        if desde > hasta:
+            raise ValidationError({"desde": "Debe ser anterior a `hasta`."})
+        filtros = {}
+        for nombre in ("seguro", "medico"):
+            valor = request.query_params.get(nombre)
+            if valor:
+                if not valor.isdigit():
+                    raise ValidationError({nombre: "Debe ser un id."})
+                filtros[nombre] = int(valor)
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+        return desde, hasta, facturacion.reporte(inicio, fin, **filtros)
+
+    def list(self, request):
+        desde, hasta, filas = self._parametros(request)
+        resultados = list(filas)
+        totales = {
+            c: round(sum(f[c] for f in resultados), 2)
+            for c in ("recetas", "sin_posologia", "costo", "cubierto", "copago")
+        }
+        return Response({"desde": desde, "hasta": hasta, "totales": totales, "results": resultados})
+
+    @action(
+        detail=False, methods=["get"], url_path=r"export\.(?P<formato>csv|ndjson)",
+        renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer],
+    )
+    def export(self, request, formato=None):
+        _, _, filas = self._parametros(request)
+        contenido = filas_csv(facturacion.COLUMNAS, filas) if formato == "csv" else filas_ndjson(filas)
+        response = StreamingHttpResponse(contenido, content_type=ExportMixin.CONTENT_TYPES[formato])
+        response["Content-Disposition"] = f'attachment; filename="facturacion.{formato}"'
+        return response
+
+
+class AgendaViewSet(viewsets.ViewSet):
+    """
+    Horas libres (ver agenda.py).
+      GET /agenda/slots/?especialidad=&desde=&hasta=&n=&medico=
+    `desde`/`hasta` en ISO 8601 (fecha u hora); por defecto, desde ahora y
+    por agenda.VENTANA_DIAS días. `n` entre 1 y agenda.MAX_SLOTS.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def _entero(self, nombre, por_defecto=None):
+        valor = self.request.query_params.get(nombre)
+        if valor is None or valor == "":
+            return por_defecto
+        if not valor.isdigit():
+            raise ValidationError({nombre: "Debe ser un número entero."})
+        return int(valor)
+
+    def _fecha(self, nombre):
+        valor = self.request.query_params.get(nombre)
+        if not valor:
+            return None
+        fecha = parse_datetime(valor)
+        if fecha is None and parse_date(valor):
+            fecha = datetime.combine(parse_date(valor), time.min)
+        if fecha is None:
+            raise ValidationError({nombre: "Fecha inválida (ISO 8601)."})
+        return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+    @action(detail=False, methods=["get"])
+    def slots(self, request):
+        """Próximas horas libres de una especialidad, entre todos sus médicos."""
+        especialidad = self._entero("especialidad")
+        if especialidad is None:
+            raise ValidationError({"especialidad": "Este parámetro es obligatorio."})
+        n = self._entero("n", 10)
+        if not 1 <= n <= agenda.MAX_SLOTS:
+            raise ValidationError({"n": f"Debe estar entre 1 y {agenda.MAX_SLOTS}."})
+        desde = self._fecha("desde") or timezone.now()
+        hasta = self._fecha("hasta") or desde + timedelta(days=agenda.VENTANA_DIAS)
+        if hasta <= desde or hasta - desde > timedelta(days=agenda.VENTANA_DIAS * 3):
+            raise ValidationError({"hasta": f"Rango inválido (máximo {agenda.VENTANA_DIAS * 3} días)."})
+        slots = agenda.slots_libres(especialidad, desde, hasta, n, self._entero("medico"))
+        return Response({
+            "desde": desde, "hasta": hasta,
+            "results": [
+                {"medico": m.pk, "medico_nombre": str(m), "inicio": inicio, "fin": fin,
+                 "duracion_minutos": m.especialidad.duracion_slot_minutos}
+                for inicio, fin, m in slots
+            ],
+        })
+
+
+class TrabajoViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Trabajos en segundo plano (trabajos.py; los ejecuta `manage.py clinica_worker`).
+      POST /trabajos/ {"tipo": "exportar", "parametros": {"recurso": "consultas", "filtros": {...}}}
+           -> 202 con el trabajo PEND (consultar su estado con GET /trabajos/{id}/)
+      GET  /trabajos/?estado=&tipo=
+      GET  /trabajos/{id}/archivo/ -> archivo generado (trabajos de exportar terminados)
+    """
+    queryset = Trabajo.objects.all().order_by("-id")
+    serializer_class = TrabajoSerializer
+    permission_classes = [permissions.AllowAny]
+    filterset_fields = ["estado", "tipo"]
+
+    def create(self, request, *args, **kwargs):
+        respuesta = super().create(request, *args, **kwargs)
+        respuesta.status_code = status.HTTP_202_ACCEPTED
+        return respuesta
+
+    @action(detail=True, methods=["get"])
+    def archivo(self, request, pk=None):
+        trabajo = self.get_object()
+        nombre = (trabajo.resultado or {}).get("archivo") if trabajo.estado == "OK" else None
+        if not nombre:
+            raise NotFound("El trabajo no generó un archivo (o todavía no termina).")
+        ruta = trabajos.ruta_archivo(nombre)
+        if not ruta.is_file():
+            raise NotFound("El archivo ya no existe.")
+        return FileResponse(open(ruta, "rb"), as_attachment=True, filename=nombre)
+
+
+def metricas_prometheus(request):
+    """/metrics: agregado por ruta de este proceso (metricas.py), formato Prometheus. Sólo staff."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(metricas.AGREGADO.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
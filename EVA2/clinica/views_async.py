@@ -0,0 +1,217 @@
+# EVA2/clinica/views_async.py
+# ---------------------------------------------------------
+# Lecturas async de la API (ASGI / uvicorn) — rutas en urls_async.py:
+#   /api/async/{pacientes,medicos,consultas}/       list
+#   /api/async/{pacientes,medicos,consultas}/<id>/  retrieve
+#   /api/async/pacientes/<id>/historial/            historial clínico
+# - Vistas async de Django (DRF es síncrono): el ORM se usa con aget,
+#   aaggregate y aiterator, así una query lenta no retiene un hilo del
+#   servidor mientras espera.
+# - Mismo queryset, filtros y salida que los ViewSets: las filas se arman
+#   con los conversores de lectura.py y el historial con sus serializers.
+# - Las listas se envían por streaming (StreamingHttpResponse), un lote
+#   de filas a la vez. Como "next" se conoce al final, va después de
+#   "results": {"results": [...], "next": url | null}. Sólo hay cursor
+#   hacia adelante.
+# - ETag / Last-Modified igual que la API síncrona (conditional.py).
+# - Las escrituras siguen en los ViewSets síncronos.
+# ---------------------------------------------------------
+
+import base64
+import json
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from . import conditional, historial, lectura
+from .filters import ConsultaMedicaFilter
+from .models import Paciente
+from .pagination import KeysetPagination, orden_estable
+from .serializers import HistorialConsultaSerializer, HistorialSeguroSerializer, PacienteSerializer
+from .views import ConsultaMedicaViewSet, MedicoViewSet, PacienteViewSet
+
+# recurso -> ViewSet del que se toman queryset, filterset_class y serializer_class
+RECURSOS = {
+    "pacientes": PacienteViewSet,
+    "medicos": MedicoViewSet,
+    "consultas": ConsultaMedicaViewSet,
+}
+LOTE = 100  # filas por viaje a la BD (chunk_size de aiterator) y por trozo enviado
+
+
+class ParametroInvalido(Exception):
+    def __init__(self, errores):
+        self.errores = errores
+
+
+# Mismo formato que el JSONRenderer de DRF (UNICODE_JSON y COMPACT_JSON)
+JSON_DRF = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def _json(valor):
+    return json.dumps(valor, default=str, **JSON_DRF).encode()
+
+
+def _trozo(items, primero):
+    """Elementos de un arreglo JSON sin los corchetes (con coma si no es el primer trozo)."""
+    return (b"" if primero else b",") + _json(items)[1:-1]
+
+
+def _tamano_pagina(request, paginacion):
+    valor = request.GET.get(paginacion.page_size_query_param)
+    if not valor:
+        return paginacion.page_size
+    if not valor.isdigit() or int(valor) < 1:
+        raise ParametroInvalido({"page_size": "Debe ser un entero positivo."})
+    return min(int(valor), paginacion.max_page_size)
+
+
+# ---------- Cursor (keyset) ----------
+def _cursor(valores):
+    return base64.urlsafe_b64encode(_json(valores)).decode()
+
+
+def _leer_cursor(texto, n):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(texto.encode()))
+    except ValueError:
+        valores = None
+    if not isinstance(valores, list) or len(valores) != n:
+        raise ParametroInvalido({"cursor": "Cursor inválido."})
+    return valores
+
+
+def _despues_de(orden, valores):
+    """
+    Filas posteriores a `valores` en el orden dado, p.ej. para
+    (-fecha_consulta, -id): fecha <= f AND (fecha < f OR (fecha = f AND id < i)).
+    La primera condición deja que el índice acote el rango.
+    """
+    condicion, previos = Q(), {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip("-")
+        lookup = "lt" if campo.startswith("-") else "gt"
+        condicion |= Q(**previos, **{f"{nombre}__{lookup}": valor})
+        previos[nombre] = valor
+    primero = orden[0].lstrip("-")
+    return Q(**{f"{primero}__{'lte' if orden[0].startswith('-') else 'gte'}": valores[0]}) & condicion
+
+
+def _paginar(request, queryset, paginacion):
+    """(queryset desde el cursor, orden, tamaño de página)."""
+    tamano = _tamano_pagina(request, paginacion)
+    orden = orden_estable(queryset)
+    if request.GET.get("cursor"):
+        queryset = queryset.filter(_despues_de(orden, _leer_cursor(request.GET["cursor"], len(orden))))
+    return queryset.order_by(*orden), orden, tamano
+
+
+def _url_siguiente(request, valores):
+    params = request.GET.copy()
+    params["cursor"] = _cursor(valores)
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+async def _validar_cache(request, queryset):
+    """(estado, validadores, respuesta 304 o None)."""
+    est = await conditional.aestado(queryset)
+    validadores = conditional.validadores(request, est)
+    return est, validadores, conditional.no_modificado(request, *validadores)
+
+
+def _no_encontrado():
+    return JsonResponse({"detail": "No encontrado."}, status=404)
+
+
+# ---------- Vistas ----------
+@require_GET
+async def lista(request, recurso):
+    viewset = RECURSOS[recurso]
+    queryset = viewset.queryset.all()
+    if viewset.filterset_class is not None:
+        filtro = viewset.filterset_class(request.GET, queryset=queryset)
+        if not filtro.is_valid():
+            return JsonResponse(filtro.errors, status=400)
+        queryset = filtro.qs
+    columnas = lectura.compilar(viewset.serializer_class())
+    try:
+        pagina, orden, tamano = _paginar(request, lectura.valores(queryset, columnas), KeysetPagination)
+    except ParametroInvalido as exc:
+        return JsonResponse(exc.errores, status=400)
+    _, validadores, no_modificado = await _validar_cache(request, queryset)
+    if no_modificado is not None:
+        return conditional.agregar_validadores(no_modificado, *validadores)
+    claves = [campo.lstrip("-") for campo in orden]
+
+    async def cuerpo():
+        yield b'{"results":['
+        lote, leidas, ultima, hay_mas = [], 0, None, False
+        async for fila in pagina[:tamano + 1].aiterator(chunk_size=LOTE):
+            if leidas == tamano:
+                hay_mas = True  # la fila extra sólo indica que hay página siguiente
+                break
+            lote.append(fila)
+            leidas, ultima = leidas + 1, fila
+            if len(lote) == LOTE:
+                yield _trozo(lectura.filas(lote, columnas), leidas == len(lote))
+                lote = []
+        if lote:
+            yield _trozo(lectura.filas(lote, columnas), leidas == len(lote))
+        siguiente = _url_siguiente(request, [ultima[c] for c in claves]) if hay_mas else None
+        yield b'],"next":' + _json(siguiente) + b"}"
+
+    response = StreamingHttpResponse(cuerpo(), content_type="application/json")
+    return conditional.agregar_validadores(response, *validadores)
+
+
+@require_GET
+async def detalle(request, recurso, pk):
+    viewset = RECURSOS[recurso]
+    queryset = viewset.queryset.filter(pk=pk)
+    est, validadores, no_modificado = await _validar_cache(request, queryset)
+    if not est.total:
+        return _no_encontrado()
+    if no_modificado is not None:
+        return conditional.agregar_validadores(no_modificado, *validadores)
+    columnas = lectura.compilar(viewset.serializer_class())
+    try:
+        fila = await lectura.valores(queryset, columnas).aget()
+    except ObjectDoesNotExist:  # se borró entre las dos queries
+        return _no_encontrado()
+    response = JsonResponse(lectura.filas([fila], columnas)[0], json_dumps_params=JSON_DRF)
+    return conditional.agregar_validadores(response, *validadores)
+
+
+@require_GET
+async def historial_paciente(request, pk):
+    """Versión async de /api/pacientes/{id}/historial/ (ver historial.py)."""
+    try:
+        paciente = await Paciente.objects.aget(pk=pk)
+    except Paciente.DoesNotExist:
+        return _no_encontrado()
+    filtro = ConsultaMedicaFilter(request.GET, queryset=historial.consultas(paciente.pk))
+    if not filtro.is_valid():
+        return JsonResponse(filtro.errors, status=400)
+    try:
+        pagina, orden, tamano = _paginar(request, filtro.qs, historial.HistorialPagination)
+    except ParametroInvalido as exc:
+        return JsonResponse(exc.errores, status=400)
+    seguros = [s async for s in historial.seguros_vigentes(paciente.pk).aiterator()]
+    claves = [campo.lstrip("-") for campo in orden]
+
+    async def cuerpo():
+        yield b'{"paciente":' + _json(PacienteSerializer(paciente).data)
+        yield b',"seguros":' + _json(HistorialSeguroSerializer(seguros, many=True).data) + b',"results":['
+        # aiterator con chunk_size aplica los Prefetch de tratamientos/recetas por lote
+        consultas = [c async for c in pagina[:tamano + 1].aiterator(chunk_size=tamano + 1)]
+        hay_mas = len(consultas) > tamano
+        consultas = consultas[:tamano]
+        yield _trozo(HistorialConsultaSerializer(consultas, many=True).data, True)
+        siguiente = None
+        if hay_mas:
+            siguiente = _url_siguiente(request, [getattr(consultas[-1], c) for c in claves])
+        yield b'],"next":' + _json(siguiente) + b"}"
+
+    return StreamingHttpResponse(cuerpo(), content_type="application/json")
@@ -4,14 +4,35 @@
 # - HomeView entrega "menu_items" al template de inicio.
 # - List/Create/Update/Delete para cada modelo.
 # - SafeDeleteMixin: evita borrar si hay relaciones (muestra motivo).
+# - BaseListView: listas paginadas/ordenables sin consultas N+1,
+#   con ETag/Last-Modified (304 si la tabla no cambió). Todas usan el
+#   template clinica/lista.html con las columnas declaradas en la vista
+#   (tablas.py); la tabla renderizada se cachea por versión.
+# - CatalogChoicesMixin: <select> de catálogos servidos desde la caché.
+# - AutocompleteFieldsMixin + LookupView: FKs de tablas grandes con
+#   autocompletado (sólo se carga la opción elegida).
+# - AgendaFormMixin: guarda las consultas con la agenda del médico
+#   bloqueada (sin doble reserva; ver agenda.py).
 # ---------------------------------------------------------
 
+from django.conf import settings
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db.models.deletion import ProtectedError
+from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
+from django.utils.text import Truncator
+from django.views import View
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
 
+from . import agenda, cache, conditional, dependencias, lookups
+from .tablas import Columna, Filas, url_por_pk
+from .filters import (
+    PacienteFilter, MedicoFilter, ConsultaMedicaFilter,
+    TratamientoFilter, RecetaMedicaFilter, PacienteSeguroFilter
+)
+from .widgets import AutocompleteSelect
 from .models import (
     Paciente, Medico, Especialidad,
     ConsultaMedica, Tratamiento, Medicamento,
@@ -41,14 +62,110 @@ class HomeView(TemplateView):
 
 # ---------- Mixins de utilidad ----------
 class PageNamesMixin:
-    """Inyecta en el contexto los nombres de URL que usan las tablas (editar/eliminar)."""
+    """
+    Inyecta en el contexto las URLs que usan las tablas: "Nuevo" y los
+    prefijos de editar/eliminar (un reverse() por página, no por fila).
+    """
+    page_create_name: str = ""
     page_update_name: str = ""
     page_delete_name: str = ""
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["page_update"] = self.page_update_name
-        ctx["page_delete"] = self.page_delete_name
+        ctx["url_nuevo"] = reverse(self.page_create_name)
+        ctx["url_editar"] = url_por_pk(self.page_update_name)
+        ctx["url_eliminar"] = url_por_pk(self.page_delete_name)
+        return ctx
+
+
+class BaseListView(PageNamesMixin, ListView):
+    """
+    ListView común para las tablas HTML.
+    - list_select_related: FKs que la tabla muestra (evita N+1 con JOIN).
+    - list_only: columnas que realmente se leen (incluye las de los FKs).
+    - sort_fields: alias de ?orden= -> campo del ORM (lista blanca).
+    - default_sort: alias por defecto (prefijo "-" = descendente).
+    - filterset_class: filtros de clinica/filters.py (los mismos de la API).
+    - titulo / columnas (tablas.Columna) / busqueda: lo que muestra
+      clinica/lista.html; `busqueda` es el placeholder del campo ?q=.
+    Cada página cuesta un COUNT/MAX(updated_at) + un SELECT, sin importar
+    cuántas filas tenga; si el navegador ya tiene la versión vigente, sólo
+    la primera (respuesta 304). Si otro navegador ya pidió esa misma
+    versión, la tabla sale de la caché de fragmentos y tampoco hay SELECT.
+    """
+    template_name = "clinica/lista.html"
+    paginate_by = 25
+    titulo: str = ""
+    columnas: tuple = ()
+    busqueda: str = ""
+    list_select_related: tuple = ()
+    list_only: tuple = ()
+    sort_fields: dict = {}
+    default_sort: str = ""
+    filterset_class = None
+
+    def get_sort(self):
+        """Devuelve el alias de orden pedido en ?orden= si es válido."""
+        orden = self.request.GET.get("orden", "")
+        if orden.lstrip("-") in self.sort_fields:
+            return orden
+        return self.default_sort
+
+    def get_ordering(self):
+        orden = self.get_sort()
+        if not orden:
+            return ("-pk",)
+        campo = self.sort_fields[orden.lstrip("-")]
+        signo = "-" if orden.startswith("-") else ""
+        # PK como desempate para que la paginación sea estable
+        return (f"{signo}{campo}", f"{signo}pk")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.list_select_related:
+            qs = qs.select_related(*self.list_select_related)
+        if self.list_only:
+            qs = qs.only(*self.list_only)
+        if self.filterset_class is not None:
+            filterset = self.filterset_class(self.request.GET, queryset=qs)
+            if filterset.is_valid():
+                qs = filterset.qs
+        return qs
+
+    def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.estado = conditional.estado(self.object_list, self.list_select_related)
+        validadores = self.validadores = conditional.validadores(request, self.estado)
+        # Con mensajes pendientes hay que renderizar (si no, se pierden)
+        if not len(messages.get_messages(request)):
+            response = conditional.no_modificado(request, *validadores)
+            if response is not None:
+                return conditional.agregar_validadores(response, *validadores)
+        context = self.get_context_data()
+        response = self.render_to_response(context)
+        return conditional.agregar_validadores(response, *validadores)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # El total ya salió de la query de estado: ahorra el COUNT(*)
+        paginator.__dict__["count"] = self.estado.total
+        return paginator
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        ctx["orden"] = self.get_sort()
+        ctx["querystring"] = params.urlencode()
+        params.pop("orden", None)
+        ctx["querystring_filtros"] = params.urlencode()
+        ctx["titulo"] = self.titulo
+        ctx["busqueda"] = self.busqueda
+        ctx["columnas"] = self.columnas
+        ctx["filas"] = Filas(ctx["object_list"], self.columnas, ctx["url_editar"], ctx["url_eliminar"])
+        # El ETag ya identifica URL (filtros, orden, página) + versión de la tabla
+        ctx["tabla_version"] = self.validadores[0]
+        ctx["tabla_cache_segundos"] = settings.CLINICA_TABLAS_CACHE_SEGUNDOS
         return ctx
 
 
@@ -65,49 +182,93 @@ class FormExtrasMixin:
         return ctx
 
 
+class CatalogChoicesMixin:
+    """
+    Llena los <select> de catálogos (Especialidad, Seguro, Medicamento)
+    desde la caché de clinica/cache.py en vez de consultar la BD.
+    catalog_fields: nombres de los campos FK del formulario.
+    """
+    catalog_fields: tuple = ()
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        for nombre in self.catalog_fields:
+            campo = form.fields[nombre]
+            campo.choices = [("", campo.empty_label or "")] + cache.opciones(campo.queryset.model)
+        return form
+
+
+class AutocompleteFieldsMixin:
+    """
+    Cambia el <select> de FKs con muchas filas por AutocompleteSelect.
+    autocomplete_fields: {campo del formulario: recurso de lookups.LOOKUPS}.
+    """
+    autocomplete_fields: dict = {}
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        for nombre, recurso in self.autocomplete_fields.items():
+            campo = form.fields[nombre]
+            campo.widget = AutocompleteSelect(recurso, choices=campo.choices)
+            campo.widget.is_required = campo.required
+        return form
+
+
+class AgendaFormMixin:
+    """
+    ModelForm.full_clean() ya valida la agenda (ConsultaMedica.clean), pero
+    fuera de transacción: se vuelve a validar y se guarda con el médico
+    bloqueado para que dos formularios simultáneos no tomen la misma hora.
+    """
+
+    def form_valid(self, form):
+        try:
+            with agenda.agenda_bloqueada(form.instance.medico_id):
+                agenda.validar_consulta(form.instance)
+                return super().form_valid(form)
+        except ValidationError as exc:
+            form.add_error(None, exc)
+            return self.form_invalid(form)
+
+
+class LookupView(View):
+    """
+    JSON para los autocompletados: GET /clinica/lookup/<recurso>/?q=&page=
+    Responde {"results": [{"id", "text"}], "more": bool}.
+    """
+
+    def get(self, request, recurso):
+        if recurso not in lookups.LOOKUPS:
+            raise Http404("Recurso de búsqueda desconocido")
+        try:
+            pagina = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            pagina = 1
+        resultados, hay_mas = lookups.buscar(recurso, request.GET.get("q"), pagina)
+        return JsonResponse({"results": resultados, "more": hay_mas})
+
+
 class SafeDeleteMixin:
     """
     Evita eliminar objetos que tienen relaciones protegidas.
-    - GET: pasa 'cannot_delete_reason' al template si hay dependencias.
+    Las dependencias salen de dependencias.py (una query, desde _meta).
+    - GET: pasa 'cannot_delete_reason' al template si hay dependencias
+      bloqueantes y 'cascade_reasons' con lo que se borraría en cascada.
     - POST: captura ProtectedError, muestra mensaje y redirige a la lista.
     """
     success_url = None
     cancel_url_name: str = ""
     model = None
 
-    def related_reasons(self, obj):
-        reasons = []
-        if isinstance(obj, Paciente):
-            if ConsultaMedica.objects.filter(paciente=obj).exists():
-                reasons.append("Tiene consultas médicas registradas.")
-            if PacienteSeguro.objects.filter(paciente=obj).exists():
-                reasons.append("Tiene afiliaciones de seguro de salud.")
-        if isinstance(obj, Medico):
-            if ConsultaMedica.objects.filter(medico=obj).exists():
-                reasons.append("Tiene consultas médicas asignadas.")
-        if isinstance(obj, Especialidad):
-            if Medico.objects.filter(especialidad=obj).exists():
-                reasons.append("Existen médicos con esta especialidad.")
-        if isinstance(obj, ConsultaMedica):
-            if Tratamiento.objects.filter(consulta=obj).exists():
-                reasons.append("Tiene tratamientos asociados.")
-        if isinstance(obj, Tratamiento):
-            if RecetaMedica.objects.filter(tratamiento=obj).exists():
-                reasons.append("Tiene recetas asociadas.")
-        if isinstance(obj, Medicamento):
-            if RecetaMedica.objects.filter(medicamento=obj).exists():
-                reasons.append("Está referenciado por recetas médicas.")
-        if isinstance(obj, SeguroSalud):
-            if PacienteSeguro.objects.filter(seguro=obj).exists():
-                reasons.append("Tiene afiliaciones de pacientes.")
-        return reasons
+    def dependencias(self, obj):
+        return dependencias.inspeccionar(type(obj), obj.pk)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        obj = self.get_object()
-        reasons = self.related_reasons(obj)
-        if reasons:
-            ctx["cannot_delete_reason"] = " ".join(reasons)
+        deps = self.dependencias(self.object)
+        if deps.bloqueos:
+            ctx["cannot_delete_reason"] = " ".join(deps.motivos())
+        ctx["cascade_reasons"] = [a.motivo for a in deps.cascada]
         if self.cancel_url_name:
             ctx["cancel_url"] = reverse(self.cancel_url_name)
         return ctx
@@ -117,17 +278,34 @@ class SafeDeleteMixin:
         try:
             return super().post(request, *args, **kwargs)
         except ProtectedError:
-            reasons = " ".join(self.related_reasons(self.object)) or "Existen registros relacionados."
+            deps = self.dependencias(self.object)
+            reasons = " ".join(deps.motivos()) if deps else ""
+            reasons = reasons or "Existen registros relacionados."
             messages.error(request, f"No se puede eliminar «{self.object}». {reasons}")
             return redirect(self.get_success_url())
 
 
 # ---------- PACIENTES ----------
-class PacienteList(PageNamesMixin, ListView):
+class PacienteList(BaseListView):
     model = Paciente
-    template_name = "clinica/pacientes_list.html"
+    titulo = "Pacientes"
+    page_create_name = "paciente_create"
     page_update_name = "paciente_update"
     page_delete_name = "paciente_delete"
+    list_only = ("rut", "nombre", "apellido", "sexo", "tipo_sangre", "telefono", "correo", "activo")
+    sort_fields = {"rut": "rut", "nombre": "apellido", "activo": "activo"}
+    default_sort = "nombre"
+    filterset_class = PacienteFilter
+    columnas = (
+        Columna("RUT", "rut", orden="rut"),
+        Columna("Nombre", lambda p: f"{p.nombre} {p.apellido}", orden="nombre", fuerte=True),
+        Columna("Sexo", "get_sexo_display"),
+        Columna("Tipo sangre", "tipo_sangre"),
+        Columna("Teléfono", "telefono", vacio="-"),
+        Columna("Correo", "correo", vacio="-"),
+        Columna("Activo", "activo", orden="activo"),
+    )
+    busqueda = "Buscar por RUT o nombre"
 
 class PacienteCreate(FormExtrasMixin, CreateView):
     model = Paciente
@@ -153,27 +331,43 @@ class PacienteDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- MÉDICOS ----------
-class MedicoList(PageNamesMixin, ListView):
+class MedicoList(BaseListView):
     model = Medico
-    template_name = "clinica/medicos_list.html"
+    titulo = "Médicos"
+    page_create_name = "medico_create"
     page_update_name = "medico_update"
     page_delete_name = "medico_delete"
-
-class MedicoCreate(FormExtrasMixin, CreateView):
+    list_select_related = ("especialidad",)
+    list_only = ("rut", "nombre", "apellido", "correo", "telefono", "activo", "especialidad__nombre")
+    sort_fields = {"rut": "rut", "nombre": "apellido", "especialidad": "especialidad__nombre", "activo": "activo"}
+    default_sort = "nombre"
+    filterset_class = MedicoFilter
+    columnas = (
+        Columna("RUT", "rut", orden="rut"),
+        Columna("Nombre", lambda m: f"{m.nombre} {m.apellido}", orden="nombre", fuerte=True),
+        Columna("Especialidad", "especialidad", orden="especialidad"),
+        Columna("Correo", "correo", vacio="-"),
+        Columna("Teléfono", "telefono", vacio="-"),
+        Columna("Activo", "activo", orden="activo"),
+    )
+
+class MedicoCreate(CatalogChoicesMixin, FormExtrasMixin, CreateView):
     model = Medico
     fields = "__all__"
     template_name = "clinica/medico_form.html"
     success_url = reverse_lazy("medico_list")
     page_title = "Nuevo Médico"
     cancel_url_name = "medico_list"
+    catalog_fields = ("especialidad",)
 
-class MedicoUpdate(FormExtrasMixin, UpdateView):
+class MedicoUpdate(CatalogChoicesMixin, FormExtrasMixin, UpdateView):
     model = Medico
     fields = "__all__"
     template_name = "clinica/medico_form.html"
     success_url = reverse_lazy("medico_list")
     page_title = "Editar Médico"
     cancel_url_name = "medico_list"
+    catalog_fields = ("especialidad",)
 
 class MedicoDelete(SafeDeleteMixin, DeleteView):
     model = Medico
@@ -183,11 +377,18 @@ class MedicoDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- ESPECIALIDADES ----------
-class EspecialidadList(PageNamesMixin, ListView):
+class EspecialidadList(BaseListView):
     model = Especialidad
-    template_name = "clinica/especialidades_list.html"
+    titulo = "Especialidades"
+    page_create_name = "especialidad_create"
     page_update_name = "especialidad_update"
     page_delete_name = "especialidad_delete"
+    sort_fields = {"nombre": "nombre"}
+    default_sort = "nombre"
+    columnas = (
+        Columna("Nombre", "nombre", orden="nombre", fuerte=True),
+        Columna("Descripción", "descripcion", vacio="-"),
+    )
 
 class EspecialidadCreate(FormExtrasMixin, CreateView):
     model = Especialidad
@@ -213,27 +414,49 @@ class EspecialidadDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- CONSULTAS ----------
-class ConsultaList(PageNamesMixin, ListView):
+class ConsultaList(BaseListView):
     model = ConsultaMedica
-    template_name = "clinica/consultas_list.html"
+    titulo = "Consultas"
+    page_create_name = "consulta_create"
     page_update_name = "consulta_update"
     page_delete_name = "consulta_delete"
-
-class ConsultaCreate(FormExtrasMixin, CreateView):
+    list_select_related = ("paciente", "medico")
+    list_only = (
+        "fecha_consulta", "motivo", "estado",
+        "paciente__nombre", "paciente__apellido",
+        "medico__nombre", "medico__apellido",
+    )
+    sort_fields = {
+        "fecha": "fecha_consulta", "paciente": "paciente__apellido",
+        "medico": "medico__apellido", "estado": "estado",
+    }
+    default_sort = "-fecha"
+    filterset_class = ConsultaMedicaFilter
+    columnas = (
+        Columna("Paciente", "paciente", orden="paciente"),
+        Columna("Médico", "medico", orden="medico"),
+        Columna("Fecha", "fecha_consulta", orden="fecha"),
+        Columna("Motivo", "motivo"),
+        Columna("Estado", "get_estado_display", orden="estado"),
+    )
+
+class ConsultaCreate(AgendaFormMixin, AutocompleteFieldsMixin, FormExtrasMixin, CreateView):
     model = ConsultaMedica
     fields = "__all__"
     template_name = "clinica/consulta_form.html"
     success_url = reverse_lazy("consulta_list")
     page_title = "Nueva Consulta"
     cancel_url_name = "consulta_list"
+    autocomplete_fields = {"paciente": "pacientes", "medico": "medicos"}
 
-class ConsultaUpdate(FormExtrasMixin, UpdateView):
+class ConsultaUpdate(AgendaFormMixin, AutocompleteFieldsMixin, FormExtrasMixin, UpdateView):
     model = ConsultaMedica
     fields = "__all__"
     template_name = "clinica/consulta_form.html"
     success_url = reverse_lazy("consulta_list")
     page_title = "Editar Consulta"
     cancel_url_name = "consulta_list"
+    autocomplete_fields = {"paciente": "pacientes", "medico": "medicos"}
 
 class ConsultaDelete(SafeDeleteMixin, DeleteView):
     model = ConsultaMedica
@@ -243,27 +466,39 @@ class ConsultaDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- TRATAMIENTOS ----------
-class TratamientoList(PageNamesMixin, ListView):
+class TratamientoList(BaseListView):
     model = Tratamiento
-    template_name = "clinica/tratamientos_list.html"
+    titulo = "Tratamientos"
+    page_create_name = "tratamiento_create"
     page_update_name = "tratamiento_update"
     page_delete_name = "tratamiento_delete"
-
-class TratamientoCreate(FormExtrasMixin, CreateView):
+    list_only = ("consulta_id", "descripcion", "duracion_dias")
+    sort_fields = {"consulta": "consulta_id", "duracion": "duracion_dias"}
+    default_sort = "-consulta"
+    filterset_class = TratamientoFilter
+    columnas = (
+        Columna("Consulta", lambda t: f"#{t.consulta_id}", orden="consulta"),
+        Columna("Descripción", lambda t: Truncator(t.descripcion).words(10)),
+        Columna("Duración (días)", "duracion_dias", orden="duracion"),
+    )
+
+class TratamientoCreate(AutocompleteFieldsMixin, FormExtrasMixin, CreateView):
     model = Tratamiento
     fields = "__all__"
     template_name = "clinica/tratamiento_form.html"
     success_url = reverse_lazy("tratamiento_list")
     page_title = "Nuevo Tratamiento"
     cancel_url_name = "tratamiento_list"
+    autocomplete_fields = {"consulta": "consultas"}
 
-class TratamientoUpdate(FormExtrasMixin, UpdateView):
+class TratamientoUpdate(AutocompleteFieldsMixin, FormExtrasMixin, UpdateView):
     model = Tratamiento
     fields = "__all__"
     template_name = "clinica/tratamiento_form.html"
     success_url = reverse_lazy("tratamiento_list")
     page_title = "Editar Tratamiento"
     cancel_url_name = "tratamiento_list"
+    autocomplete_fields = {"consulta": "consultas"}
 
 class TratamientoDelete(SafeDeleteMixin, DeleteView):
     model = Tratamiento
@@ -273,11 +508,20 @@ class TratamientoDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- MEDICAMENTOS ----------
-class MedicamentoList(PageNamesMixin, ListView):
+class MedicamentoList(BaseListView):
     model = Medicamento
-    template_name = "clinica/medicamentos_list.html"
+    titulo = "Medicamentos"
+    page_create_name = "medicamento_create"
     page_update_name = "medicamento_update"
     page_delete_name = "medicamento_delete"
+    sort_fields = {"nombre": "nombre", "laboratorio": "laboratorio", "stock": "stock", "precio": "precio_unitario"}
+    default_sort = "nombre"
+    columnas = (
+        Columna("Nombre", "nombre", orden="nombre", fuerte=True),
+        Columna("Laboratorio", "laboratorio", orden="laboratorio", vacio="-"),
+        Columna("Stock", "stock", orden="stock"),
+        Columna("Precio", lambda m: f"${m.precio_unitario}", orden="precio"),
+    )
 
 class MedicamentoCreate(FormExtrasMixin, CreateView):
     model = Medicamento
@@ -303,27 +547,44 @@ class MedicamentoDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- RECETAS ----------
-class RecetaList(PageNamesMixin, ListView):
+class RecetaList(BaseListView):
     model = RecetaMedica
-    template_name = "clinica/recetas_list.html"
+    titulo = "Recetas"
+    page_create_name = "receta_create"
     page_update_name = "receta_update"
     page_delete_name = "receta_delete"
-
-class RecetaCreate(FormExtrasMixin, CreateView):
+    list_select_related = ("medicamento",)
+    list_only = ("tratamiento_id", "dosis", "frecuencia", "duracion", "medicamento__nombre")
+    sort_fields = {"tratamiento": "tratamiento_id", "medicamento": "medicamento__nombre"}
+    default_sort = "-tratamiento"
+    filterset_class = RecetaMedicaFilter
+    columnas = (
+        Columna("Tratamiento", lambda r: f"#{r.tratamiento_id}", orden="tratamiento"),
+        Columna("Medicamento", "medicamento", orden="medicamento"),
+        Columna("Dosis", "dosis"),
+        Columna("Frecuencia", "frecuencia"),
+        Columna("Duración", "duracion"),
+    )
+
+class RecetaCreate(AutocompleteFieldsMixin, CatalogChoicesMixin, FormExtrasMixin, CreateView):
     model = RecetaMedica
     fields = "__all__"
     template_name = "clinica/receta_form.html"
     success_url = reverse_lazy("receta_list")
     page_title = "Nueva Receta"
     cancel_url_name = "receta_list"
+    catalog_fields = ("medicamento",)
+    autocomplete_fields = {"tratamiento": "tratamientos"}
 
-class RecetaUpdate(FormExtrasMixin, UpdateView):
+class RecetaUpdate(AutocompleteFieldsMixin, CatalogChoicesMixin, FormExtrasMixin, UpdateView):
     model = RecetaMedica
     fields = "__all__"
     template_name = "clinica/receta_form.html"
     success_url = reverse_lazy("receta_list")
     page_title = "Editar Receta"
     cancel_url_name = "receta_list"
+    catalog_fields = ("medicamento",)
+    autocomplete_fields = {"tratamiento": "tratamientos"}
 
 class RecetaDelete(SafeDeleteMixin, DeleteView):
     model = RecetaMedica
@@ -333,11 +594,18 @@ class RecetaDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- SEGUROS ----------
-class SeguroList(PageNamesMixin, ListView):
+class SeguroList(BaseListView):
     model = SeguroSalud
-    template_name = "clinica/seguros_list.html"
+    titulo = "Seguros"
+    page_create_name = "seguro_create"
     page_update_name = "seguro_update"
     page_delete_name = "seguro_delete"
+    sort_fields = {"nombre": "nombre", "plan": "plan"}
+    default_sort = "nombre"
+    columnas = (
+        Columna("Nombre", "nombre", orden="nombre", fuerte=True),
+        Columna("Plan", "plan", orden="plan", vacio="-"),
+    )
 
 class SeguroCreate(FormExtrasMixin, CreateView):
     model = SeguroSalud
@@ -363,27 +631,50 @@ class SeguroDelete(SafeDeleteMixin, DeleteView):
 
 
 # ---------- AFILIACIONES PACIENTE–SEGURO ----------
-class PacienteSeguroList(PageNamesMixin, ListView):
+class PacienteSeguroList(BaseListView):
     model = PacienteSeguro
-    template_name = "clinica/paciente_seguros_list.html"
+    titulo = "Afiliaciones"
+    page_create_name = "paciente_seguro_create"
     page_update_name = "paciente_seguro_update"
     page_delete_name = "paciente_seguro_delete"
-
-class PacienteSeguroCreate(FormExtrasMixin, CreateView):
+    list_select_related = ("paciente", "seguro")
+    list_only = (
+        "cobertura_porcentaje", "vigente",
+        "paciente__nombre", "paciente__apellido",
+        "seguro__nombre", "seguro__plan",
+    )
+    sort_fields = {
+        "paciente": "paciente__apellido", "seguro": "seguro__nombre",
+        "cobertura": "cobertura_porcentaje", "vigente": "vigente",
+    }
+    default_sort = "paciente"
+    filterset_class = PacienteSeguroFilter
+    columnas = (
+        Columna("Paciente", "paciente", orden="paciente"),
+        Columna("Seguro", "seguro", orden="seguro"),
+        Columna("Cobertura %", "cobertura_porcentaje", orden="cobertura"),
+        Columna("Vigente", "vigente", orden="vigente"),
+    )
+
+class PacienteSeguroCreate(AutocompleteFieldsMixin, CatalogChoicesMixin, FormExtrasMixin, CreateView):
     model = PacienteSeguro
     fields = "__all__"
     template_name = "clinica/paciente_seguro_form.html"
     success_url = reverse_lazy("paciente_seguro_list")
     page_title = "Nueva Afiliación"
     cancel_url_name = "paciente_seguro_list"
+    catalog_fields = ("seguro",)
+    autocomplete_fields = {"paciente": "pacientes"}
 
-class PacienteSeguroUpdate(FormExtrasMixin, UpdateView):
+class PacienteSeguroUpdate(AutocompleteFieldsMixin, CatalogChoicesMixin, FormExtrasMixin, UpdateView):
     model = PacienteSeguro
     fields = "__all__"
     template_name = "clinica/paciente_seguro_form.html"
     success_url = reverse_lazy("paciente_seguro_list")
     page_title = "Editar Afiliación"
     cancel_url_name = "paciente_seguro_list"
+    catalog_fields = ("seguro",)
+    autocomplete_fields = {"paciente": "pacientes"}
 
 class PacienteSeguroDelete(SafeDeleteMixin, DeleteView):
     model = PacienteSeguro
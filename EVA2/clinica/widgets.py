@@ -0,0 +1,58 @@
+# EVA2/clinica/widgets.py
+# ---------------------------------------------------------
+# Widgets de formulario para la interfaz web.
+# AutocompleteSelect: <select> de un FK que sólo trae la opción elegida;
+# el resto se busca con fetch() contra /clinica/lookup/<recurso>/
+# (ver lookups.py y static/clinica/autocomplete.js).
+# ---------------------------------------------------------
+
+from django import forms
+from django.urls import reverse
+
+from .lookups import LOOKUPS
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select para ModelChoiceField con tablas grandes.
+    - recurso: clave de lookups.LOOKUPS que responde las búsquedas.
+    - Al renderizar sólo consulta las instancias seleccionadas (0 o 1
+      query), no toda la tabla como el Select por defecto.
+    """
+
+    class Media:
+        js = ("clinica/autocomplete.js",)
+
+    def __init__(self, recurso, attrs=None, choices=()):
+        self.recurso = recurso
+        super().__init__(attrs, choices)
+
+    def __deepcopy__(self, memo):
+        obj = super().__deepcopy__(memo)
+        obj.recurso = self.recurso
+        return obj
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = reverse("clinica_lookup", args=[self.recurso])
+        attrs.setdefault("class", "form-select")
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        # Los pks son enteros: un valor inválido (POST con error) se descarta
+        seleccion = [str(v) for v in value if str(v).isdigit()]
+        opciones = [("", self.choices.field.empty_label or "")]
+        if seleccion:
+            queryset = self.choices.queryset
+            lookup = LOOKUPS.get(self.recurso)
+            if lookup and lookup.select_related:
+                queryset = queryset.select_related(*lookup.select_related)
+            opciones += [
+                (str(obj.pk), self.choices.field.label_from_instance(obj))
+                for obj in queryset.filter(pk__in=seleccion)
+            ]
+        grupos = []
+        for indice, (valor, etiqueta) in enumerate(opciones):
+            elegido = valor in seleccion or (not seleccion and valor == "")
+            grupos.append((None, [self.create_option(name, valor, etiqueta, elegido, indice, attrs=attrs)], indice))
+        return grupos
@@ -9,6 +9,7 @@ Incluye:
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv  # para leer variables desde .env
 
 # BASE_DIR apunta a la carpeta raíz del proyecto (donde está manage.py)
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     'corsheaders',     # Permitir CORS en desarrollo (útil si hay front aparte)
     'rest_framework',  # Django REST Framework (API)
     'drf_spectacular', # Documentación OpenAPI/Swagger
+    'django_filters',  # Filtros (?medico=, ?desde=, ...) para API y listas HTML
 
     # Apps locales
     'clinica',
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
 # Middleware
 # =========================
 MIDDLEWARE = [
+    'clinica.middleware.MetricasMiddleware',  # primero: mide la request completa (clinica/metricas.py)
     'corsheaders.middleware.CorsMiddleware',  # debe ir arriba para inyectar headers CORS
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'clinica.middleware.ReplicaPinMiddleware',  # lecturas a réplicas salvo tras escribir (clinica/routers.py)
 ]
 
 # Módulo de URLS a nivel de proyecto
@@ -70,16 +74,25 @@ ROOT_URLCONF = 'salud_vital.urls'
 # =========================
 # Templates
 # =========================
+_TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',   # templates dentro de cada app
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         # Si tuvieras una carpeta "templates" global al proyecto, agrégala aquí.
-        # Usamos APP_DIRS=True para que busque templates dentro de cada app.
         'DIRS': [
             # BASE_DIR / 'templates',
         ],
-        'APP_DIRS': True,
+        # Los loaders van explícitos (en vez de APP_DIRS=True): en producción
+        # cada template se compila una sola vez por proceso (cached.Loader).
+        # En DEBUG se leen del disco en cada request, para ver los cambios.
+        'APP_DIRS': False,
         'OPTIONS': {
+            'loaders': _TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', _TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 # Contexto útil en templates (request, user, messages, etc.)
                 'django.template.context_processors.debug',
@@ -100,16 +113,143 @@ ASGI_APPLICATION = 'salud_vital.asgi.application'
 # =========================
 # Variables esperadas en .env:
 #   DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
-DATABASES = {
+# DB_ENGINE=sqlite usa un archivo SQLite local (útil para correr los tests
+# sin un servidor Postgres: DB_ENGINE=sqlite python manage.py test clinica)
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',       # <- aquí se define Postgres
+            'NAME': os.getenv('DB_NAME', 'Eva_2'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+        }
+    }
+
+# =========================
+# Réplicas de lectura (opcional)
+# =========================
+# Los GET van a una réplica; las escrituras y todo lo que ocurra después
+# de una escritura (por REPLICA_PIN_SECONDS, vía cookie) van al primario.
+# Ver clinica/routers.py y clinica/middleware.py.
+#   PostgreSQL: DB_REPLICA_HOSTS=replica1,replica2 (DB_REPLICA_PORT/NAME/
+#               USER/PASSWORD; por defecto, los mismos del primario)
+#   SQLite:     DB_REPLICA_NAMES=replica1.sqlite3 (archivos locales que
+#               hacen de réplica para probar el ruteo)
+# En los tests las réplicas son espejo de 'default' (TEST MIRROR).
+if DB_ENGINE == 'sqlite':
+    _replicas = [
+        {**DATABASES['default'], 'NAME': BASE_DIR / nombre}
+        for nombre in os.getenv('DB_REPLICA_NAMES', '').split(',') if nombre.strip()
+    ]
+else:
+    _replicas = [
+        {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+            'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+            'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        }
+        for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()
+    ]
+DATABASE_REPLICAS = []
+for _i, _replica in enumerate(_replicas, start=1):
+    DATABASES[f'replica_{_i}'] = {**_replica, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_i}')
+DATABASE_ROUTERS = ['clinica.routers.ReplicaRouter']
+# Segundos que un cliente lee del primario después de escribir
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+
+# =========================
+# Métricas por request
+# =========================
+# Ver clinica/metricas.py. Cada respuesta lleva un header Server-Timing y
+# se loguea (JSON, logger "clinica.metricas"); /metrics expone p50/p95/p99
+# por ruta en formato Prometheus (sólo staff).
+METRICAS = {
+    'REQUEST_LENTA_MS': int(os.getenv('METRICAS_REQUEST_LENTA_MS', '500')),  # log WARNING
+    'QUERY_LENTA_MS': int(os.getenv('METRICAS_QUERY_LENTA_MS', '100')),      # log WARNING
+    'EXPLAIN_MUESTRA': float(os.getenv('METRICAS_EXPLAIN_MUESTRA', '0.1')),  # fracción de queries lentas con EXPLAIN
+    'VENTANA': int(os.getenv('METRICAS_VENTANA', '1000')),                   # duraciones por ruta para los percentiles
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO: una línea por request; WARNING: sólo requests y queries lentas
+        'clinica.metricas': {
+            'handlers': ['consola'],
+            # (en los tests, sólo las lentas: si no, una línea por request del cliente de pruebas)
+            'level': os.getenv('METRICAS_LOG_LEVEL', 'WARNING' if sys.argv[1:2] == ['test'] else 'INFO'),
+            'propagate': False,
+        },
+        # INFO: cada trabajo terminado; WARNING: fallas y reintentos (clinica/trabajos.py)
+        'clinica.trabajos': {
+            'handlers': ['consola'],
+            'level': os.getenv('TRABAJOS_LOG_LEVEL', 'WARNING' if sys.argv[1:2] == ['test'] else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# =========================
+# Caché
+# =========================
+# Por defecto en memoria del proceso (locmem). Para compartirla entre
+# workers define CACHE_BACKEND/CACHE_LOCATION en .env, p.ej.:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',       # <- aquí se define Postgres
-        'NAME': os.getenv('DB_NAME', 'Eva_2'),
-        'USER': os.getenv('DB_USER', 'postgres'),
-        'PASSWORD': os.getenv('DB_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', '127.0.0.1'),
-        'PORT': os.getenv('DB_PORT', '5432'),
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'salud-vital'),
     }
 }
+# Alias de CACHES que usa la caché de catálogos (clinica/cache.py)
+CLINICA_CATALOG_CACHE = 'default'
+# Segundos que se guarda la tabla renderizada de las listas HTML
+# ({% cache %} en clinica/lista.html; la clave incluye la versión de la
+# tabla, así que un cambio nunca muestra datos viejos). 0 = sin caché.
+CLINICA_TABLAS_CACHE_SEGUNDOS = int(os.getenv('CLINICA_TABLAS_CACHE_SEGUNDOS', '300'))
+
+# =========================
+# Particiones de consultas (sólo PostgreSQL)
+# =========================
+# Ver clinica/particiones.py y `manage.py clinica_particiones`.
+CONSULTAS_PARTICIONES = {
+    'MESES_FUTUROS': int(os.getenv('CONSULTAS_MESES_FUTUROS', '3')),   # particiones creadas por adelantado
+    'MESES_ACTIVOS': int(os.getenv('CONSULTAS_MESES_ACTIVOS', '24')),  # meses que quedan fuera del histórico
+    'ARCHIVO_DIR': os.getenv('CONSULTAS_ARCHIVO_DIR', str(BASE_DIR / 'archivo')),  # CSV gzip exportados
+}
+
+# =========================
+# Trabajos en segundo plano
+# =========================
+# Cola en la BD (clinica/trabajos.py); los ejecuta `manage.py clinica_worker`.
+TRABAJOS = {
+    'PROCESOS': int(os.getenv('TRABAJOS_PROCESOS', '2')),              # procesos del worker (SQLite: 1)
+    'INTERVALO': float(os.getenv('TRABAJOS_INTERVALO', '1.0')),        # segundos entre consultas a una cola vacía
+    'MAX_INTENTOS': int(os.getenv('TRABAJOS_MAX_INTENTOS', '3')),
+    'BACKOFF_SEGUNDOS': int(os.getenv('TRABAJOS_BACKOFF_SEGUNDOS', '30')),  # espera del 1er reintento (luego x2)
+    'BACKOFF_MAXIMO': int(os.getenv('TRABAJOS_BACKOFF_MAXIMO', '3600')),
+    'TIMEOUT_SEGUNDOS': int(os.getenv('TRABAJOS_TIMEOUT_SEGUNDOS', '1800')),  # EJEC por más tiempo: worker caído
+    'DIRECTORIO': os.getenv('TRABAJOS_DIRECTORIO', str(BASE_DIR / 'trabajos')),  # exports e imports
+}
 
 # =========================
 # Validación de contraseñas
@@ -148,6 +288,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
     # Generación de esquema OpenAPI con drf-spectacular
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Filtros declarados con filterset_class en cada ViewSet (clinica/filters.py)
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Paginación por cursor (keyset); ?page=N activa la paginación por offset
+    'DEFAULT_PAGINATION_CLASS': 'clinica.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # =========================
@@ -3,20 +3,26 @@ URLS del proyecto.
 
 - /admin/           -> Django Admin
 - /api/             -> Endpoints de la API (DRF) definidos en clinica/urls.py
+- /api/async/       -> Lecturas async (ASGI) definidas en clinica/urls_async.py
 - /api/schema/      -> OpenAPI JSON (drf-spectacular)
 - /api/docs/        -> Swagger UI (drf-spectacular)
 - /clinica/         -> Vistas HTML (templates) en clinica/urls_web.py
+- /metrics          -> Métricas por ruta en formato Prometheus (sólo staff)
 - 404 custom        -> Usa el template clinica/404.html cuando DEBUG=False
 """
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.shortcuts import render
+from clinica.views import metricas_prometheus
 
 urlpatterns = [
     # Panel de administración
     path('admin/', admin.site.urls),
 
+    # Lecturas async (antes que 'api/' para que el router no las capture)
+    path('api/async/', include('clinica.urls_async')),
+
     # API (router de DRF definido en clinica/urls.py)
     path('api/', include('clinica.urls')),
 
@@ -26,6 +32,9 @@ urlpatterns = [
 
     # Vistas HTML (templates) de la app clínica (separadas de la API)
     path('clinica/', include('clinica.urls_web')),
+
+    # Métricas (p50/p95/p99, queries y tiempo de BD por ruta) para Prometheus
+    path('metrics', metricas_prometheus, name='metrics'),
 ]
 
 # ============== 404 personalizado ==============